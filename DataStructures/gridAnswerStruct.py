@@ -5,15 +5,44 @@ Structs and functions to work with grid answer files from ladon
 :Email: entrymissing@gmail.com
 """
 
+from studyArchive import openStudyFile
+from bisect import bisect_left
 import csv
 
+class gridPrefixIndex:
+    """
+    Sorted index over grid items that finds the items starting with a prefix with a binary
+    search instead of a scan over all items, since they are all next to each other after it
+    The items are returned in the order they were given so that the results don't change
+
+    >>> index = gridPrefixIndex(['sudoku [1,2]', 'memory [1,1]', 'sudoku [1,1]'])
+    >>> index.itemsWithPrefix('sudoku')
+    ['sudoku [1,2]', 'sudoku [1,1]']
+    >>> index.itemsWithPrefix('sudoku [1,1'), index.itemsWithPrefix('unscramble')
+    (['sudoku [1,1]'], [])
+    """
+    def __init__(self, items, sortedItems = None):
+        #the sorted items can be given if they are known already (see scoringBundle)
+        self.positions = {}
+        for curPosition, curItem in enumerate(items):
+            self.positions[curItem] = curPosition
+        self.sortedItems = sortedItems if sortedItems is not None else sorted(self.positions)
+
+    def itemsWithPrefix(self, prefix):
+        start = bisect_left(self.sortedItems, prefix)
+        end = start
+        while end < len(self.sortedItems) and self.sortedItems[end].startswith(prefix):
+            end += 1
+        return sorted(self.sortedItems[start:end], key = self.positions.__getitem__)
+
 #TODO Write docstring and doctests
 class GridAnswers:
     def __init__(self, filename):
         self.answers = {}
+        self.index = None
         
         #open the reader and skip the header
-        with open(filename, 'r') as fp:
+        with openStudyFile(filename, 'r') as fp:
             csvReader = csv.reader(fp)
             csvReader.next()
             
@@ -27,6 +56,15 @@ class GridAnswers:
     
     def __getitem__(self, key):
         return self.answers[key.lower().strip()]
+
+    def itemsWithPrefix(self, prefix):
+        """
+        Return the answered items starting with the prefix in the order of iterating over the answers
+        The gridPrefixIndex is built the first time, which is once per file since the GridAnswers are cached
+        """
+        if self.index is None:
+            self.index = gridPrefixIndex(list(self.answers))
+        return self.index.itemsWithPrefix(prefix.lower().strip())
     
 if __name__ == '__main__':
     ga = GridAnswers('../Test Study/Data/XVal Session 21/Grid Items XVal Session 21.csv')
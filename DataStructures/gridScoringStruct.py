@@ -5,7 +5,8 @@ A class that loads and returns scores for grid task answers
 :Email: entrymissing@gmail.com
 """
 
-import json
+from gridAnswerStruct import gridPrefixIndex
+from scoringBundle import loadScoringSource
 
 class gridScores:
     """
@@ -32,18 +33,34 @@ class gridScores:
     KeyError
     """
     def __init__(self, settings):
-        #read the JSON file
-        tempScoringTable = json.load(open(settings['Scoring']['Correct Grid Answers'], 'r'))
+        #read the answer key that is all lower case since we should be case insensitive
+        answerKey = loadScoringSource(settings, 'gridAnswers', settings['Scoring']['Correct Grid Answers'])
         
         self.scoringTable = {}
+        for curTask, curAnswers in answerKey['items']:
+            self.scoringTable[curTask] = dict(curAnswers)
+
+        #the items of the answer key can be looked up by prefix
+        self.index = gridPrefixIndex(list(self.scoringTable), answerKey['sortedItems'])
         
-        #make the answers all lower case since we should be case insensitive
-        for curTask in tempScoringTable:
-            tempAnswers = {}
-            for curAnswer in tempScoringTable[curTask]:
-                tempAnswers[curAnswer.lower()] = tempScoringTable[curTask][curAnswer]
-            self.scoringTable[curTask.lower()] = tempAnswers
-        
+    def hasTask(self, task):
+        """
+        Check if there is an answer key for the task without raising an error
+        """
+        return task.lower().strip() in self.scoringTable
+
+    def getAnswerKey(self, task):
+        """
+        Return the answers of a task with their scores as a dict that must not be changed
+        """
+        return self.scoringTable[task.lower().strip()]
+
+    def itemsWithPrefix(self, prefix):
+        """
+        Return the items of the answer key starting with the prefix
+        """
+        return self.index.itemsWithPrefix(prefix.lower().strip())
+
     def getScore(self, task, answer):
         task = task.lower().strip()
         answer = answer.lower().strip()
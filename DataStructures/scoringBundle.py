@@ -0,0 +1,217 @@
+"""
+A compiled bundle of everything the scoring reads besides the session files: the scoring json,
+the grid answer key, the brainstorm scoring tables and the memory words and typing ground truths.
+Every source is parsed and normalized once, its strings are shared and the lookup indexes are
+built, and all of it is pickled into one versioned file. When the bundle is loaded the md5 of
+every source file is checked and the bundle is compiled again if any of them changed.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from studyArchive import openStudyFile, studyFileInfo
+from os import rename, getpid
+from os.path import exists
+import cPickle
+import hashlib
+import json
+
+#the version of the bundle layout, bundles with another version are compiled again
+bundleVersion = 1
+
+#the bundles that were loaded and checked in this process as bundleFilename: bundle
+loadedBundles = {}
+
+def internJson( value, strings ):
+    """
+    Replace every string of a json structure with the first equal string in strings
+    Unicode strings can't be interned by intern, but this way every string is only once in
+    memory and in the pickle no matter how often it appears in the sources
+
+    >>> strings = {}
+    >>> x = internJson(json.loads('[{"a": "b"}, {"a": "b"}]'), strings)
+    >>> x[0].keys()[0] is x[1].keys()[0], x[0]['a'] is x[1]['a'], len(strings)
+    (True, True, 2)
+    """
+    if isinstance(value, basestring):
+        return strings.setdefault(value, value)
+    if isinstance(value, list):
+        return [internJson(curValue, strings) for curValue in value]
+    if isinstance(value, dict):
+        return {internJson(curKey, strings): internJson(value[curKey], strings) for curKey in value}
+    return value
+
+def normalizeScoringFile( data, strings ):
+    """
+    The sections of the scoring json with the combine and ci parameters as (name, parameters)
+    pairs in the order of the file and the position of every task by its name
+    """
+    scoringFile = internJson(json.loads(data), strings)
+    normalized = {}
+    if 'ScoreTasks' in scoringFile:
+        normalized['ScoreTasks'] = scoringFile['ScoreTasks']
+        normalized['taskIndex'] = {}
+        for curPosition, curTask in enumerate(scoringFile['ScoreTasks']):
+            normalized['taskIndex'].setdefault(curTask['TaskName'], curPosition)
+    for curSection in ['CombineTasks', 'ComputeCI']:
+        if curSection in scoringFile:
+            normalized[curSection] = [(curParam.keys()[0], curParam.values()[0]) for curParam in scoringFile[curSection]]
+    return normalized
+
+def normalizeGridAnswers( data, strings ):
+    """
+    The lower case answer key as (item, [(answer, score)]) pairs in the order of the file,
+    so the dicts built from them are the same as the ones built from the json, and the
+    sorted items for the prefix index
+
+    >>> normalizeGridAnswers('{"Sudoku [1,1]": {" Bird": 1}}', {})['items']
+    [(u'sudoku [1,1]', [(u' bird', 1)])]
+    """
+    answerKey = json.loads(data)
+    items = []
+    for curTask in answerKey:
+        curAnswers = [(strings.setdefault(curAnswer.lower(), curAnswer.lower()), answerKey[curTask][curAnswer]) for curAnswer in answerKey[curTask]]
+        items.append((strings.setdefault(curTask.lower(), curTask.lower()), curAnswers))
+    return {'items': items, 'sortedItems': sorted(set([curTask for curTask, curAnswers in items]))}
+
+def normalizeBrainstormTable( data, strings ):
+    """
+    The synonyms of a brainstorm scoring table without whitespaces and an index of the
+    synonym groups every answer is in
+
+    >>> sorted(normalizeBrainstormTable('[[["Dig", "dig a hole"], 2.0], [["dig"], 1.0]]', {})['index'].items())
+    [(u'dig', [0, 1]), (u'digahole', [0])]
+    """
+    table = []
+    index = {}
+    for curIndex, curSynonym in enumerate(json.loads(data)):
+        curAnswers = [strings.setdefault(curAns.replace(' ','').lower().strip(), curAns.replace(' ','').lower().strip()) for curAns in curSynonym[0]]
+        table.append([curAnswers, curSynonym[1]])
+        for curAnswer in curAnswers:
+            curGroups = index.setdefault(curAnswer, [])
+            if not curGroups or curGroups[-1] != curIndex:
+                curGroups.append(curIndex)
+    return {'table': table, 'index': index}
+
+def normalizeMemoryWords( data, strings ):
+    """
+    The lower case and stripped spellings of every memory word and the set of all of them
+    """
+    correctWordList = [[strings.setdefault(curSyn.strip().lower(), curSyn.strip().lower()) for curSyn in curWord] for curWord in json.loads(data)]
+    allKnownWords = set([curSyn for curWord in correctWordList for curSyn in curWord])
+    return {'correctWordList': correctWordList, 'allKnownWords': allKnownWords}
+
+def normalizeTextLines( data, strings ):
+    """
+    The stripped lines of a text file without the empty ones like importTextFile reads them
+    """
+    return [strings.setdefault(curLine.strip(), curLine.strip()) for curLine in data.splitlines() if curLine.strip()]
+
+#the normalization of every kind of source
+sourceNormalizers = {'scoringFile': normalizeScoringFile,
+                     'gridAnswers': normalizeGridAnswers,
+                     'brainstormTable': normalizeBrainstormTable,
+                     'memoryWords': normalizeMemoryWords,
+                     'textLines': normalizeTextLines}
+
+def scoringSources( settings ):
+    """
+    Return the (kind, filename) of every source in the settings whose file exists
+    """
+    sources = [('scoringFile', settings['General'].get('ScoringFile'))]
+    if settings.has_section('Scoring'):
+        sources.append(('gridAnswers', settings['Scoring'].get('Correct Grid Answers')))
+    if settings.has_section('Brainstorming'):
+        for curKey in sorted(settings['Brainstorming']):
+            if curKey.endswith(' scoring table'):
+                sources.append(('brainstormTable', settings['Brainstorming'][curKey]))
+    if settings.has_section('Memory'):
+        sources.append(('memoryWords', settings['Memory'].get('Memory Words Ground Truth')))
+    if settings.has_section('Typing'):
+        sources.append(('textLines', settings['Typing'].get('Ground Truth Text')))
+        sources.append(('textLines', settings['Typing'].get('Ground Truth Numbers')))
+    return [(curKind, curFilename) for curKind, curFilename in sources if curFilename and studyFileInfo(curFilename)]
+
+def readSource( filename ):
+    #read a source file and hash it
+    with openStudyFile(filename, 'rb') as fp:
+        data = fp.read()
+    return data, hashlib.md5(data).hexdigest()
+
+def compileScoringBundle( settings, bundleFilename = None ):
+    """
+    Normalize all sources of the settings into a bundle and write it to bundleFilename
+    or the scoringBundleFilename of the General section
+    """
+    if bundleFilename is None:
+        bundleFilename = settings['General'].get('scoringBundleFilename')
+    if not bundleFilename:
+        print 'Error in compileScoringBundle: There is no scoringBundleFilename in the General section'
+        raise ValueError
+
+    strings = {}
+    bundle = {'version': bundleVersion, 'sources': {}}
+    for curKind, curFilename in scoringSources(settings):
+        data, md5 = readSource(curFilename)
+        bundle['sources'][(curKind, curFilename)] = {'md5': md5, 'data': sourceNormalizers[curKind](data, strings)}
+
+    #write to a file of this process first so others never load half a bundle
+    tempFilename = '{}.{}.tmp'.format(bundleFilename, getpid())
+    with open(tempFilename, 'wb') as fp:
+        cPickle.dump(bundle, fp, cPickle.HIGHEST_PROTOCOL)
+    rename(tempFilename, bundleFilename)
+    loadedBundles[bundleFilename] = bundle
+    return bundle
+
+def isBundleValid( bundle, settings ):
+    """
+    Check that a bundle has the right version, the sources of the settings and that none of them changed
+    """
+    if not isinstance(bundle, dict) or bundle.get('version') != bundleVersion:
+        return False
+    sources = scoringSources(settings)
+    if set(sources) != set(bundle['sources']):
+        return False
+    for curSource in sources:
+        if readSource(curSource[1])[1] != bundle['sources'][curSource]['md5']:
+            return False
+    return True
+
+def loadScoringBundle( settings ):
+    """
+    Load the bundle of the optional scoringBundleFilename of the General section
+    The bundle is checked against the sources once per process and compiled again if
+    anything changed. Returns None if no bundle is set
+    """
+    bundleFilename = settings['General'].get('scoringBundleFilename')
+    if not bundleFilename:
+        return None
+    if bundleFilename in loadedBundles:
+        return loadedBundles[bundleFilename]
+
+    bundle = None
+    if exists(bundleFilename):
+        try:
+            with open(bundleFilename, 'rb') as fp:
+                bundle = cPickle.load(fp)
+        except (cPickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError):
+            bundle = None
+    if not isBundleValid(bundle, settings):
+        return compileScoringBundle(settings, bundleFilename)
+    loadedBundles[bundleFilename] = bundle
+    return bundle
+
+def loadScoringSource( settings, kind, filename ):
+    """
+    Return the normalized data of a source from the bundle or parse the file if there is no bundle
+    The data is shared by everyone who loads it and must not be changed
+
+    >>> from settingsStruct import settingsStruct
+    >>> settings = settingsStruct('Test Study/settings.ini')
+    >>> loadScoringSource(settings, 'textLines', settings['Typing']['Ground Truth Numbers'])[0].isdigit()
+    True
+    """
+    bundle = loadScoringBundle(settings)
+    if bundle and (kind, filename) in bundle['sources']:
+        return bundle['sources'][(kind, filename)]['data']
+    return sourceNormalizers[kind](readSource(filename)[0], {})
@@ -5,8 +5,7 @@ Classes that hold the scoring parameters from the json scoring file and makes th
 :Email: entrymissing@gmail.com
 """
 
-import json
-from gridScoringStruct import gridScores
+from scoringBundle import loadScoringSource
 
 class scoringParameters:
     """
@@ -16,15 +15,16 @@ class scoringParameters:
     >>> x = scoringParameters(settingsStruct('Test Study/settings.ini'))
     """
     def __init__(self, settings):
-        self.scoringParameters = json.load(open(settings['General']['ScoringFile'], 'r'))['ScoreTasks']
+        scoringFile = loadScoringSource(settings, 'scoringFile', settings['General']['ScoringFile'])
+        self.scoringParameters = scoringFile['ScoreTasks']
+        self.taskIndex = scoringFile['taskIndex']
     
     def __iter__(self):
         return self.scoringParameters.__iter__()
     
     def __getitem__(self, taskName):
-        for curTask in self.scoringParameters:
-            if curTask['TaskName'] == taskName:
-                return curTask
+        if taskName in self.taskIndex:
+            return self.scoringParameters[self.taskIndex[taskName]]
         
         print 'Task {} not found.'.format(taskName)
         raise KeyError
@@ -37,8 +37,8 @@ class combinationParameters:
     >>> x = combinationParameters(settingsStruct('Test Study/settings.ini'))
     """
     def __init__(self, settings):
-        tempParameters = json.load(open(settings['General']['ScoringFile'], 'r'))['CombineTasks']
-        self.allParameters = {curParam.keys()[0]:curParam.values()[0] for curParam in tempParameters}
+        tempParameters = loadScoringSource(settings, 'scoringFile', settings['General']['ScoringFile'])['CombineTasks']
+        self.allParameters = {curName:curParam for curName, curParam in tempParameters}
     
     def __iter__(self):
         return self.allParameters.__iter__()
@@ -55,8 +55,8 @@ class ciComputationParameters:
     >>> x = ciComputationParameters(settingsStruct('Test Study/settings.ini'))
     """
     def __init__(self, settings):
-        tempParameters = json.load(open(settings['General']['ScoringFile'], 'r'))['ComputeCI']
-        self.allParameters = {curParam.keys()[0]:curParam.values()[0] for curParam in tempParameters}
+        tempParameters = loadScoringSource(settings, 'scoringFile', settings['General']['ScoringFile'])['ComputeCI']
+        self.allParameters = {curName:curParam for curName, curParam in tempParameters}
     
     def __iter__(self):
         return self.allParameters.__iter__()
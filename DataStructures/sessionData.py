@@ -7,12 +7,85 @@ Data structures to capsulate all data of a specific session
 
 from os import listdir
 from os.path import isdir, basename, exists
+from collections import OrderedDict
+from gridAnswerStruct import GridAnswers
+from studyShards import isSessionInShard
+from studyArchive import studyFileSize
 import csv
 
-class sessionData:
+class artifactCache:
+    """
+    Least recently used cache for the parsed files of the sessions
+    The entries are keyed by the loader function and the filename so every file is parsed
+    once per loader no matter how many tasks need it. If more than maxEntries files have
+    been parsed the one that hasn't been used for the longest time is dropped.
+    The cached values are shared so they must not be changed by the callers.
+    
+    >>> cache = artifactCache(2)
+    >>> cache.get(len, 'ab'), cache.get(len, 'abc'), cache.get(len, 'ab'), cache.get(len, 'abcd')
+    (2, 3, 2, 4)
+    >>> cache.entries.keys()
+    [(<built-in function len>, 'ab'), (<built-in function len>, 'abcd')]
+    """
+    def __init__(self, maxEntries = 1024):
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+
+    def get(self, loader, filename):
+        """
+        Return loader(filename) and only call the loader if it isn't cached
+        """
+        key = (loader, filename)
+        if key in self.entries:
+            #move the entry to the end since it is the most recently used one now
+            value = self.entries.pop(key)
+        else:
+            value = loader(filename)
+            while len(self.entries) >= self.maxEntries:
+                self.entries.popitem(last = False)
+        self.entries[key] = value
+        return value
+
+#the parsed files of all sessions (see sessionData.loadArtifact)
+sessionArtifacts = artifactCache()
+
+class sessionPathTemplate:
+    """
+    The file names of the sessions of a study built from the FilePrefix and FileExtension settings
+    One template is shared by all sessions, so the sessions only have to store their name
+    
+    >>> template = sessionPathTemplate({'datafolder': '/data/'}, {'logFile': 'LogFile'}, {'logFile': 'csv'})
+    >>> template.getFilename('Session 1', 'LOGFILE')
+    '/data/Session 1/Session 1 - LogFile.csv'
+    >>> template.getFilename('Session 1', 'sessionName')
+    'Session 1'
+    """
+    def __init__(self, generalSettings, filePrefixes, fileExtensions):
+        self.datafolder = generalSettings['datafolder']
+
+        #the part of every filename that comes after the session name
+        self.suffixes = {}
+        for curParam in filePrefixes:
+            self.suffixes[curParam.lower().strip()] = ' - ' + filePrefixes[curParam] + '.' + fileExtensions[curParam]
+
+    def getFilename(self, sessionName, key):
+        key = key.lower().strip()
+        if key == 'sessionname':
+            return sessionName
+        return self.datafolder + sessionName + '/' + sessionName + self.suffixes[key]
+
+def getPathTemplate( settings ):
+    """
+    Create the sessionPathTemplate of the study described by the settings
+    """
+    return sessionPathTemplate(settings['General'], settings['FilePrefix'], settings['FileExtension'])
+
+class sessionData(object):
     """
     Serves as an abstraction of all the data associated with a specific session
     Specifically it offers a standardized way to access the files for each task
+    A session only stores its name and references the sessionPathTemplate and the studyManifest
+    of the study, the filenames are put together when they are accessed
     
     >>> import settingsStruct
     >>> settings = settingsStruct.settingsStruct('Test Study/settings.ini')
@@ -26,39 +99,92 @@ class sessionData:
     .
     IOError
     """
-    def __init__(self, sessionName, settings):
+    __slots__ = ['sessionName', 'template', 'manifest']
+
+    def __init__(self, sessionName, settings, manifest = None, template = None):
         """
         Just pass the constructor on to the load Folder function
         """
-        self.loadFolder(sessionName, settings)
+        self.loadFolder(sessionName, settings, manifest, template)
     
-    def loadFolder(self, sessionName, settings):
+    def loadFolder(self, sessionName, settings, manifest = None, template = None):
         """
-        Check that the folder exists and create a dict that maps the expected files to actual filenames
+        Check that the folder exists and set up the template that maps the expected files to actual filenames
         If the folder does not exist raise an exception
         But we don't ensure that all files actually exist
+        If a studyManifest is given the folder is looked up in it instead of on disk
+        readStudy passes the template it shares between the sessions, otherwise a new one is created
         """
-        self.folder = settings['General']['datafolder'] + sessionName
-        if not exists(self.folder):
+        self.template = template if template else getPathTemplate(settings)
+        self.manifest = manifest
+        self.sessionName = sessionName
+        if not (manifest.hasSession(sessionName) if manifest else exists(self.folder)):
             print 'Error in sessionData: Folder {} does not exist'.format(self.folder)
             raise IOError
-        self.sessionName = sessionName
-        self.datafolder = settings['General']['datafolder']
-        self.parameters = {'sessionname':sessionName}
-        
-        for curParam in settings['FilePrefix']:
-            self.parameters[curParam.lower().strip()] = self.datafolder + self.sessionName + '/' + self.sessionName + ' - ' + settings['FilePrefix'][curParam] + '.' + settings['FileExtension'][curParam]
+
+    @property
+    def datafolder(self):
+        return self.template.datafolder
+
+    @property
+    def folder(self):
+        return self.template.datafolder + self.sessionName
 
     def __getitem__(self, key):
         """
         Access to the filenames is provided via the [] operator
         """
-        return self.parameters[key.lower().strip()]
+        return self.template.getFilename(self.sessionName, key)
+
+    def loadArtifact(self, key, loader):
+        """
+        Return the file of the session for the key parsed by loader(filename)
+        The result is cached in sessionArtifacts so all tasks share one parse of every file
+        """
+        return sessionArtifacts.get(loader, self[key])
+
+    def gridAnswers(self):
+        """
+        Return the GridAnswers of the session
+        """
+        return self.loadArtifact('GridItems', GridAnswers)
+
+    def getFileSize(self, key):
+        """
+        Return the size of one of the files of the session or None if it doesn't exist
+        The size comes from the studyManifest or the studyArchive if the session was read with one
+        If only a gzip compressed version of the file exists the size of the uncompressed data is
+        returned, so a file has the same size no matter if it is compressed or not
+        """
+        filename = self[key]
+        if self.manifest:
+            fileInfo = self.manifest.fileInfo(self.sessionName, basename(filename))
+            if fileInfo:
+                return fileInfo[0]
+            if not self.manifest.fileInfo(self.sessionName, basename(filename) + '.gz'):
+                return None
+        return studyFileSize(filename)
+
+def readSessionTable( settings ):
+    """
+    Read the sessionDataFile spreadsheet and return its headers and rows
+    The first column holds the session names
+    """
+    with open(settings['General']['sessionDataFile'], 'rU') as fp:
+        csvReader = csv.reader(fp)
+        headers = csvReader.next()
+        return headers, list(csvReader)
 
 def readStudy( settings ):
     """
     Read study returns all the sessions as a list of sessionData
     The sessions will be in alphabetical order in the returned list
+    If the optional studyManifestFilename is set in the General section the session folders
+    are taken from the studyManifest instead of listing the data folder
+    If the optional studyArchive is set in the General section the session folders are read from
+    that zip or tar archive instead of the data folder (see studyArchive)
+    The optional artifactCacheSize of the General section sets how many parsed files are kept
+    If a shard is set in the General section only the sessions of that shard are returned
     
     >>> import settingsStruct
     >>> settings = settingsStruct.settingsStruct('Test Study/settings.ini')
@@ -74,23 +200,37 @@ def readStudy( settings ):
     >>> [curSession.sessionName for curSession in sessions]
     ['XVal Session 21 - Group 1', 'XVal Session 23 - Group 1', 'XVal Session 26 - Group 1']
     """
+    sessionArtifacts.maxEntries = settings['General'].get('artifactCacheSize', 1024)
+
+    #the manifest needs scandir so it is only imported if it is used
+    manifest = None
+    if settings['General'].get('studyArchive'):
+        from studyArchive import loadStudyArchive
+        manifest = loadStudyArchive(settings)
+    elif settings['General'].get('studyManifestFilename'):
+        from studyManifest import loadStudyManifest
+        manifest = loadStudyManifest(settings)
+
     #if the sessionDataFile is false we are taking everything in the data folder
     if not settings['General']['sessionDataFile']:
-        allSessions = [curFolder for curFolder in listdir(settings['General']['datafolder']) if isdir(settings['General']['datafolder'] + curFolder)]
+        if manifest:
+            allSessions = manifest.sessionNames()
+        else:
+            allSessions = [curFolder for curFolder in listdir(settings['General']['datafolder']) if isdir(settings['General']['datafolder'] + curFolder)]
     #otherwise we load the spreadsheet and load only the folders that have the flag set
     else:
-        allSessions = []
-        with open(settings['General']['sessionDataFile'], 'rU') as fp:
-            csvReader = csv.reader(fp)
-            headers = csvReader.next()
-            selectionIndex = headers.index(settings['General']['sessionSelector'])
-            
-            for curLine in csvReader:
-                if curLine[selectionIndex] == '1' and curLine[0]:
-                    allSessions.append(curLine[0])
+        headers, rows = readSessionTable(settings)
+        selectionIndex = headers.index(settings['General']['sessionSelector'])
+        allSessions = [curLine[0] for curLine in rows if curLine[selectionIndex] == '1' and curLine[0]]
 
     #read in the folders
-    return [sessionData(curFolder, settings) for curFolder in sorted(allSessions)]
+    #keep only the sessions of the shard if the study is split (see studyShards)
+    if settings['General'].get('shard'):
+        allSessions = [curFolder for curFolder in allSessions if isSessionInShard(curFolder, settings['General']['shard'])]
+
+    #all sessions share one path template
+    template = getPathTemplate(settings)
+    return [sessionData(curFolder, settings, manifest, template) for curFolder in sorted(allSessions)]
 
 if __name__ == '__main__':
     import settingsStruct
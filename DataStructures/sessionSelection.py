@@ -0,0 +1,95 @@
+"""
+Select some of the sessions of a study, e.g. to score them again after an answer key was fixed.
+Sessions are selected by name or by filter expressions over the columns of the sessionDataFile
+spreadsheet like 'Condition=Video' or 'Group Size >= 4'.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from sessionData import readSessionTable
+import re
+
+#a filter is a column, an operator and a value
+filterPattern = re.compile(r'^(.+?)\s*(==|!=|>=|<=|=|>|<)\s*(.*)$')
+
+def parseSessionSelector( selector ):
+    """
+    Split a comma separated selector into the session names and the (column, operator, value) filters
+
+    >>> parseSessionSelector('Session 01, Condition=Video, Group Size >= 4')
+    (['Session 01'], [('Condition', '=', 'Video'), ('Group Size', '>=', '4')])
+    """
+    sessionNames = []
+    filters = []
+    for curPart in selector.split(','):
+        curPart = curPart.strip()
+        if not curPart:
+            continue
+        curMatch = filterPattern.match(curPart)
+        if curMatch:
+            filters.append((curMatch.group(1), curMatch.group(2), curMatch.group(3)))
+        else:
+            sessionNames.append(curPart)
+    return sessionNames, filters
+
+def compareValues( value, operator, reference ):
+    """
+    Compare a cell of the sessionDataFile to the value of a filter
+    The values are compared as numbers if both are numbers and as strings otherwise
+
+    >>> compareValues('10', '>', '9'), compareValues('b', '>', 'a'), compareValues('4.0', '=', '4')
+    (True, True, True)
+    """
+    try:
+        value, reference = float(value), float(reference)
+    except ValueError:
+        pass
+    if operator == '=' or operator == '==':
+        return value == reference
+    if operator == '!=':
+        return value != reference
+    if operator == '>':
+        return value > reference
+    if operator == '<':
+        return value < reference
+    if operator == '>=':
+        return value >= reference
+    return value <= reference
+
+def selectSessions( sessions, settings, selector ):
+    """
+    Return the sessions that are named in the selector and that pass all of its filters
+    If the selector doesn't name sessions all sessions that pass the filters are returned
+    """
+    sessionNames, filters = parseSessionSelector(selector)
+    knownNames = set([curSession.sessionName for curSession in sessions])
+    for curName in sessionNames:
+        if not curName in knownNames:
+            print 'Error in selectSessions: Session {} is not in the study'.format(curName)
+            raise ValueError
+
+    if sessionNames:
+        sessions = [curSession for curSession in sessions if curSession.sessionName in sessionNames]
+    if not filters:
+        return sessions
+
+    #the filters need the columns of the spreadsheet
+    if not settings['General']['sessionDataFile']:
+        print 'Error in selectSessions: Filters like {} need a sessionDataFile'.format(''.join(filters[0]))
+        raise ValueError
+    headers, rows = readSessionTable(settings)
+    for curColumn, curOperator, curValue in filters:
+        if not curColumn in headers:
+            print 'Error in selectSessions: Column {} is not in the sessionDataFile'.format(curColumn)
+            raise ValueError
+
+    #the columns are looked up once and the cells missing at the end of short rows are empty
+    columnFilters = [(headers.index(curColumn), curOperator, curValue) for curColumn, curOperator, curValue in filters]
+    selectedNames = set()
+    for curRow in rows:
+        if not curRow:
+            continue
+        if all([compareValues(curRow[curIndex] if curIndex < len(curRow) else '', curOperator, curValue) for curIndex, curOperator, curValue in columnFilters]):
+            selectedNames.add(curRow[0])
+    return [curSession for curSession in sessions if curSession.sessionName in selectedNames]
@@ -10,6 +10,33 @@ and typed and case-insenstive access to key-value pairs in the sections
 from ConfigParser import ConfigParser
 from os.path import dirname, exists, realpath, dirname
 
+def convertSettingValue( value ):
+    """
+    Convert the value of a setting to its type
+    yes, no, true and false are returned as booleans
+    Integers are returned as integers
+    Floats are returned as floats
+    Everything else is returned as strings (see test coverage of settingsSectionDict)
+    """
+    #check if the value is a bool
+    if value.strip().lower() in ['yes','true']:
+        return True
+    if value.strip().lower() in ['no','false']:
+        return False
+    
+    #check if value is a int
+    if value.strip().isdigit():
+        return int(value)
+    
+    #try to convert it to a float
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    
+    #return it as a string
+    return value
+
 class settingsSectionDict():
     """
     A subclass of the settingsStruct that provides case insensitive and typed access to key value pairs
@@ -31,12 +58,17 @@ class settingsSectionDict():
     -42.123
     >>> len(d)
     7
+    >>> d.get('G')
+    100
+    >>> d.get('missing', 'default')
+    'default'
     """
     def __init__(self, d):
         """
         Make sure all keys are lower case to allow case insenstive access to the dict
         """
         self._d = {key.lower():d[key] for key in d }
+        self._typed = {key:convertSettingValue(self._d[key]) for key in self._d}
 
     def __iter__(self):
         """
@@ -54,34 +86,17 @@ class settingsSectionDict():
     def __getitem__(self, key):
         """
         Provide case insentive access to the key value pairs
-        Beyond this yes, no, true and false are returned as booleans
-        Integers are returned as integers
-        Floats are returned as floats
-        Everything else is returned as strings (see test coverage on class level)
+        The values are converted by convertSettingValue when the dict is created
         """
-        #retrieve the value
-        curValue = self._d[key.lower().strip()]
-        
-        #check if the value is a bool
-        if curValue.strip().lower() in ['yes','true']:
-            return True
-        if curValue.strip().lower() in ['no','false']:
-            return False
-        
-        #check if value is a int
-        if curValue.strip().isdigit():
-            return int(curValue)
-        
-        #try to convert it to a float
-        try:
-            curValue = float(curValue)
-            return curValue
-        except ValueError:
-            pass
-        
-        #return it as a string
-        return curValue
+        return self._typed[key.lower().strip()]
     
+    def get(self, key, default = None):
+        """
+        Like the [] operator but returns default if the key doesn't exist
+        This allows optional settings that older settings files don't have
+        """
+        return self._typed.get(key.lower().strip(), default)
+
     def __str__(self):
         """
         Return a string representation of the dict.
@@ -101,6 +116,11 @@ class settingsStruct(ConfigParser):
     'LogFile'
     >>> settings['FileExtension']['ChAtLoG']
     'csv'
+    >>> settings['FilePrefix'] is settings['FilePrefix']
+    True
+    >>> settings.set('FilePrefix', 'logFile', 'Log')
+    >>> settings['FilePrefix']['logFile']
+    'Log'
     """
     #TODO add doctest for basepath and scriptPath
 
@@ -110,6 +130,8 @@ class settingsStruct(ConfigParser):
         we can't use the super method to call the base class constructor. We check with isinstance if it is
         an old-type class. This should provide safety for future improvements of ConfigParser
         """
+        #the typed section dicts that have been built so far
+        self._sectionDicts = {}
         if not isinstance(ConfigParser, type):
             ConfigParser.__init__(self)
         else:
@@ -142,13 +164,39 @@ class settingsStruct(ConfigParser):
         Returns a Case insenstive Dict that returns correct types not just values
         Can be accessed via the [] operator.
         This is the way key value pairs should be accessed
-        It isn't fast or space efficient since every lookup requires a new dict to be created
-        but with the file sizes we are working with this isn't an issue
-        """
-        parameters = {}
-        for curKey in self.options(section):
-            parameters[curKey] = self.get(section, curKey)
-        return settingsSectionDict(parameters)
+        The dict of a section is built once and reused until the settings are changed
+        """
+        if not section in self._sectionDicts:
+            parameters = {}
+            for curKey in self.options(section):
+                parameters[curKey] = self.get(section, curKey)
+            self._sectionDicts[section] = settingsSectionDict(parameters)
+        return self._sectionDicts[section]
+
+    #every change of the parser drops the section dicts since values can refer to other values
+    def set(self, section, option, value = None):
+        self._sectionDicts = {}
+        return ConfigParser.set(self, section, option, value)
+
+    def read(self, filenames):
+        self._sectionDicts = {}
+        return ConfigParser.read(self, filenames)
+
+    def readfp(self, fp, filename = None):
+        self._sectionDicts = {}
+        return ConfigParser.readfp(self, fp, filename)
+
+    def add_section(self, section):
+        self._sectionDicts = {}
+        return ConfigParser.add_section(self, section)
+
+    def remove_section(self, section):
+        self._sectionDicts = {}
+        return ConfigParser.remove_section(self, section)
+
+    def remove_option(self, section, option):
+        self._sectionDicts = {}
+        return ConfigParser.remove_option(self, section, option)
     
 if __name__ == '__main__':
     settings = settingsStruct('../Test Study/settings.ini')
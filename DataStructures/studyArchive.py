@@ -0,0 +1,264 @@
+"""
+Read the files of a study straight from a zip or tar archive and from gzip compressed files
+without extracting them. An archive is registered for the data folder it stands in for and
+from then on openStudyFile opens every file below that folder from the archive. If a file
+doesn't exist but a file with the same name and a .gz extension does, that one is opened and
+decompressed while it is read, both on disk and in archives.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from os import getpid
+from os.path import exists, getsize, getmtime
+from io import BytesIO
+from calendar import timegm
+from threading import Lock
+import zipfile
+import tarfile
+import struct
+import gzip
+
+#the archives that stand in for data folders as datafolder: studyArchive
+registeredArchives = {}
+
+#the prefetchers that read the files ahead of openStudyFile (see studyPrefetch)
+filePrefetchers = []
+
+class universalNewlineFile:
+    """
+    Normalize the line endings of a file object to \\n like the U mode of open does
+    The csv files of the study are read that way but archive members and gzip files don't support it
+
+    >>> fp = universalNewlineFile(BytesIO('a,b\\r\\nc\\rd\\n'))
+    >>> list(fp)
+    ['a,b\\n', 'c\\n', 'd\\n']
+    """
+    def __init__(self, fp):
+        self.fp = fp
+
+    def read(self):
+        return self.fp.read().replace('\r\n', '\n').replace('\r', '\n')
+
+    def __iter__(self):
+        #every line ends with \n so a \r\n is never split between two lines
+        for curLine in self.fp:
+            for curPart in curLine.replace('\r\n', '\n').replace('\r', '\n').splitlines(True):
+                yield curPart
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class studyArchive:
+    """
+    A zip or tar archive with the session folders of a study
+    The members are found by their session folder and filename, so it doesn't matter which
+    folders the session folders are in inside of the archive. The archive offers the same
+    hasSession, sessionNames and fileInfo as the studyManifest so sessionData can use either.
+    """
+    def __init__(self, archiveFilename, dataFolder):
+        self.archiveFilename = archiveFilename
+        self.dataFolder = dataFolder
+
+        #the members as session: {filename: (member, size, mtime)}
+        self.sessions = {}
+        if zipfile.is_zipfile(archiveFilename):
+            self.archive = zipfile.ZipFile(archiveFilename, 'r')
+            for curInfo in self.archive.infolist():
+                if not curInfo.filename.endswith('/'):
+                    self.addMember(curInfo.filename, curInfo, curInfo.file_size, timegm(curInfo.date_time + (0, 0, -1)))
+        elif tarfile.is_tarfile(archiveFilename):
+            self.openTar()
+            for curInfo in self.archive.getmembers():
+                if curInfo.isfile():
+                    self.addMember(curInfo.name, curInfo, curInfo.size, curInfo.mtime)
+        else:
+            print 'Error in studyArchive: {} is neither a zip nor a tar archive'.format(archiveFilename)
+            raise IOError
+
+    def openTar(self):
+        #every process needs its own file of the archive since the members are read from it
+        self.archive = tarfile.open(self.archiveFilename, 'r:*')
+        self.pid = getpid()
+        self.lock = Lock()
+
+    def addMember(self, memberName, member, size, mtime):
+        parts = memberName.split('/')
+        if len(parts) < 2:
+            return
+        self.sessions.setdefault(parts[-2], {})[parts[-1]] = (member, size, mtime)
+
+    def sessionNames(self):
+        return self.sessions.keys()
+
+    def hasSession(self, sessionName):
+        return sessionName in self.sessions
+
+    def fileInfo(self, sessionName, filename):
+        """
+        Return [size, mtime] of a file in a session folder or None if it isn't in the archive
+        """
+        member = self.sessions.get(sessionName, {}).get(filename)
+        return [member[1], member[2]] if member else None
+
+    def findMember(self, relativeName):
+        """
+        Return the member for a filename relative to the data folder or None if there is none
+        """
+        parts = relativeName.split('/')
+        if len(parts) < 2:
+            return None
+        member = self.sessions.get(parts[-2], {}).get(parts[-1])
+        return member[0] if member else None
+
+    def open(self, relativeName):
+        """
+        Open a file relative to the data folder, a .gz member is decompressed while it is read
+        """
+        member = self.findMember(relativeName)
+        if member is None and self.findMember(relativeName + '.gz') is not None:
+            #gzip has to seek in the compressed data which the archive members don't allow
+            return gzip.GzipFile(fileobj = BytesIO(self.openMember(self.findMember(relativeName + '.gz')).read()))
+        if member is None:
+            print 'Error in studyArchive: {} is not in {}'.format(relativeName, self.archiveFilename)
+            raise IOError
+        return self.openMember(member)
+
+    def openMember(self, member):
+        #zip members get a file of their own but the members of a tar share the one of the
+        #archive, so they are read whole by one thread at a time
+        if isinstance(self.archive, zipfile.ZipFile):
+            return self.archive.open(member)
+        if self.pid != getpid():
+            self.openTar()
+        with self.lock:
+            return BytesIO(self.archive.extractfile(member).read())
+
+def registerStudyArchive( archive ):
+    """
+    Open the files below the data folder of the archive from the archive from now on
+    """
+    registeredArchives[archive.dataFolder] = archive
+
+def loadStudyArchive( settings ):
+    """
+    Open the studyArchive of the studyArchive setting of the General section and register it for the data folder
+    """
+    archive = studyArchive(settings['General']['studyArchive'], settings['General']['datafolder'])
+    registerStudyArchive(archive)
+    return archive
+
+def findStudyArchive( filename ):
+    """
+    Return the registered archive that has the file and the filename relative to its data folder
+    or None, None if the file isn't below the data folder of a registered archive
+    """
+    for curFolder, curArchive in registeredArchives.items():
+        if filename.startswith(curFolder):
+            return curArchive, filename[len(curFolder):]
+    return None, None
+
+def isGzipStudyFile( filename ):
+    """
+    Check if a file on disk is read from its gzip compressed version
+    """
+    return filename.endswith('.gz') or (not exists(filename) and exists(filename + '.gz'))
+
+def isPlainStudyFile( filename ):
+    """
+    Check if a file is read from disk as it is, which is what memory mapping it needs
+    """
+    return findStudyArchive(filename)[0] is None and not isGzipStudyFile(filename)
+
+def openStudyFile( filename, mode = 'r' ):
+    """
+    Open a file of the study for reading from a registered archive, gzip compressed or from disk
+    With U in the mode the line endings are normalized no matter where the file comes from
+
+    >>> fp = openStudyFile('Test Study/settings.ini', 'rU')
+    >>> fp.read().startswith('[General]')
+    True
+    """
+    #files that were read ahead are handed out from memory
+    for curPrefetcher in filePrefetchers:
+        data = curPrefetcher.take(filename)
+        if data is not None:
+            fp = BytesIO(data)
+            return universalNewlineFile(fp) if 'U' in mode else fp
+    return openStoredFile(filename, mode)
+
+def openStoredFile( filename, mode = 'r' ):
+    """
+    Open a file of the study from a registered archive, gzip compressed or from disk without
+    looking at the prefetched files
+    """
+    archive, relativeName = findStudyArchive(filename)
+    if archive:
+        fp = archive.open(relativeName)
+    elif isGzipStudyFile(filename):
+        fp = gzip.open(filename if filename.endswith('.gz') else filename + '.gz', 'rb')
+    else:
+        return open(filename, mode)
+
+    if 'U' in mode:
+        return universalNewlineFile(fp)
+    return fp
+
+def studyFileInfo( filename ):
+    """
+    Return [size, mtime] of a file of the study or None if it doesn't exist
+    For compressed files this is the size of the compressed data
+    """
+    archive, relativeName = findStudyArchive(filename)
+    if archive:
+        parts = relativeName.split('/')
+        if len(parts) < 2:
+            return None
+        return archive.fileInfo(parts[-2], parts[-1]) or archive.fileInfo(parts[-2], parts[-1] + '.gz')
+    if not exists(filename):
+        filename += '.gz'
+        if not exists(filename):
+            return None
+    return [getsize(filename), getmtime(filename)]
+
+def gzipDataSize( fp ):
+    """
+    Return the size of the uncompressed data of a gzip file from the last 4 bytes of the file,
+    where gzip stores it modulo 2**32. A file that is too short for that is taken as empty
+
+    >>> data = BytesIO()
+    >>> gz = gzip.GzipFile(fileobj = data, mode = 'wb')
+    >>> gz.write('a,b\\n' * 100)
+    400
+    >>> gz.close()
+    >>> gzipDataSize(BytesIO(data.getvalue())), gzipDataSize(BytesIO(''))
+    (400, 0)
+    """
+    fp.seek(0, 2)
+    if fp.tell() < 4:
+        return 0
+    fp.seek(-4, 2)
+    return struct.unpack('<I', fp.read(4))[0]
+
+def studyFileSize( filename ):
+    """
+    Return the size of the data of a file of the study or None if it doesn't exist
+    Unlike studyFileInfo this is the uncompressed size for files that are read from their
+    gzip compressed version, so it is the size of what openStudyFile reads
+    """
+    archive, relativeName = findStudyArchive(filename)
+    if archive:
+        if archive.findMember(relativeName) is None and archive.findMember(relativeName + '.gz') is not None:
+            return gzipDataSize(BytesIO(archive.openMember(archive.findMember(relativeName + '.gz')).read()))
+        fileInfo = studyFileInfo(filename)
+        return fileInfo[0] if fileInfo else None
+    if isGzipStudyFile(filename):
+        with open(filename if filename.endswith('.gz') else filename + '.gz', 'rb') as fp:
+            return gzipDataSize(fp)
+    return getsize(filename) if exists(filename) else None
@@ -0,0 +1,125 @@
+"""
+A manifest of the session folders of a study and the files in them. It is built with one
+scandir walk over the data folder and stored as json next to the results. When it is loaded
+again only the folders whose modification time changed are listed again, so enumerating a
+large study on a network share doesn't have to stat every file.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+from os import stat
+from os.path import exists
+import json
+
+def scanFolder( folder ):
+    """
+    List a folder with scandir and return its files as a dict of name: [size, mtime]
+    and the names of its sub folders
+    """
+    files = {}
+    folders = []
+    for curEntry in scandir(folder):
+        if curEntry.is_dir():
+            folders.append(curEntry.name)
+        else:
+            curStat = curEntry.stat()
+            files[curEntry.name] = [curStat.st_size, curStat.st_mtime]
+    return files, folders
+
+class studyManifest:
+    """
+    The session folders of a data folder with the size and mtime of every file in them
+    The manifest is revalidated when it is loaded. A folder is only listed again if its
+    mtime changed, which happens when files are added, removed or renamed in it. Files that
+    are changed in place keep their old size and mtime in the manifest.
+    If no filename is given the manifest only lives in memory.
+    """
+    version = 1
+
+    def __init__(self, dataFolder, filename = None):
+        self.dataFolder = dataFolder
+        self.filename = filename
+        self.folderMtime = None
+        self.sessions = {}
+        self.changed = False
+
+        #load the manifest if there is one for the same data folder and with the right version
+        if filename and exists(filename):
+            with open(filename, 'r') as fp:
+                manifestData = json.load(fp)
+            if manifestData.get('version') == self.version and manifestData.get('dataFolder') == dataFolder:
+                #json hands back unicode but the names have to match the byte strings from scandir
+                self.folderMtime = manifestData['folderMtime']
+                for curSession, curData in manifestData['sessions'].items():
+                    self.sessions[curSession.encode('utf-8')] = {'mtime': curData['mtime'],
+                                                                 'files': {curFile.encode('utf-8'): curData['files'][curFile] for curFile in curData['files']}}
+
+        self.revalidate()
+
+    def revalidate(self):
+        """
+        Bring the manifest up to date with the data folder
+        The data folder is only listed again if its mtime changed, otherwise the known
+        session folders are checked one stat each
+        """
+        folderMtime = stat(self.dataFolder).st_mtime
+        if folderMtime != self.folderMtime:
+            files, sessionNames = scanFolder(self.dataFolder)
+            for curSession in self.sessions.keys():
+                if not curSession in sessionNames:
+                    del self.sessions[curSession]
+            self.folderMtime = folderMtime
+            self.changed = True
+        else:
+            sessionNames = self.sessions.keys()
+
+        for curSession in sessionNames:
+            curMtime = stat(self.dataFolder + curSession).st_mtime
+            if not curSession in self.sessions or self.sessions[curSession]['mtime'] != curMtime:
+                self.sessions[curSession] = {'mtime': curMtime, 'files': scanFolder(self.dataFolder + curSession)[0]}
+                self.changed = True
+
+    def sessionNames(self):
+        """
+        Return the names of all session folders in alphabetical order
+        """
+        return sorted(self.sessions)
+
+    def hasSession(self, sessionName):
+        return sessionName in self.sessions
+
+    def fileInfo(self, sessionName, filename):
+        """
+        Return the size and mtime of a file in a session folder or None if it doesn't exist
+        """
+        if not sessionName in self.sessions:
+            return None
+        return self.sessions[sessionName]['files'].get(filename)
+
+    def save(self):
+        """
+        Write the manifest back to disk if it has a file and something changed
+        """
+        if not self.filename or not self.changed:
+            return
+        with open(self.filename, 'w+') as fp:
+            json.dump({'version': self.version, 'dataFolder': self.dataFolder, 'folderMtime': self.folderMtime, 'sessions': self.sessions}, fp)
+        self.changed = False
+
+def loadStudyManifest( settings ):
+    """
+    Load and revalidate the manifest of the study in the optional studyManifestFilename of
+    the General section and store it if it changed. Returns None if no manifest is set
+    """
+    manifestFilename = settings['General'].get('studyManifestFilename')
+    if not manifestFilename:
+        return None
+
+    manifest = studyManifest(settings['General']['datafolder'], manifestFilename)
+    manifest.save()
+    return manifest
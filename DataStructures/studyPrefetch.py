@@ -0,0 +1,139 @@
+"""
+Read the files of a study ahead of the evaluators with a few threads. On a network share most
+of the time of opening a file is spent waiting, so while one file is parsed the next ones are
+already read into memory. The files are read in the order of a plan and handed out by
+openStudyFile when they are opened, so the parsers don't notice where the bytes came from.
+The files that are held in memory are limited by a byte budget.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from studyArchive import filePrefetchers, openStoredFile, studyFileInfo
+from threading import Thread, Condition
+
+class studyFilePrefetcher:
+    """
+    Read the files of the plan with several threads in the order of the plan
+    A thread only starts on a file if the files that are held and read at the moment stay
+    within byteBudget, except for the next file that will be taken which is always read.
+    When a file is taken the files before it in the plan are stale and are dropped.
+    Files that are not in the plan or that could not be read are opened as usual.
+
+    >>> prefetcher = studyFilePrefetcher(['Test Study/settings.ini'], 2)
+    >>> prefetcher.take('Test Study/settings.ini').startswith('[General]')
+    True
+    >>> prefetcher.take('Test Study/settings.ini') is None
+    True
+    >>> prefetcher.close()
+    """
+    def __init__(self, plan, threads = 4, byteBudget = 64 * 1024 * 1024):
+        #every file is read once so only the first time it is in the plan counts
+        self.plan = []
+        self.planIndex = {}
+        for curFilename in plan:
+            if not curFilename in self.planIndex:
+                self.planIndex[curFilename] = len(self.plan)
+                self.plan.append(curFilename)
+
+        self.byteBudget = byteBudget
+        self.condition = Condition()
+        self.nextRead = 0
+        self.nextTaken = 0
+        self.heldBytes = 0
+        self.loaded = {}
+        self.closed = False
+
+        self.threads = [Thread(target = self.readFiles) for curThread in range(threads)]
+        for curThread in self.threads:
+            curThread.daemon = True
+            curThread.start()
+        filePrefetchers.append(self)
+
+    def readFiles(self):
+        """
+        The loop of the threads that read the files of the plan one after the other
+        """
+        while True:
+            with self.condition:
+                if self.closed or self.nextRead >= len(self.plan):
+                    return
+                index = self.nextRead
+                self.nextRead += 1
+            filename = self.plan[index]
+            fileInfo = studyFileInfo(filename)
+            size = fileInfo[0] if fileInfo else 0
+
+            #wait until the file fits into the budget or the consumer needs it next
+            with self.condition:
+                while not self.closed and index > self.nextTaken and self.heldBytes + size > self.byteBudget:
+                    self.condition.wait()
+                if self.closed or index < self.nextTaken:
+                    continue
+                self.heldBytes += size
+
+            try:
+                with openStoredFile(filename, 'rb') as fp:
+                    data = fp.read()
+            except (IOError, OSError):
+                data = None
+
+            with self.condition:
+                self.heldBytes -= size
+                if not self.closed and index >= self.nextTaken:
+                    self.loaded[index] = data
+                    if data is not None:
+                        self.heldBytes += len(data)
+                self.condition.notify_all()
+
+    def take(self, filename):
+        """
+        Return the content of a file of the plan and wait for it if it is read at the moment
+        Returns None if the file isn't in the plan, was taken already or couldn't be read
+        """
+        index = self.planIndex.get(filename)
+        with self.condition:
+            if index is None or index < self.nextTaken or self.closed:
+                return None
+
+            #drop the stale files that were skipped by the consumer
+            for curIndex in range(self.nextTaken, index):
+                self.dropLoaded(curIndex)
+            self.nextTaken = index
+            self.condition.notify_all()
+
+            while not index in self.loaded and not self.closed:
+                self.condition.wait()
+            self.nextTaken = index + 1
+            self.condition.notify_all()
+            return self.dropLoaded(index)
+
+    def dropLoaded(self, index):
+        #remove a file from memory and give its bytes back to the budget
+        data = self.loaded.pop(index, None)
+        if data is not None:
+            self.heldBytes -= len(data)
+        return data
+
+    def close(self):
+        """
+        Stop reading ahead and drop everything that wasn't taken
+        """
+        with self.condition:
+            self.closed = True
+            self.loaded = {}
+            self.condition.notify_all()
+        for curThread in self.threads:
+            curThread.join()
+        filePrefetchers.remove(self)
+
+def startPrefetch( settings, plan ):
+    """
+    Start a studyFilePrefetcher for the plan if prefetchThreads is set in the General section
+    The optional prefetchBudget of the General section is the byte budget in MB
+    Returns None if nothing is prefetched
+    """
+    threads = settings['General'].get('prefetchThreads', 0)
+    if not threads or not plan:
+        return None
+    return studyFilePrefetcher(plan, threads, settings['General'].get('prefetchBudget', 64) * 1024 * 1024)
@@ -0,0 +1,106 @@
+"""
+Helpers to split a study into shards that are processed on different machines. Every session
+is assigned to a shard by a stable hash of its name and every shard writes its results to
+files of its own that the merge command combines afterwards.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from os.path import splitext
+from zlib import crc32
+import csv
+
+def parseShard( shard ):
+    """
+    Parse a shard given as 'i/N' into the index and the number of shards
+    
+    >>> parseShard('2/4')
+    (2, 4)
+    >>> parseShard('5/4')
+    Traceback (most recent call last):
+    .
+    ValueError
+    """
+    try:
+        index, count = [int(curPart) for curPart in shard.split('/')]
+    except ValueError:
+        index, count = 0, 0
+    if count < 1 or index < 1 or index > count:
+        print 'Shard {} is not valid. Use i/N with 1 <= i <= N.'.format(shard)
+        raise ValueError
+    return index, count
+
+def isSessionInShard( sessionName, shard ):
+    """
+    Check if a session belongs to a shard. The crc32 of the session name doesn't change
+    between runs or machines, so all machines agree on the shards
+    
+    >>> [isSessionInShard('Session 01', curShard) for curShard in ['1/2', '2/2']].count(True)
+    1
+    >>> isSessionInShard('Session 01', '1/1')
+    True
+    """
+    index, count = parseShard(shard)
+    return (crc32(sessionName) & 0xffffffff) % count == index - 1
+
+def getShardFilename( filename, shard, suffix = '' ):
+    """
+    Return the name of the file a shard writes instead of filename
+    
+    >>> getShardFilename('Results/scores.csv', '2/4')
+    'Results/scores.shard2of4.csv'
+    >>> getShardFilename('Results/newgrid.json', '1/4', '.firstAnswers')
+    'Results/newgrid.shard1of4.firstAnswers.json'
+    """
+    index, count = parseShard(shard)
+    root, extension = splitext(filename)
+    return '{}.shard{}of{}{}{}'.format(root, index, count, suffix, extension)
+
+#the settings with the files the scoring and log analysis write besides the ResultFiles section
+shardedOutputSettings = [('Scoring', 'New Grid Answers Json'),
+                         ('Scoring', 'New Grid Answers Txt'),
+                         ('Memory', 'New Words File')]
+
+def getShardedOutputSettings( settings ):
+    """
+    Return the (section, key) of every setting that names an output file
+    """
+    outputSettings = [('ResultFiles', curKey) for curKey in settings.options('ResultFiles')]
+    outputSettings += shardedOutputSettings
+    if settings.has_section('Brainstorming'):
+        outputSettings += [('Brainstorming', curKey) for curKey in settings.options('Brainstorming') if curKey.endswith('new answers')]
+    return [(curSection, curKey) for curSection, curKey in outputSettings
+            if settings.has_option(curSection, curKey) and not curKey.lower() in ['basepath', 'scriptpath']]
+
+def applyShardToSettings( settings, shard ):
+    """
+    Restrict the study to one shard and point all output files to the files of the shard
+    readStudy only returns the sessions of the shard afterwards
+    """
+    parseShard(shard)
+    settings.set('General', 'shard', shard)
+    for curSection, curKey in getShardedOutputSettings(settings):
+        curValue = settings[curSection][curKey]
+        if isinstance(curValue, str) and curValue:
+            settings.set(curSection, curKey, getShardFilename(curValue, shard).replace('%', '%%'))
+
+def mergeSessionFiles( shardFilenames, outFilename ):
+    """
+    Merge csv files of the shards of a study that have a header and the session in the first column
+    The rows are ordered by session like readStudy orders them and keep their order within a session
+    """
+    allRows = []
+    for curFilename in shardFilenames:
+        with open(curFilename, 'rb') as fp:
+            #files written with QUOTE_ALL start with a quote
+            firstChar = fp.read(1)
+            fp.seek(0)
+            csvReader = csv.reader(fp)
+            header = csvReader.next()
+            allRows += list(csvReader)
+
+    allRows.sort(key = lambda curRow: curRow[0])
+    with open(outFilename, 'w+') as fp:
+        resCSV = csv.writer(fp, delimiter = ',', quotechar='"', quoting = csv.QUOTE_ALL if firstChar == '"' else csv.QUOTE_MINIMAL)
+        resCSV.writerows([header] + allRows)
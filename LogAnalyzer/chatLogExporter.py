@@ -6,29 +6,122 @@ This module provides functions to export the chat logs
 """
 
 from DataStructures.sessionData import readStudy
-from os.path import exists
+from os import close, remove
+from os.path import exists, dirname
+from multiprocessing import Pool
+from functools import partial
+from shutil import copyfileobj
+from tempfile import mkstemp
+from logFileCache import readLogRows
 import csv
+import gzip
 
-def exportChatLogsForFile( logFilename, outFilename ):
-	with open(logFilename,'rU') as f:
-		chatreader=csv.reader(f)
-		allchatline=[]
-		for row in chatreader:
-			if 'Chat' in row[1]: 
-				chats = [row[9], row[4], row [2]]
-				allchatline.append(chats)
-	with open(outFilename, 'wb') as newf:
-		chatwriter=csv.writer(newf, delimiter= ',')
-		heading=['Date', 'UserID', 'Chat']
-		chatwriter.writerow(heading)
-		chatwriter.writerows(allchatline)
-
-	
-def exportChatLogs( settings ):
+#the header of the exported chat log files
+chatLogHeading = ['Date', 'UserID', 'Chat']
+
+def exportChatRows( logRows, chatWriter, prefix = [] ):
+    """
+    Pass the rows of a log file through and write every chat row to the csv writer on the way
+    This allows other consumers of the log to export the chat log from the same read
+    The values in prefix are written in front of every chat row
+    """
+    for row in logRows:
+        if 'Chat' in row[1]:
+            chatWriter.writerow(prefix + [row[9], row[4], row[2]])
+        yield row
+
+def writeChatRows( logFilename, fp, logCacheFolder = None, prefix = [] ):
+    """
+    Stream the chat rows of a log file straight to an open output file
+    """
+    chatwriter=csv.writer(fp, delimiter= ',')
+    for row in exportChatRows(readLogRows(logFilename, logCacheFolder), chatwriter, prefix):
+        pass
+
+def openChatLogFile( outFilename, compress = False ):
+    """
+    Open an output file for a chat log, compressed files get a .gz appended
+    """
+    if compress:
+        return gzip.open(outFilename + '.gz', 'wb')
+    return open(outFilename, 'wb')
+
+def exportChatLogsForFile( logFilename, outFilename, logCacheFolder = None, compress = False ):
+    with openChatLogFile(outFilename, compress) as newf:
+        chatwriter=csv.writer(newf, delimiter= ',')
+        chatwriter.writerow(chatLogHeading)
+        writeChatRows(logFilename, newf, logCacheFolder)
+
+def exportChatLogsForFileWorker( filenames, logCacheFolder = None, compress = False ):
+    """
+    Unpacks the log and chat log filename of a session for Pool.map
+    """
+    exportChatLogsForFile(filenames[0], filenames[1], logCacheFolder, compress)
+
+def exportChatLogPart( sessionFiles, logCacheFolder = None ):
+    """
+    Write the chat rows of a session to a temporary part of the consolidated chat log
+    sessionFiles holds the session name, the log filename and the filename of the part
+    Returns the filename of the part
+    """
+    sessionName, logFilename, partFilename = sessionFiles
+    with open(partFilename, 'wb') as fp:
+        writeChatRows(logFilename, fp, logCacheFolder, [sessionName])
+    return partFilename
+
+def exportConsolidatedChatLog( sessions, outFilename, logCacheFolder = None, compress = False, pool = None ):
+    """
+    Write the chat of all sessions into one study level file with the session as first column
+    With a pool every session is written to a temporary part in parallel and the parts are
+    appended to the output in session order
+    """
+    with openChatLogFile(outFilename, compress) as outFP:
+        csv.writer(outFP, delimiter= ',').writerow(['Session'] + chatLogHeading)
+        if pool is None:
+            for curSession in sessions:
+                writeChatRows(curSession['Logfile'], outFP, logCacheFolder, [curSession.sessionName])
+            return
+
+        #create the parts next to the output file
+        partFilenames = []
+        try:
+            for curSession in sessions:
+                partHandle, partFilename = mkstemp(suffix = '.csv', dir = dirname(outFilename) or None)
+                close(partHandle)
+                partFilenames.append(partFilename)
+
+            sessionFiles = [(curSession.sessionName, curSession['Logfile'], curPart) for curSession, curPart in zip(sessions, partFilenames)]
+            for curPart in pool.imap(partial(exportChatLogPart, logCacheFolder = logCacheFolder), sessionFiles):
+                with open(curPart, 'rb') as partFP:
+                    copyfileobj(partFP, outFP)
+        finally:
+            for curPart in partFilenames:
+                remove(curPart)
+
+def exportChatLogs( settings, jobs = 1, compress = False, consolidate = False ):
+    """
+    Export the chat of all sessions. The rows are streamed from the logs to the outputs
+    If jobs is larger than one the sessions are exported in a pool of that many processes
+    compress writes gzip compressed files and consolidate writes all chat into the one
+    study level consolidatedChatLogFilename instead of one file per session
+    """
     #read the sessions
     sessions = readStudy(settings)
+    logCacheFolder = settings['General'].get('logCacheFolder')
+    pool = Pool(jobs) if jobs > 1 else None
 
-    #cycle the sessions
-    for curSession in sessions:
-        #call the functions that export the log file for that session
-        exportChatLogsForFile(curSession['Logfile'], curSession['ChatLog'])
+    try:
+        if consolidate:
+            exportConsolidatedChatLog(sessions, settings['ResultFiles']['consolidatedChatLogFilename'], logCacheFolder, compress, pool)
+        elif pool:
+            sessionFiles = [(curSession['Logfile'], curSession['ChatLog']) for curSession in sessions]
+            pool.map(partial(exportChatLogsForFileWorker, logCacheFolder = logCacheFolder, compress = compress), sessionFiles)
+        else:
+            #cycle the sessions
+            for curSession in sessions:
+                #call the functions that export the log file for that session
+                exportChatLogsForFile(curSession['Logfile'], curSession['ChatLog'], logCacheFolder, compress)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
@@ -0,0 +1,147 @@
+"""
+Columnar engine for the log file metrics. Instead of walking the log row by row
+the event, subject and data columns are loaded once, the subjects and event types
+are interned to integer codes and all counts are computed with numpy operations.
+The result is the same list that analyzeLogMetrics returns.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+import numpy as np
+from itertools import islice
+from logFileTools import getStdOfDict
+from logMetricRegistry import registeredLogMetrics, analyzeRegisteredLogMetrics
+
+def internColumn( values ):
+    """
+    Map a list of strings to integer codes. Returns the codes as an array and the
+    list of distinct values so that values[i] == names[codes[i]]
+    
+    >>> codes, names = internColumn(['b', 'a', 'b', 'c'])
+    >>> codes.tolist()
+    [1, 0, 1, 2]
+    >>> names
+    ['a', 'b', 'c']
+    >>> codes, names = internColumn([])
+    >>> len(codes), names
+    (0, [])
+    """
+    if not len(values):
+        return np.zeros(0, np.int64), []
+
+    names, codes = np.unique(np.array(values), return_inverse = True)
+    return codes.astype(np.int64), names.tolist()
+
+def getPerPersonCounts( subjectCodes, subjectNames, weights = None ):
+    """
+    Count the events (or sum the weights) per subject code with bincount.
+    Returns the subject codes in the order of their first appearance together with their counts
+    
+    >>> codes, counts = getPerPersonCounts(np.array([2, 0, 2, 2]), ['a', 'b', 'c'])
+    >>> codes.tolist(), counts.tolist()
+    ([2, 0], [3, 1])
+    """
+    if not len(subjectCodes):
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+
+    uniqueCodes, firstIndex = np.unique(subjectCodes, return_index = True)
+    uniqueCodes = uniqueCodes[np.argsort(firstIndex, kind = 'mergesort')]
+    counts = np.bincount(subjectCodes, weights, minlength = len(subjectNames))
+    return uniqueCodes, np.round(counts[uniqueCodes]).astype(np.int64)
+
+def computeColumnarMetrics( eventCodes, eventTypes, subjectCodes, subjectNames, chatData, extraResults = [] ):
+    """
+    Compute the metrics from the interned columns of a log file.
+    eventCodes and subjectCodes are integer arrays with one entry per row that index into
+    eventTypes and subjectNames. chatData holds the data column of the chat rows in log order
+    extraResults are the results of the registered metrics (see analyzeRegisteredLogMetrics)
+    Returns the same 18 values as analyzeLogMetrics
+    """
+    #classify the distinct event types once and broadcast that to the rows
+    isChatType = np.array([curType == 'Chat' for curType in eventTypes], bool)
+    isGridType = np.array([curType == 'Edit Grid' for curType in eventTypes], bool)
+    isPadType = np.array([curType.startswith('Edit pad') for curType in eventTypes], bool)
+
+    chatMask = isChatType[eventCodes]
+    gridMask = isGridType[eventCodes]
+    padMask = isPadType[eventCodes]
+
+    #words are counted the same way as split(' ') does it
+    if len(chatData):
+        chatWords = np.char.count(np.array(chatData, str), ' ') + 1
+    else:
+        chatWords = np.zeros(0, np.int64)
+
+    #the dicts are filled in order of first appearance like the row by row version
+    #so the std values are computed over the counts in exactly the same order
+    perPersonResults = []
+    for curMask, curWeights in [(chatMask, None), (chatMask, chatWords), (gridMask, None), (padMask, None)]:
+        curCodes, curCounts = getPerPersonCounts(subjectCodes[curMask], subjectNames, curWeights)
+        perPersonResults.append(dict(zip([subjectNames[curCode] for curCode in curCodes], curCounts.tolist())))
+
+    #the order of the per person dicts in the result is chat, words, grid, pad
+    return [int(np.count_nonzero(chatMask)),
+            int(chatWords.sum()),
+            int(np.count_nonzero(gridMask)),
+            int(np.count_nonzero(padMask))] \
+         + [getStdOfDict(curCounts) for curCounts in perPersonResults] \
+         + [getStdOfDict(curCounts, False) for curCounts in perPersonResults] \
+         + perPersonResults \
+         + [''.join([curChat + ' ' for curChat in chatData])] \
+         + [extraResults]
+
+def analyzeLogMetricsColumnar( logIterable, eventCol = 1, dataCol = 2, subjectCol = 4, chatLines = None ):
+    """
+    Drop in replacement for analyzeLogMetrics that loads the needed columns once
+    and computes all the metrics on integer coded arrays
+    If a list is passed as chatLines a (subject, message) tuple is appended for every chat line
+    """
+    #load the columns and keep the rows for the registered metrics if there are any
+    events = []
+    subjects = []
+    data = []
+    extraRows = [] if registeredLogMetrics else None
+    for curLine in logIterable:
+        events.append(curLine[eventCol])
+        subjects.append(curLine[subjectCol])
+        data.append(curLine[dataCol])
+        if extraRows is not None:
+            extraRows.append(curLine)
+
+    #intern the event types and the subjects
+    eventCodes, eventTypes = internColumn(events)
+    subjectCodes, subjectNames = internColumn(subjects)
+
+    #only the chat lines need their data
+    isChatType = np.array([curType == 'Chat' for curType in eventTypes], bool)
+    chatRows = np.flatnonzero(isChatType[eventCodes])
+    chatData = [data[curRow] for curRow in chatRows]
+    if chatLines is not None:
+        chatLines.extend([(subjects[curRow], data[curRow]) for curRow in chatRows])
+
+    extraResults = analyzeRegisteredLogMetrics(extraRows, eventCol, dataCol, subjectCol) if extraRows is not None else []
+    return computeColumnarMetrics(eventCodes, eventTypes, subjectCodes, subjectNames, chatData, extraResults)
+
+def analyzeLogColumnsCached( columns, eventCol = 1, dataCol = 2, subjectCol = 4, chatLines = None ):
+    """
+    Compute the metrics straight from the logColumns of the log file cache
+    The interned event and subject codes are used as they are, the first row is the header
+    """
+    eventCodes, eventTypes = columns.interned(eventCol)
+    subjectCodes, subjectNames = columns.interned(subjectCol)
+    eventCodes = eventCodes[1:]
+    subjectCodes = subjectCodes[1:]
+
+    #only the chat lines need their data
+    isChatType = np.array([curType == 'Chat' for curType in eventTypes], bool)
+    chatRows = np.flatnonzero(isChatType[eventCodes]) + 1
+    chatData = [columns.value(dataCol, curRow) for curRow in chatRows]
+    if chatLines is not None:
+        chatLines.extend([(columns.value(subjectCol, curRow), curData) for curRow, curData in zip(chatRows, chatData)])
+
+    #the registered metrics need the rows, which are only rebuilt if there are any
+    extraResults = []
+    if registeredLogMetrics:
+        extraResults = analyzeRegisteredLogMetrics(islice(columns, 1, None), eventCol, dataCol, subjectCol)
+    return computeColumnarMetrics(eventCodes, eventTypes, subjectCodes, subjectNames, chatData, extraResults)
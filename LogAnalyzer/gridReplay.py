@@ -0,0 +1,185 @@
+"""
+Replays the grid edits of the log files to score the grid tasks at points in time during
+the session and to credit the subjects that entered the correct answers. The current answer
+of every item and the score of every task are updated with each edit, so the scores at all
+cutoffs and the credits come out of a single pass over the log.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.sessionData import readStudy
+from DataStructures.gridScoringStruct import gridScores
+from DataStructures.scoringParameters import scoringParameters
+from logFileTools import parseLogTimestamp
+from logFileCache import readLogRows
+import csv
+
+class gridLogReplay:
+    """
+    Keeps the current answer, author and score of every grid item while the rows of a log are added
+    tasks is a list of (task name, item prefix) tuples and the score of a task is the sum of the
+    scores of its items like basicGridTaskEvaluator computes it. Answers that are not in the
+    answer key and items without an answer key don't score, negative scores of the answer key do.
+    cutoffs are in seconds from the first timestamp of the log. The scores at a cutoff are
+    the scores after all edits before it.
+    """
+    def __init__(self, scorer, tasks, cutoffs, eventCol = 1, dataCol = 2, itemCol = 3, subjectCol = 4, timeCol = 9):
+        self.scorer = scorer
+        self.taskPrefixes = [curPrefix.lower().strip() for curName, curPrefix in tasks]
+        self.cutoffs = sorted(cutoffs)
+        self.eventCol = eventCol
+        self.dataCol = dataCol
+        self.itemCol = itemCol
+        self.subjectCol = subjectCol
+        self.timeCol = timeCol
+
+        #the tasks of every item in the answer key are looked up once with the prefix index of
+        #the answer key, the other items can't score so their edits are skipped
+        self.itemTasks = {}
+        for curIndex, curPrefix in enumerate(self.taskPrefixes):
+            for curItem in scorer.itemsWithPrefix(curPrefix):
+                self.itemTasks.setdefault(curItem.strip(), []).append(curIndex)
+
+        #the current state of the grid and the tasks
+        self.answers = {}
+        self.itemScores = {}
+        self.taskScores = [0] * len(tasks)
+
+        #the snapshots of the task scores at the cutoffs that have passed
+        self.startTime = None
+        self.snapshots = []
+
+    def getItemTasks(self, item):
+        """
+        Return the indices of the tasks an item of the answer key belongs to
+        """
+        return self.itemTasks.get(item, [])
+
+    def takeSnapshots(self, curTime):
+        """
+        Store the current task scores for all cutoffs that lie before curTime
+        """
+        while len(self.snapshots) < len(self.cutoffs) and (curTime is None or curTime >= self.startTime + self.cutoffs[len(self.snapshots)]):
+            self.snapshots.append(list(self.taskScores))
+
+    def addRow(self, curLine):
+        """
+        Add one row of the log file
+        Rows that are too short for the time column have no timestamp
+
+        >>> class fakeScores:
+        ...     def itemsWithPrefix(self, prefix): return ['sudoku [1,1]']
+        ...     def getScore(self, task, answer): return 2
+        >>> replay = gridLogReplay(fakeScores(), [('Sudoku', 'Sudoku')], [60])
+        >>> replay.addRow(['', 'Chat', 'hi', '', 'a'])
+        >>> replay.addRow(['', 'Edit Grid', 'x', 'Sudoku [1,1]', 'a'])
+        >>> replay.addRow(['', 'Edit Grid', 'x', 'Sudoku [1,1]', 'a', '', '', '', '', '90'])
+        >>> replay.finish()
+        ([[2]], [2])
+        """
+        hasTime = len(curLine) > self.timeCol
+
+        #the cutoffs are counted from the first row with a timestamp
+        if self.startTime is None and hasTime:
+            self.startTime = parseLogTimestamp(curLine[self.timeCol])
+
+        if curLine[self.eventCol] != 'Edit Grid':
+            return
+
+        #edits without a timestamp count towards the current cutoff
+        curTime = parseLogTimestamp(curLine[self.timeCol]) if hasTime else None
+        if curTime is not None and self.startTime is not None:
+            self.takeSnapshots(curTime)
+
+        item = curLine[self.itemCol].lower().strip()
+        curTasks = self.getItemTasks(item)
+        if not curTasks:
+            return
+        answer = curLine[self.dataCol].lower().strip()
+        self.answers[item] = (answer, curLine[self.subjectCol])
+
+        #replace the old score of the item by the new one in the totals of its tasks
+        #only the -1 of answers that aren't in the answer key doesn't score, penalties do
+        newScore = self.scorer.getScore(item, answer)
+        if newScore == -1:
+            newScore = 0
+        scoreChange = newScore - self.itemScores.get(item, 0)
+        self.itemScores[item] = newScore
+        if scoreChange:
+            for curTask in curTasks:
+                self.taskScores[curTask] += scoreChange
+
+    def finish(self):
+        """
+        Fill the cutoffs the log didn't reach with the final scores
+        Returns the task scores at every cutoff and the final task scores
+        """
+        self.takeSnapshots(None)
+        return self.snapshots, list(self.taskScores)
+
+    def credits(self):
+        """
+        Return the number of correct answers and the points every subject contributed to
+        the final score of every task as a dict keyed by (subject, task index)
+        
+        >>> class fakeScores:
+        ...     def itemsWithPrefix(self, prefix): return ['sudoku [1,1]', 'sudoku [1,2]']
+        ...     def getScore(self, task, answer): return {'x': 2, 'z': -4}.get(answer, -1)
+        >>> replay = gridLogReplay(fakeScores(), [('Sudoku', 'Sudoku')], [60])
+        >>> replay.addRow(['', 'Edit Grid', 'x', 'Sudoku [1,1]', 'a', '', '', '', '', '0'])
+        >>> replay.addRow(['', 'Edit Grid', 'x', 'Sudoku [1,2]', 'a', '', '', '', '', '30'])
+        >>> replay.addRow(['', 'Edit Grid', 'y', 'Sudoku [1,2]', 'b', '', '', '', '', '90'])
+        >>> replay.finish()
+        ([[4]], [2])
+        >>> replay.addRow(['', 'Edit Grid', 'z', 'Sudoku [1,2]', 'b', '', '', '', '', '100'])
+        >>> replay.finish()[1]
+        [-2]
+        >>> replay.credits()
+        {('a', 0): [1, 2]}
+        """
+        allCredits = {}
+        for item in self.answers:
+            if self.itemScores[item] > 0:
+                for curTask in self.getItemTasks(item):
+                    curCredit = allCredits.setdefault((self.answers[item][1], curTask), [0, 0])
+                    curCredit[0] += 1
+                    curCredit[1] += self.itemScores[item]
+        return allCredits
+
+def replayGridLogs( settings, cutoffs ):
+    """
+    Replay the grid edits of all the sessions in a study
+    cutoffs is a list of minutes after the start of the session. The scores of the basic
+    grid tasks at every cutoff and at the end of the log are written to the gridReplayFilename
+    and the correct answers per subject to the gridCreditFilename
+    """
+    #the replay hands out the snapshots in ascending order so the labels have to be sorted as well
+    cutoffs = sorted(cutoffs)
+    sessions = readStudy(settings)
+    scorer = gridScores(settings)
+    tasks = [(curTask['TaskName'], curTask['ItemPrefix']) for curTask in scoringParameters(settings) if curTask['ScoringFunction'] == 'basicGridTask']
+    logCacheFolder = settings['General'].get('logCacheFolder')
+
+    with open(settings['ResultFiles']['gridReplayFilename'], 'w+') as replayFP, open(settings['ResultFiles']['gridCreditFilename'], 'w+') as creditFP:
+        replayCSV = csv.writer(replayFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        replayCSV.writerow(['Session', 'Cutoff', 'Task', 'Score'])
+        creditCSV = csv.writer(creditFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        creditCSV.writerow(['Session', 'Subject', 'Task', 'Correct Answers', 'Points'])
+
+        for curSession in sessions:
+            replay = gridLogReplay(scorer, tasks, [curCutoff * 60 for curCutoff in cutoffs])
+
+            #stream the log file through the replay
+            logRows = readLogRows(curSession['logfile'], logCacheFolder)
+            next(logRows)
+            for curLine in logRows:
+                replay.addRow(curLine)
+            snapshots, finalScores = replay.finish()
+
+            for curCutoff, curScores in zip(['{:g}'.format(curCutoff) for curCutoff in cutoffs], snapshots) + [('Final', finalScores)]:
+                replayCSV.writerows([[curSession.sessionName, curCutoff, curName, curScore] for (curName, curPrefix), curScore in zip(tasks, curScores)])
+
+            allCredits = replay.credits()
+            for curSubject, curTask in sorted(allCredits):
+                creditCSV.writerow([curSession.sessionName, curSubject, tasks[curTask][0]] + allCredits[(curSubject, curTask)])
@@ -9,122 +9,356 @@ from the log files.
 from os import listdir
 from os.path import exists, isdir
 from csv import reader, writer, QUOTE_ALL
+from multiprocessing import Pool
+from functools import partial
+from itertools import izip
+from time import sleep, strftime
 
 from DataStructures.sessionData import readStudy
 import csv
-from logFileTools import getStdOfDict
-from textblob import TextBlob
-
-def analyzeLogMetrics( logIterable, eventCol = 1, dataCol = 2, subjectCol = 4):
-    #init the counters
-    chatCounter = 0
-    wordCounter = 0
-    gridCount = 0
-    padCount = 0
-    perPersonChatCount = dict()
-    perPersonWordCount = dict()
-    perPersonTextEdits = dict()
-    perPersonGridEdits = dict()
-    allChat = ''
+from logMetricsAccumulator import logMetricsAccumulator
+from logFileFollower import logFileFollower
+from columnarLogMetrics import analyzeLogMetricsColumnar, analyzeLogColumnsCached
+from logFileCache import readLogRows, loadLogColumns
+from sentimentCache import sentimentCache
+from sentimentBackends import createSentimentBackend
+from logFileChunks import accumulateLogFilesChunked
+from chatLogExporter import exportChatRows, chatLogHeading
+from turnTaking import computeTurnTaking, turnTakingWriter
+from logMetricRegistry import registeredLogMetricColumns
+import re
+
+def analyzeLogMetrics( logIterable, eventCol = 1, dataCol = 2, subjectCol = 4, chatLines = None):
+    """
+    Compute the chat and edit metrics from the rows of a log file
+    If a list is passed as chatLines a (subject, message) tuple is appended for every chat line
+    """
+    accumulator = logMetricsAccumulator(eventCol, dataCol, subjectCol)
 
     #cycle the log file
     for curLine in logIterable:
-        #check if it is chat
-        if curLine[eventCol] == 'Chat':
-            #figure out who is talking
-            curSubject = curLine[subjectCol]
-            
-            #add the chat line
-            allChat += curLine[dataCol] + ' '
-
-            #increment the chat counter and the per person Chat counter
-            chatCounter += 1
-            if not curSubject in perPersonChatCount:
-                perPersonChatCount[curSubject] = 1
-            else:
-                perPersonChatCount[curSubject] += 1
-
-            #add the number of words to the word counter and the per person word count
-            wordCounter += len(curLine[dataCol].split(' '))
-            if not curSubject in perPersonWordCount:
-                perPersonWordCount[curSubject] = len(curLine[dataCol].split(' '))
-            else:
-                perPersonWordCount[curSubject] += len(curLine[dataCol].split(' '))
-
-        #check if it is a grid edit line
-        if curLine[eventCol] == 'Edit Grid':
-            #increment
-            gridCount += 1
-            
-            #figure out who is working
-            curSubject = curLine[subjectCol]
-
-            #increment the counter
-            if not curSubject in perPersonGridEdits:
-                perPersonGridEdits[curSubject] = 1
-            else:
-                perPersonGridEdits[curSubject] += 1
-
-        #check if it is a grid edit line
-        if curLine[eventCol].startswith('Edit pad'):
-            #increment
-            padCount += 1
-
-            #figure out who is working
-            curSubject = curLine[subjectCol]
-
-            #increment the counter
-            if not curSubject in perPersonTextEdits:
-                perPersonTextEdits[curSubject] = 1
-            else:
-                perPersonTextEdits[curSubject] += 1
-                
-    #return the stuff
-    return [chatCounter,
-            wordCounter,
-            gridCount,
-            padCount,
-            getStdOfDict(perPersonChatCount),
-            getStdOfDict(perPersonWordCount),
-            getStdOfDict(perPersonGridEdits),
-            getStdOfDict(perPersonTextEdits),
-            getStdOfDict(perPersonChatCount,False),
-            getStdOfDict(perPersonWordCount,False),
-            getStdOfDict(perPersonGridEdits,False),
-            getStdOfDict(perPersonTextEdits,False),
-            perPersonChatCount,
-            perPersonWordCount,
-            perPersonGridEdits,
-            perPersonTextEdits,
-            allChat]
-
-def exportLogAnalysis( sessionNames, scores, outFilename ):
+        accumulator.addRow(curLine)
+
+    if chatLines is not None:
+        chatLines.extend(accumulator.chatLines)
+    return accumulator.results()
+
+def computeChatSentiment( allChat ):
+    """
+    Run the TextBlob sentiment analysis on all the chat of a session and
+    return the polarity and the subjectivity as a tuple
+    """
+    from textblob import TextBlob
+
+    chatBlob = TextBlob(unicode(allChat, 'utf-8'))
+    return chatBlob.sentiment.polarity, chatBlob.sentiment.subjectivity
+
+#the engines that can compute the log metrics, they all return the same results
+logMetricEngines = {'rows': analyzeLogMetrics,
+                    'columnar': analyzeLogMetricsColumnar}
+
+#the sentiment cache of a worker process in the process pool
+workerSentimentCache = None
+
+def initSentimentWorker( cacheFilename ):
+    """
+    Initializer for the worker processes that loads the sentiment cache once per process
+    """
+    global workerSentimentCache
+    workerSentimentCache = sentimentCache(cacheFilename)
+
+def analyzeSessionLog( logFilename, engine = 'rows', cache = None, chatLogFilename = None, logCacheFolder = None, scoreSentiment = True ):
+    """
+    Computes the metrics and the chat sentiment for the log file of one session
+    Returns the metrics from the selected engine, the sentiment tuple from sentimentCache.analyzeChat,
+    the sentiment cache entries that had to be computed for this session and the speaker
+    transitions and turn lengths from computeTurnTaking
+    If scoreSentiment is not set the chat lines are returned instead of the sentiment tuple so
+    that the sentiment backend can score them together with the other sessions
+    If a chatLogFilename is given the chat log is exported from the same read of the log file
+    If a logCacheFolder is given the log is read from the columnar log file cache
+    This is a module level function so it can be handed to a process pool
+    """
+    #fall back to the cache of the worker process or to a cache that only lives in memory
+    if cache is None:
+        cache = workerSentimentCache if workerSentimentCache is not None else sentimentCache(None)
+
+    #the columnar engine can work directly on the cached columns
+    chatLines = []
+    if logCacheFolder and engine == 'columnar' and not chatLogFilename:
+        curMetrics = analyzeLogColumnsCached(loadLogColumns(logFilename, logCacheFolder), chatLines = chatLines)
+    else:
+        curMetrics = analyzeLogRows(logFilename, engine, chatLogFilename, logCacheFolder, chatLines)
+
+    #the turn taking only needs the order of the speakers which we got from the same pass
+    turnTaking = computeTurnTaking([curSubject for curSubject, curMessage in chatLines])
+    if not scoreSentiment:
+        return curMetrics, chatLines, {}, turnTaking
+    return curMetrics, cache.analyzeChat(chatLines), cache.popNewEntries(), turnTaking
+
+def analyzeLogRows( logFilename, engine, chatLogFilename, logCacheFolder, chatLines ):
+    """
+    Read the rows of a log file, optionally export its chat log on the way and
+    return the metrics of the selected engine
+    """
+    chatFP = None
+    try:
+        logRows = readLogRows(logFilename, logCacheFolder)
+
+        #route the rows through the chat exporter if we export the chat log as well
+        if chatLogFilename:
+            chatFP = open(chatLogFilename, 'wb')
+            chatWriter = csv.writer(chatFP, delimiter = ',')
+            chatWriter.writerow(chatLogHeading)
+            logRows = exportChatRows(logRows, chatWriter)
+
+        next(logRows)
+        return logMetricEngines[engine]( logRows, chatLines = chatLines )
+    finally:
+        if chatFP:
+            chatFP.close()
+
+def analyzeSessionLogWorker( filenames, engine = 'rows', logCacheFolder = None, scoreSentiment = True ):
+    """
+    Unpacks the log and chat log filename of a session for Pool.map
+    """
+    return analyzeSessionLog(filenames[0], engine, chatLogFilename = filenames[1], logCacheFolder = logCacheFolder, scoreSentiment = scoreSentiment)
+
+def analyzeChunkedLogFiles( logFilenames, chunks, pool = None ):
+    """
+    Computes the metrics of log files that are each parsed in up to chunks parts
+    Yields the results in the format of analyzeSessionLog with the chat lines in place of
+    the sentiment since the chunks are accumulated without scoring the chat
+    """
+    for accumulator in accumulateLogFilesChunked(logFilenames, chunks, pool):
+        turnTaking = computeTurnTaking([curSubject for curSubject, curMessage in accumulator.chatLines])
+        yield accumulator.results(), accumulator.chatLines, {}, turnTaking
+
+def getSentimentBackend( settings, sentiment = 'textblob' ):
+    """
+    Create the sentiment backend selected for the log analysis (see sentimentBackends)
+    The textblob backend caches in the optional sentimentCacheFilename and the lexicon backend
+    reads the optional sentimentLexicon of the General section
+    """
+    return createSentimentBackend(sentiment, settings['ResultFiles'].get('sentimentCacheFilename'), settings['General'].get('sentimentLexicon'))
+
+#the session level columns of the log analysis files
+logAnalysisSummaryHeader = ['Session', 'Number of Active Subjects', 'Total Chat Count', 'Total Chat Word Count', 'Total Grid Edit Count', 'Total Pad Edit Count',
+                            'Normalized Std Chat Count', 'Normalized Std Chat Word Count', 'Normalized Std Grid Edits', 'Normalized Std Pad Edits',
+                            'Std Chat Count', 'Std Chat Word Count', 'Std Grid Edits', 'Std Pad Edits',
+                            'Sentiment Polarity', 'Sentiment Subjectivity']
+
+def getSummaryHeader():
+    """
+    Return logAnalysisSummaryHeader followed by the session level results of the registered metrics
+    """
+    return logAnalysisSummaryHeader + registeredLogMetricColumns()[0]
+
+def getSubjectResults( curScores ):
+    """
+    Return the per subject results of the registered metrics of a session as (name, values) tuples
+    """
+    return [(curName, curValue) for curName, curValue in curScores[17] if isinstance(curValue, dict)]
+
+def getSummaryRow( sessionName, curScores, curSentiment ):
+    """
+    Return the session level values of a session in the order of getSummaryHeader
+    """
+    return [sessionName] \
+         + [max([len(curVal) for curVal in curScores[12:16]])] \
+         + curScores[:12] \
+         + list(curSentiment[:2]) \
+         + [curValue for curName, curValue in curScores[17] if not isinstance(curValue, dict)]
+
+class logAnalysisStreamWriter:
+    """
+    Writes the log analysis in long format while the sessions are analyzed
+    The summary file gets one row per session with the session level metrics and the
+    long file gets one (session, subject, metric, value) row for every per subject value
+    that exists, so neither memory nor file size depend on the largest group in the study
+    """
+    #the per subject metrics as (name, index into the metrics) and (name, index into the sentiment)
+    subjectMetrics = [('Chat Count', 12), ('Chat Word Count', 13), ('Grid Edits', 14), ('Pad Edits', 15)]
+    subjectSentiments = [('Sentiment Polarity', 2), ('Sentiment Subjectivity', 3)]
+
+    def __init__(self, summaryFilename, longFilename):
+        self.summaryFP = open(summaryFilename, 'w+')
+        self.longFP = open(longFilename, 'w+')
+        self.summaryCSV = csv.writer(self.summaryFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        self.longCSV = csv.writer(self.longFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        self.summaryCSV.writerow(getSummaryHeader())
+        self.longCSV.writerow(['Session', 'Subject', 'Metric', 'Value'])
+
+    def writeSession(self, sessionName, curScores, curSentiment):
+        """
+        Write the rows of one session
+        """
+        self.summaryCSV.writerow(getSummaryRow(sessionName, curScores, curSentiment))
+
+        perSubjectValues = [(curName, curScores[curIndex]) for curName, curIndex in self.subjectMetrics] \
+                         + [(curName, curSentiment[curIndex]) for curName, curIndex in self.subjectSentiments] \
+                         + getSubjectResults(curScores)
+        allSubjects = set()
+        for curName, curValues in perSubjectValues:
+            allSubjects.update(curValues)
+
+        for curSubject in sorted(allSubjects):
+            for curName, curValues in perSubjectValues:
+                if curSubject in curValues:
+                    self.longCSV.writerow([sessionName, curSubject, curName, curValues[curSubject]])
+
+    def close(self):
+        self.summaryFP.close()
+        self.longFP.close()
+
+def streamSessionResults( streamWriter, sessionNames, sessionResults, cache, scoreSentiment = True, turnWriter = None ):
+    """
+    Write the results of every session as soon as sessionResults hands them out
+    izip pulls one session at a time, so only the session that is written is held in memory
+
+    >>> class listWriter:
+    ...     def __init__(self):
+    ...         self.written = []
+    ...     def writeSession(self, sessionName, curScores, curSentiment):
+    ...         self.written.append(sessionName)
+    >>> writer = listWriter()
+    >>> def results():
+    ...     yield [], (0.0, 0.0, {}, {}), {}, None
+    ...     print 'Written before the last session:', writer.written
+    ...     yield [], (0.0, 0.0, {}, {}), {}, None
+    >>> streamSessionResults(writer, ['a', 'b'], results(), sentimentCache(None))
+    Written before the last session: ['a']
+    >>> writer.written
+    ['a', 'b']
+    """
+    for curSessionName, curResult in izip(sessionNames, sessionResults):
+        curSentiment = curResult[1] if scoreSentiment else cache.analyzeChat(curResult[1])
+        streamWriter.writeSession(curSessionName, curResult[0], curSentiment)
+        cache.update(curResult[2])
+        if turnWriter:
+            turnWriter.writeSession(curSessionName, *curResult[3])
+
+#the per subject column groups of the wide log analysis file and what they are padded with
+logAnalysisSubjectGroups = [('SubjectID', 'Missing'), ('Chat Count', ''), ('Chat Word Count', ''), ('Pad Edits', ''),
+                            ('Grid SubjectID', 'Missing'), ('Grid Edits', ''), ('Sentiment Polarity', ''), ('Sentiment Subjectivity', '')]
+
+def getLogAnalysisSubjectGroups():
+    """
+    Return logAnalysisSubjectGroups followed by a subject and a value group for every per
+    subject result of the registered metrics
+    """
+    extraGroups = []
+    for curName in registeredLogMetricColumns()[1]:
+        extraGroups += [(curName + ' SubjectID', 'Missing'), (curName, '')]
+    return logAnalysisSubjectGroups + extraGroups
+
+def getLogAnalysisHeader( maxSubjects ):
+    """
+    Return the header of the wide log analysis file for groups of up to maxSubjects subjects
+    """
+    header = getSummaryHeader()
+    for curGroup, curPadding in getLogAnalysisSubjectGroups():
+        header += [curGroup + str(curID+1) for curID in range(maxSubjects)]
+    return header
+
+def splitLogAnalysisHeader( header ):
+    """
+    Return the session level columns, the names of the per subject column groups and the
+    number of subjects of the header of a wide log analysis file
+
+    >>> splitLogAnalysisHeader(['Session', 'Hints', 'SubjectID1', 'SubjectID2', 'Chat Count1', 'Chat Count2'])
+    (['Session', 'Hints'], ['SubjectID', 'Chat Count'], 2)
+    >>> splitLogAnalysisHeader(['Session', 'Hints'])
+    (['Session', 'Hints'], [], 0)
+    """
+    maxSubjects = len([curColumn for curColumn in header if re.match(r'SubjectID\d+$', curColumn)])
+    if not maxSubjects:
+        return header, [], 0
+    groupStart = header.index('SubjectID1')
+    return header[:groupStart], [curColumn[:-1] for curColumn in header[groupStart::maxSubjects]], maxSubjects
+
+def mergeLogAnalysis( shardFilenames, outFilename ):
+    """
+    Merge the wide log analysis files of the shards of a study into the file of a single run
+    The per subject column groups of every shard are padded to the largest group in the study
+    """
+    allShards = []
+    for curFilename in shardFilenames:
+        with open(curFilename, 'rb') as fp:
+            csvReader = csv.reader(fp)
+            allShards.append((splitLogAnalysisHeader(csvReader.next()), list(csvReader)))
+    maxSubjects = max([curHeader[2] for curHeader, curRows in allShards])
+
+    #shards without any subjects don't have the column groups in their header
+    summaryHeader = allShards[0][0][0]
+    subjectGroups = max([curHeader[1] for curHeader, curRows in allShards], key = len)
+
+    resultData = []
+    for (curSummary, curGroups, curSubjects), curRows in allShards:
+        for curRow in curRows:
+            curData = curRow[:len(curSummary)]
+            for curIndex, curGroup in enumerate(subjectGroups):
+                curPadding = 'Missing' if curGroup.endswith('SubjectID') else ''
+                curStart = len(curSummary) + curIndex * curSubjects
+                curData += curRow[curStart:curStart + curSubjects] + [curPadding] * (maxSubjects - curSubjects)
+            resultData.append(curData)
+
+    #the sessions are in the order readStudy returns them
+    resultData.sort(key = lambda curRow: curRow[0])
+    header = summaryHeader + [curGroup + str(curID+1) for curGroup in subjectGroups for curID in range(maxSubjects)]
+    with open(outFilename, 'w+') as fp:
+        resCSV = csv.writer(fp, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        resCSV.writerows([header] + resultData)
+
+def exportLogAnalysis( sessionNames, scores, outFilename, sentiments = None ):
+    """
+    Write the metrics of all sessions to a csv file with one row per session
+    sentiments holds the result of sentimentCache.analyzeChat for each session
+    If the sentiments are not passed they are computed from all the chat of the session
+    and the per subject sentiment columns are left empty
+    The results of the registered metrics (see registerLogMetric) follow the built in ones
+
+    >>> from logMetricRegistry import logMetric, perPersonCounter, registerLogMetric, registeredLogMetrics
+    >>> from tempfile import mkdtemp
+    >>> class hintMetric(logMetric):
+    ...     eventTypes = ['Hint']
+    ...     def __init__(self, dataCol = 2, subjectCol = 4):
+    ...         logMetric.__init__(self, dataCol, subjectCol)
+    ...         self.hints = perPersonCounter()
+    ...     def addRow(self, curLine):
+    ...         self.hints.add(curLine[self.subjectCol])
+    ...     def merge(self, other):
+    ...         self.hints.merge(other.hints)
+    ...     def results(self):
+    ...         return [('Hints', sum(self.hints.counts.values())), ('Hints', self.hints.counts)]
+    >>> registerLogMetric(hintMetric) is hintMetric
+    True
+    >>> scores = analyzeLogMetrics([['', 'Chat', 'hi', '', 'a'], ['', 'Hint', '', '', 'b']])
+    >>> folder = mkdtemp()
+    >>> exportLogAnalysis(['s1'], [scores], folder + '/wide.csv', [(0.0, 0.0, {}, {})])
+    >>> header, row = list(csv.reader(open(folder + '/wide.csv')))
+    >>> zip(header, row)[16], zip(header, row)[-2:]
+    (('Hints', '1'), [('Hints SubjectID1', 'b'), ('Hints1', '1')])
+    >>> streamWriter = logAnalysisStreamWriter(folder + '/summary.csv', folder + '/long.csv')
+    >>> streamWriter.writeSession('s1', scores, (0.0, 0.0, {}, {}))
+    >>> streamWriter.close()
+    >>> list(csv.reader(open(folder + '/summary.csv')))[0][-1], list(csv.reader(open(folder + '/long.csv')))[-1]
+    ('Hints', ['s1', 'b', 'Hints', '1'])
+    >>> registeredLogMetrics.remove(hintMetric)
+    """
     #count the max subjects
     maxSubjects = 0
     for curScores in scores:
-        maxSubjects = max([maxSubjects, len(curScores[12]), len(curScores[13]), len(curScores[14]), len(curScores[15])])
+        maxSubjects = max([maxSubjects, len(curScores[12]), len(curScores[13]), len(curScores[14]), len(curScores[15])] + [len(curValues) for curName, curValues in getSubjectResults(curScores)])
     
-    resultData = ['Session', 'Number of Active Subjects', 'Total Chat Count', 'Total Chat Word Count', 'Total Grid Edit Count', 'Total Pad Edit Count',
-                   'Normalized Std Chat Count', 'Normalized Std Chat Word Count', 'Normalized Std Grid Edits', 'Normalized Std Pad Edits',
-                   'Std Chat Count', 'Std Chat Word Count', 'Std Grid Edits', 'Std Pad Edits',
-                   'Sentiment Polarity', 'Sentiment Subjectivity']
-    resultData += ['SubjectID' + str(curID+1) for curID in range(maxSubjects)]
-    resultData += ['Chat Count' + str(curID+1) for curID in range(maxSubjects)]
-    resultData += ['Chat Word Count' + str(curID+1) for curID in range(maxSubjects)]
-    resultData += ['Pad Edits' + str(curID+1) for curID in range(maxSubjects)]
-
-    resultData += ['Grid SubjectID' + str(curID+1) for curID in range(maxSubjects)]
-    resultData += ['Grid Edits' + str(curID+1) for curID in range(maxSubjects)]
-            
-    resultData = [resultData]
+    resultData = [getLogAnalysisHeader(maxSubjects)]
     
-    for curSession, curScores in zip(sessionNames, scores):
-        curData = [curSession] \
-                + [max([len(curVal) for curVal in curScores[12:16]])] \
-                + curScores[:12]
-
-        chatBlob = TextBlob(unicode(curScores[16], 'utf-8'))
-        curData += [chatBlob.sentiment.polarity, chatBlob.sentiment.subjectivity]
+    for curIndex, (curSession, curScores) in enumerate(zip(sessionNames, scores)):
+        if sentiments is None:
+            curSentiment = list(computeChatSentiment(curScores[16])) + [{}, {}]
+        else:
+            curSentiment = sentiments[curIndex]
+        curData = getSummaryRow(curSession, curScores, curSentiment)
 
         #find all the subjects
         allSubjects = []
@@ -140,6 +374,7 @@ def exportLogAnalysis( sessionNames, scores, outFilename ):
 
         for curMetric in [12, 13, 15]:
             curData += [curScores[curMetric][curSbj] if curSbj in curScores[curMetric] else '' for curSbj in allSubjects]
+        chatSubjects = allSubjects
         
         #find all the subjects for grid edits
         allSubjects = sorted(curScores[14])
@@ -149,6 +384,16 @@ def exportLogAnalysis( sessionNames, scores, outFilename ):
 
         curData += [curScores[14][curSbj] if curSbj in curScores[14] else '' for curSbj in allSubjects]
 
+        #the per subject sentiment follows the order of the chat subjects
+        for curSubjectSentiment in curSentiment[2:]:
+            curData += [curSubjectSentiment[curSbj] if curSbj in curSubjectSentiment else '' for curSbj in chatSubjects]
+
+        #the registered metrics get their own subjects like the grid edits
+        for curName, curValues in getSubjectResults(curScores):
+            allSubjects = sorted(curValues)
+            curData += allSubjects + ['Missing'] * (maxSubjects - len(allSubjects))
+            curData += [curValues[curSbj] for curSbj in allSubjects] + [''] * (maxSubjects - len(allSubjects))
+
         resultData.append(curData)
     
     with open(outFilename, 'w+') as fp:
@@ -156,26 +401,126 @@ def exportLogAnalysis( sessionNames, scores, outFilename ):
         resCSV.writerows(resultData)
 
 
-def analyzeLogFiles( settings ):
+def followLogFiles( settings, interval = 10, sentiment = 'textblob' ):
+    """
+    Follow the log files of sessions that are still running and write the metrics every
+    interval seconds. Each poll only parses the rows that have been appended since the
+    last one. Runs until it is interrupted with ctrl-c.
+    """
+    sessions = readStudy(settings)
+    sessionNames = [curSession.sessionName for curSession in sessions]
+    followers = [logFileFollower(curSession['logfile']) for curSession in sessions]
+    cache = getSentimentBackend(settings, sentiment)
+
+    try:
+        while True:
+            #read the new rows and write the metrics if anything changed
+            if any([curFollower.poll() for curFollower in followers]):
+                allScores = [curFollower.accumulator.results() for curFollower in followers]
+                allSentiments = cache.analyzeSessions([curFollower.accumulator.chatLines for curFollower in followers])
+                exportLogAnalysis(sessionNames, allScores, settings['ResultFiles']['logAnalysisFilename'], allSentiments)
+                cache.save()
+                print '{} Updated the log analysis'.format(strftime('%H:%M:%S'))
+            sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+def analyzeLogFiles( settings, jobs = 1, engine = 'rows', exportChat = False, follow = False, interval = 10, longFormat = False, sentiment = 'textblob', chunks = 1 ):
     """
     Computes all the metrics for all the sessions in a study
     It writes out the metrics to a csv file
+    If jobs is larger than one the sessions are analyzed in a pool of that many processes
+    The results are merged in session order so the output is the same as for a serial run
+    engine selects the implementation of the metrics (see logMetricEngines)
+    sentiment selects the sentiment backend (see sentimentBackends)
+    The sentiment of the chat messages is cached in the optional sentimentCacheFilename
+    Backends that don't score in the workers get the chat of the whole study in one batch
+    If exportChat is set the chat logs are exported in the same pass over the log files
+    If follow is set the logs are followed while they are written (see followLogFiles), which
+    only writes the wide file in this process with the rows engine
+    If the optional logCacheFolder is set in the General section the logs are read through the
+    columnar log file cache in that folder
+    If longFormat is set the results are streamed to the logAnalysisSummaryFilename and the
+    logAnalysisLongFilename as each session finishes instead of writing the wide file
+    The speaker transitions and turn lengths are written to the optional speakerTransitionsFilename
+    and turnLengthsFilename
+    If chunks is larger than one every log file is split into that many chunks which are parsed
+    by the pool independently (see logFileChunks), this always reads the raw log files with the
+    rows engine so it can't be combined with another engine
     """
+    if chunks > 1 and exportChat:
+        print 'The chat logs can not be exported while parsing the log files in chunks.'
+        raise ValueError
+
+    if chunks > 1 and engine != 'rows':
+        print 'The log files can only be parsed in chunks with the rows engine.'
+        raise ValueError
+
+    if follow and (jobs > 1 or engine != 'rows' or exportChat or longFormat or chunks > 1):
+        print 'Following the log files can not be combined with jobs, engine, chatlogs, long or chunks.'
+        raise ValueError
+
+    if follow:
+        followLogFiles(settings, interval, sentiment)
+        return
+
     sessions = readStudy(settings)
+    sessionNames = [curSession.sessionName for curSession in sessions]
+    logFilenames = [curSession['logfile'] for curSession in sessions]
+    chatLogFilenames = [curSession['chatlog'] if exportChat else None for curSession in sessions]
+    cacheFilename = settings['ResultFiles'].get('sentimentCacheFilename')
+    cache = getSentimentBackend(settings, sentiment)
+    logCacheFolder = settings['General'].get('logCacheFolder')
+    scoreSentiment = cache.scoresInWorkers and chunks <= 1
 
-    allScores = []
-    sessionNames = []
-    
-    for curSession in sessions:
-        #open the logfile and pass th csv reader to the analysis function
-        with open(curSession['logfile'], 'rU') as fp:
-            csvReader = csv.reader(fp)
-            csvReader.next()
-            
-            curMetrics = analyzeLogMetrics( csvReader )
-            allScores.append(curMetrics)
-            sessionNames.append(curSession.sessionName)
+    #analyze the sessions either in a process pool or one after another
+    #imap hands out the results in session order as soon as they are ready
+    pool = None
+    if jobs > 1:
+        if scoreSentiment:
+            pool = Pool(jobs, initSentimentWorker, (cacheFilename,))
+        else:
+            pool = Pool(jobs)
+    if chunks > 1:
+        sessionResults = analyzeChunkedLogFiles(logFilenames, chunks, pool)
+    elif pool:
+        sessionResults = pool.imap(partial(analyzeSessionLogWorker, engine = engine, logCacheFolder = logCacheFolder, scoreSentiment = scoreSentiment), zip(logFilenames, chatLogFilenames))
+    else:
+        sessionResults = (analyzeSessionLog(curFilename, engine, cache, curChatFilename, logCacheFolder, scoreSentiment) for curFilename, curChatFilename in zip(logFilenames, chatLogFilenames))
 
-    exportLogAnalysis(sessionNames, allScores, settings['ResultFiles']['logAnalysisFilename'])
-    
-    
\ No newline at end of file
+    #the turn taking is written alongside if the files are set
+    turnWriter = None
+    if settings['ResultFiles'].get('speakerTransitionsFilename') and settings['ResultFiles'].get('turnLengthsFilename'):
+        turnWriter = turnTakingWriter(settings['ResultFiles']['speakerTransitionsFilename'], settings['ResultFiles']['turnLengthsFilename'])
+
+    try:
+        if longFormat:
+            #write every session as soon as it is done
+            streamWriter = logAnalysisStreamWriter(settings['ResultFiles']['logAnalysisSummaryFilename'], settings['ResultFiles']['logAnalysisLongFilename'])
+            try:
+                streamSessionResults(streamWriter, sessionNames, sessionResults, cache, scoreSentiment, turnWriter)
+            finally:
+                streamWriter.close()
+        else:
+            allScores = []
+            allSentiments = []
+            for curSessionName, curResult in izip(sessionNames, sessionResults):
+                allScores.append(curResult[0])
+                allSentiments.append(curResult[1])
+                cache.update(curResult[2])
+                if turnWriter:
+                    turnWriter.writeSession(curSessionName, *curResult[3])
+
+            #the chat of all sessions is scored at once if the workers didn't do it
+            if not scoreSentiment:
+                allSentiments = cache.analyzeSessions(allSentiments)
+            exportLogAnalysis(sessionNames, allScores, settings['ResultFiles']['logAnalysisFilename'], allSentiments)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if turnWriter:
+            turnWriter.close()
+
+    #store the sentiments that have been computed
+    cache.save()
@@ -0,0 +1,204 @@
+"""
+Binary columnar cache of parsed log files. The first time a log file is read it is
+converted into one set of files per column: the distinct values or the values of all
+rows stored back to back in a blob, numpy arrays with the offsets into the blob and, for
+columns with few distinct values like the event type and the subject, numpy arrays with
+integer codes for every row. Later reads memory map these files instead of parsing the csv.
+The cache is rebuilt automatically if the size or the modification time of the log changed.
+Logs that are read from a studyArchive or gzip compressed are cached just the same.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.studyArchive import openStudyFile, studyFileInfo
+from os import makedirs, remove
+from os.path import basename, exists, getsize, join
+import csv
+import json
+import mmap
+import numpy as np
+
+#bump the version whenever the layout of the cache files changes
+cacheVersion = 1
+
+#columns with at most that many distinct values (and at least 4 rows per value) are interned
+maxInternedValues = 65535
+
+def writeStringColumn( values, blobFilename, offsetsFilename ):
+    """
+    Store a list of strings as one blob and the offsets of the strings in the blob
+    """
+    with open(blobFilename, 'wb') as fp:
+        fp.write(''.join(values))
+    offsets = np.zeros(len(values) + 1, np.int64)
+    offsets[1:] = np.cumsum([len(curValue) for curValue in values])
+    np.save(offsetsFilename, offsets)
+
+class stringColumn:
+    """
+    Read only access to a list of strings stored with writeStringColumn
+    The blob and the offsets are memory mapped
+    """
+    def __init__(self, blobFilename, offsetsFilename):
+        self.offsets = np.load(offsetsFilename, mmap_mode = 'r')
+        self.blob = ''
+        if getsize(blobFilename):
+            with open(blobFilename, 'rb') as fp:
+                self.blob = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+    def tolist(self):
+        offsets = self.offsets.tolist()
+        return [self.blob[offsets[curIndex]:offsets[curIndex + 1]] for curIndex in xrange(len(offsets) - 1)]
+
+class logColumns:
+    """
+    The columns of a cached log file. All rows of the file including the header are stored.
+    Iterating over it gives the rows as lists of strings just like a csv reader would
+    """
+    def __init__(self, cacheFolder):
+        with open(join(cacheFolder, 'meta.json'), 'r') as fp:
+            self.meta = json.load(fp)
+        self.nRows = self.meta['nRows']
+        self.rowLengths = np.load(join(cacheFolder, 'rowLengths.npy'), mmap_mode = 'r')
+        self.columns = []
+        self.codes = []
+        for curColumn in xrange(self.meta['nColumns']):
+            prefix = join(cacheFolder, 'col{}'.format(curColumn))
+            self.columns.append(stringColumn(prefix + '.blob', prefix + '.offsets.npy'))
+            if curColumn in self.meta['internedColumns']:
+                self.codes.append(np.load(prefix + '.codes.npy', mmap_mode = 'r'))
+            else:
+                self.codes.append(None)
+
+    def __len__(self):
+        return self.nRows
+
+    def interned(self, column):
+        """
+        Return the integer codes of all rows and the list of distinct values of a column
+        Columns that aren't interned in the cache are interned on the fly
+        """
+        if self.codes[column] is not None:
+            return np.asarray(self.codes[column]), self.columns[column].tolist()
+
+        values = self.columns[column].tolist()
+        distinctValues = sorted(set(values))
+        valueCodes = dict(zip(distinctValues, xrange(len(distinctValues))))
+        return np.array([valueCodes[curValue] for curValue in values], np.int64), distinctValues
+
+    def value(self, column, row):
+        """
+        Return the value of a single cell
+        """
+        if self.codes[column] is not None:
+            return self.columns[column][self.codes[column][row]]
+        return self.columns[column][row]
+
+    def __iter__(self):
+        #resolve the interned columns once instead of for every cell
+        columnValues = []
+        for curColumn, curCodes in zip(self.columns, self.codes):
+            if curCodes is None:
+                columnValues.append(curColumn.tolist())
+            else:
+                curVocabulary = curColumn.tolist()
+                columnValues.append([curVocabulary[curCode] for curCode in curCodes.tolist()])
+
+        for curRow, curLength in enumerate(self.rowLengths.tolist()):
+            yield [curValues[curRow] for curValues in columnValues[:curLength]]
+
+def buildLogCache( logFilename, cacheFolder ):
+    """
+    Parse the log file and write the cache files to the cacheFolder
+    """
+    if not exists(cacheFolder):
+        makedirs(cacheFolder)
+
+    #the meta file marks the cache as complete so it goes first when we rebuild
+    metaFilename = join(cacheFolder, 'meta.json')
+    if exists(metaFilename):
+        remove(metaFilename)
+
+    #take the stats before reading so a log that is appended to meanwhile is rebuilt next time
+    logInfo = studyFileInfo(logFilename)
+    if logInfo is None:
+        print 'Error in buildLogCache: {} does not exist'.format(logFilename)
+        raise IOError
+    logSize, logMtime = logInfo
+    with openStudyFile(logFilename, 'rU') as fp:
+        allRows = list(csv.reader(fp))
+
+    nColumns = max([len(curRow) for curRow in allRows]) if allRows else 0
+    np.save(join(cacheFolder, 'rowLengths.npy'), np.array([len(curRow) for curRow in allRows], np.int32))
+
+    internedColumns = []
+    for curColumn in xrange(nColumns):
+        values = [curRow[curColumn] if curColumn < len(curRow) else '' for curRow in allRows]
+        prefix = join(cacheFolder, 'col{}'.format(curColumn))
+
+        #store columns with few distinct values as codes into the distinct values
+        distinctValues = sorted(set(values))
+        if len(distinctValues) <= maxInternedValues and len(distinctValues) * 4 <= len(values):
+            valueCodes = dict(zip(distinctValues, xrange(len(distinctValues))))
+            np.save(prefix + '.codes.npy', np.array([valueCodes[curValue] for curValue in values], np.int32))
+            writeStringColumn(distinctValues, prefix + '.blob', prefix + '.offsets.npy')
+            internedColumns.append(curColumn)
+        else:
+            writeStringColumn(values, prefix + '.blob', prefix + '.offsets.npy')
+
+    with open(metaFilename, 'w+') as fp:
+        json.dump({'version': cacheVersion,
+                   'size': logSize,
+                   'mtime': logMtime,
+                   'nRows': len(allRows),
+                   'nColumns': nColumns,
+                   'internedColumns': internedColumns}, fp)
+
+def getCacheFolder( logFilename, cacheFolder ):
+    """
+    The cache of a log file lives in a folder named after the log file
+    
+    >>> getCacheFolder('/data/Session 1/Session 1 - LogFile.csv', '/cache')
+    '/cache/Session 1 - LogFile.csv.cache'
+    """
+    return join(cacheFolder, basename(logFilename) + '.cache')
+
+def isCacheValid( logFilename, logCacheFolder ):
+    """
+    Check that the cache is complete, has the current layout and matches the log file
+    """
+    metaFilename = join(logCacheFolder, 'meta.json')
+    if not exists(metaFilename):
+        return False
+    with open(metaFilename, 'r') as fp:
+        meta = json.load(fp)
+    return meta['version'] == cacheVersion and [meta['size'], meta['mtime']] == studyFileInfo(logFilename)
+
+def loadLogColumns( logFilename, cacheFolder ):
+    """
+    Return the logColumns of a log file and build or rebuild the cache if needed
+    """
+    logCacheFolder = getCacheFolder(logFilename, cacheFolder)
+    if not isCacheValid(logFilename, logCacheFolder):
+        buildLogCache(logFilename, logCacheFolder)
+    return logColumns(logCacheFolder)
+
+def readLogRows( logFilename, cacheFolder = None ):
+    """
+    Iterate over all rows of a log file including the header
+    If a cacheFolder is given the rows come from the columnar cache otherwise the csv is parsed
+    """
+    if cacheFolder:
+        for curRow in loadLogColumns(logFilename, cacheFolder):
+            yield curRow
+    else:
+        with openStudyFile(logFilename, 'rU') as fp:
+            for curRow in csv.reader(fp):
+                yield curRow
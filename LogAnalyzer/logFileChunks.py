@@ -0,0 +1,134 @@
+"""
+Parses a single log file in several chunks so that the rows of one very long session can be
+accumulated by several processes. The chunks are split at newlines that are not inside a
+quoted field and the accumulators of the chunks are merged in file order, which gives the
+same results as analyzeLogMetrics on the whole file.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.studyArchive import openStudyFile, isPlainStudyFile
+from logMetricsAccumulator import logMetricsAccumulator
+from os.path import getsize
+import mmap
+import csv
+
+def findChunkBoundaries( logFilename, nChunks ):
+    """
+    Split a log file into up to nChunks byte ranges of about the same size
+    Every range ends after a newline that is not inside a quoted field, which is the case
+    if the number of quotes before it is even. Returns a list of (start, end) tuples
+    Files that can't be memory mapped because they are compressed or in a studyArchive are
+    not split and returned as a single (0, None) chunk
+    """
+    if not isPlainStudyFile(logFilename):
+        return [(0, None)]
+
+    fileSize = getsize(logFilename)
+    if fileSize == 0 or nChunks <= 1:
+        return [(0, fileSize)]
+
+    boundaries = [0]
+    with open(logFilename, 'rb') as fp:
+        data = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+        try:
+            #the quotes are counted once from the start of the file up to the current position
+            quoteCount = 0
+            countedUpTo = 0
+            for curTarget in [fileSize * curChunk // nChunks for curChunk in range(1, nChunks)]:
+                if curTarget < boundaries[-1]:
+                    continue
+                curNewline = data.find('\n', curTarget)
+                while curNewline >= 0:
+                    quoteCount += data[countedUpTo:curNewline].count('"')
+                    countedUpTo = curNewline
+                    if quoteCount % 2 == 0:
+                        break
+                    curNewline = data.find('\n', curNewline + 1)
+
+                #no newline outside of quotes before the end of the file
+                if curNewline < 0 or curNewline + 1 >= fileSize:
+                    break
+                boundaries.append(curNewline + 1)
+        finally:
+            data.close()
+
+    boundaries.append(fileSize)
+    return zip(boundaries[:-1], boundaries[1:])
+
+def accumulateLogChunk( chunk, eventCol = 1, dataCol = 2, subjectCol = 4 ):
+    """
+    Accumulate the metrics of the rows in a chunk of a log file
+    chunk is a (logFilename, start, end) tuple and the header is skipped in the first chunk
+    If end is None the whole file is read with openStudyFile
+    The line endings are normalized like the universal newline mode the other readers use
+    This is a module level function so it can be handed to a process pool
+    """
+    logFilename, start, end = chunk
+    accumulator = logMetricsAccumulator(eventCol, dataCol, subjectCol)
+    if end is None:
+        with openStudyFile(logFilename, 'rb') as fp:
+            chunkData = fp.read()
+    elif end <= start:
+        return accumulator
+    else:
+        with open(logFilename, 'rb') as fp:
+            data = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+            try:
+                chunkData = data[start:end]
+            finally:
+                data.close()
+    chunkData = chunkData.replace('\r\n', '\n').replace('\r', '\n')
+
+    csvReader = csv.reader(chunkData.splitlines(True))
+    if start == 0:
+        next(csvReader, None)
+    for curLine in csvReader:
+        accumulator.addRow(curLine)
+    return accumulator
+
+def accumulateLogFilesChunked( logFilenames, nChunks, pool = None ):
+    """
+    Accumulate the metrics of log files that are each split into up to nChunks chunks
+    If a pool is given the chunks of all files are handed out to it together so that
+    the chunks of a long session are worked on in parallel
+    Yields the merged logMetricsAccumulator of every file in order
+    The registered metrics are merged like the built in ones, so they have to implement merge
+
+    >>> from logMetricRegistry import logMetric, perPersonCounter, registerLogMetric, registeredLogMetrics
+    >>> from tempfile import mkdtemp
+    >>> class hintMetric(logMetric):
+    ...     eventTypes = ['Hint']
+    ...     def __init__(self, dataCol = 2, subjectCol = 4):
+    ...         logMetric.__init__(self, dataCol, subjectCol)
+    ...         self.hints = perPersonCounter()
+    ...     def addRow(self, curLine):
+    ...         self.hints.add(curLine[self.subjectCol])
+    ...     def merge(self, other):
+    ...         self.hints.merge(other.hints)
+    ...     def results(self):
+    ...         return [('Hints', self.hints.counts)]
+    >>> registerLogMetric(hintMetric) is hintMetric
+    True
+    >>> logFilename = mkdtemp() + '/log.csv'
+    >>> with open(logFilename, 'wb') as fp:
+    ...     csv.writer(fp).writerows([['Time', 'Event', 'Data', '', 'Subject']] + [['', ['Hint', 'Chat'][i % 2], 'hi', '', 'ab'[i % 3 > 0]] for i in range(30)])
+    >>> chunked = list(accumulateLogFilesChunked([logFilename], 3))[0].results()
+    >>> chunked[17], chunked == accumulateLogChunk((logFilename, 0, None)).results()
+    ([('Hints', {'a': 5, 'b': 10})], True)
+    >>> registeredLogMetrics.remove(hintMetric)
+    """
+    allChunks = [[(curFilename, start, end) for start, end in findChunkBoundaries(curFilename, nChunks)] for curFilename in logFilenames]
+    flatChunks = [curChunk for curChunks in allChunks for curChunk in curChunks]
+    if pool:
+        chunkResults = pool.imap(accumulateLogChunk, flatChunks)
+    else:
+        chunkResults = (accumulateLogChunk(curChunk) for curChunk in flatChunks)
+
+    #merge the chunks of each file in file order
+    for curChunks in allChunks:
+        accumulator = next(chunkResults)
+        for curChunk in curChunks[1:]:
+            accumulator.merge(next(chunkResults))
+        yield accumulator
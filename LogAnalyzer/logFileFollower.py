@@ -0,0 +1,92 @@
+"""
+Follows the log file of a session that is still running. The byte offset into the log
+and the metrics accumulator are kept between polls so every poll only parses the rows
+that have been appended since the last one.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from os.path import exists, getsize
+from logMetricsAccumulator import logMetricsAccumulator
+import csv
+
+def findRecordEnd( data ):
+    """
+    Find the end of the last complete csv record in data, i.e. the position after the
+    last newline that is not inside a quoted field. Returns 0 if there is no complete record
+    
+    >>> findRecordEnd('a,b\\nc,d')
+    4
+    >>> findRecordEnd('a,b\\nc,"d\\ne')
+    4
+    >>> findRecordEnd('a,"b\\nc"\\n')
+    8
+    >>> findRecordEnd('a,b')
+    0
+    """
+    curEnd = data.rfind('\n')
+    while curEnd >= 0:
+        #an even number of quotes means we are not inside a quoted field
+        if data.count('"', 0, curEnd) % 2 == 0:
+            return curEnd + 1
+        curEnd = data.rfind('\n', 0, curEnd)
+    return 0
+
+class logFileFollower:
+    """
+    Remembers how far a log file has been read and the metrics of the rows read so far
+    Only complete rows are passed to the accumulator, a partially written row is kept
+    until the rest of it has been appended. Line endings are normalized like the
+    universal newline mode the other readers use, so the final metrics are identical
+    to reading the complete file with analyzeLogMetrics.
+    """
+    def __init__(self, logFilename):
+        self.logFilename = logFilename
+        self.reset()
+
+    def reset(self):
+        """
+        Start reading the log file from the beginning
+        """
+        self.offset = 0
+        self.pending = ''
+        self.headerSkipped = False
+        self.accumulator = logMetricsAccumulator()
+
+    def poll(self):
+        """
+        Read the rows that have been appended since the last poll
+        Returns True if new rows have been added to the accumulator
+        """
+        #the log file might not have been created yet
+        if not exists(self.logFilename):
+            return False
+
+        #if the file got shorter it has been replaced and we start over
+        if getsize(self.logFilename) < self.offset:
+            self.reset()
+
+        with open(self.logFilename, 'rb') as fp:
+            fp.seek(self.offset)
+            newData = fp.read()
+        if not newData:
+            return False
+        self.offset += len(newData)
+
+        #split off the complete records and keep the rest for the next poll
+        data = self.pending + newData
+        recordEnd = findRecordEnd(data)
+        self.pending = data[recordEnd:]
+        if not recordEnd:
+            return False
+        data = data[:recordEnd].replace('\r\n', '\n').replace('\r', '\n')
+
+        #skip the header and add the rows
+        csvReader = csv.reader(data.splitlines(True))
+        if not self.headerSkipped:
+            next(csvReader, None)
+            self.headerSkipped = True
+        for curLine in csvReader:
+            self.accumulator.addRow(curLine)
+        return True
@@ -6,6 +6,17 @@ This module provides functions for the log file analysis tool
 """
 
 import numpy as np
+import re
+from calendar import timegm
+from datetime import datetime
+
+#formats of the timestamps in the log files that parseLogTimestamp understands
+timestampFormats = ['%Y-%m-%d %H:%M:%S',
+                    '%Y-%m-%dT%H:%M:%S',
+                    '%Y/%m/%d %H:%M:%S',
+                    '%m/%d/%Y %H:%M:%S',
+                    '%m/%d/%Y %I:%M:%S %p',
+                    '%m/%d/%Y %H:%M']
 
 def getStdOfDict( counts, normalize = True ):
     """
@@ -37,3 +48,47 @@ def getStdOfDict( counts, normalize = True ):
 
     #return the variance
     return np.std(counts)
+
+
+def parseLogTimestamp( value ):
+    """
+    Convert a timestamp from the log file to seconds. Accepts unix timestamps in
+    seconds or milliseconds and the date formats in timestampFormats with optional
+    fractions of a second. Only differences between timestamps are meaningful since
+    the timezone is ignored. Returns None if the timestamp can't be parsed.
+    
+    >>> parseLogTimestamp('1400000000')
+    1400000000.0
+    >>> parseLogTimestamp('1400000000500')
+    1400000000.5
+    >>> parseLogTimestamp('2014-05-13 16:53:20')
+    1400000000.0
+    >>> parseLogTimestamp('5/13/2014 4:53:20.25 PM')
+    1400000000.25
+    >>> parseLogTimestamp('yesterday') is None
+    True
+    """
+    value = value.strip()
+
+    #unix timestamps in seconds or milliseconds
+    try:
+        seconds = float(value)
+        if seconds > 1e11:
+            seconds /= 1000.0
+        return seconds
+    except ValueError:
+        pass
+
+    #cut away fractions of a second since strptime can't deal with them in all formats
+    fraction = 0.0
+    fractionMatch = re.match(r'^(.*\d:\d\d)(\.\d+)(.*)$', value)
+    if fractionMatch:
+        value = fractionMatch.group(1) + fractionMatch.group(3)
+        fraction = float(fractionMatch.group(2))
+
+    for curFormat in timestampFormats:
+        try:
+            return timegm(datetime.strptime(value, curFormat).timetuple()) + fraction
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,229 @@
+"""
+Registry of the metrics that are computed from the rows of a log file. Every metric
+declares the event types it consumes, either exactly or by prefix, and only gets to see
+those rows. The logMetricsAccumulator dispatches the rows to the metrics so any number
+of metrics is computed in a single pass over the log file.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+class logMetric:
+    """
+    Base class of the log metrics
+    eventTypes lists the event types the metric consumes and eventPrefixes the beginnings
+    of event types it consumes. Subclasses implement addRow, merge and results where
+    results returns a list of (name, value) tuples and the value is either a number or
+    a dict with a number for every subject
+    """
+    eventTypes = []
+    eventPrefixes = []
+
+    def __init__(self, dataCol = 2, subjectCol = 4):
+        self.dataCol = dataCol
+        self.subjectCol = subjectCol
+
+    def consumes(self, eventType):
+        """
+        Check whether the metric wants the rows of an event type
+        """
+        if eventType in self.eventTypes:
+            return True
+        return any([eventType.startswith(curPrefix) for curPrefix in self.eventPrefixes])
+
+    def addRow(self, curLine):
+        pass
+
+    def merge(self, other):
+        """
+        Add the state of a metric of the same type that saw the rows following the rows of this one
+        Every metric has to implement it since the chunks of a log are merged with it (see logFileChunks)
+        """
+        print 'Error in logMetric: {} does not implement merge'.format(self.__class__.__name__)
+        raise NotImplementedError
+
+    def results(self):
+        return []
+
+class logMetricDispatcher:
+    """
+    Hands every row of a log to the metrics that consume its event type
+    The metrics that consume an event type are looked up the first time the event type shows
+    up and kept in a dispatch table after that, so consumes is called once per event type
+
+    >>> dispatcher = logMetricDispatcher([gridEditMetric(), padEditMetric()])
+    >>> dispatcher.addRow(['', 'Edit pad Typing', 'x', '', 'b'])
+    >>> dispatcher.addRow(['', 'Chat', 'hi', '', 'a'])
+    >>> sorted((curEvent, [curMetric.__class__.__name__ for curMetric in curHandlers]) for curEvent, curHandlers in dispatcher.dispatchTable.items())
+    [('Chat', []), ('Edit pad Typing', ['padEditMetric'])]
+    """
+    def __init__(self, metrics, eventCol = 1):
+        self.metrics = metrics
+        self.eventCol = eventCol
+        self.dispatchTable = {}
+
+    def addRow(self, curLine):
+        """
+        Add one row of the log file to the metrics that consume its event type
+        """
+        curEvent = curLine[self.eventCol]
+        try:
+            curHandlers = self.dispatchTable[curEvent]
+        except KeyError:
+            curHandlers = self.dispatchTable[curEvent] = [curMetric for curMetric in self.metrics if curMetric.consumes(curEvent)]
+        for curMetric in curHandlers:
+            curMetric.addRow(curLine)
+
+class perPersonCounter:
+    """
+    Counts per subject and remembers the order in which the subjects first showed up
+    so that merged counters fill their dicts in the same order as a single counter
+    
+    >>> counter = perPersonCounter()
+    >>> counter.add('b', 2)
+    >>> counter.add('a', 1)
+    >>> other = perPersonCounter()
+    >>> other.add('a', 1)
+    >>> other.add('c', 1)
+    >>> counter.merge(other)
+    >>> counter.counts, counter.subjects
+    ({'a': 2, 'c': 1, 'b': 2}, ['b', 'a', 'c'])
+    """
+    def __init__(self):
+        self.counts = dict()
+        self.subjects = []
+
+    def add(self, curSubject, value = 1):
+        if not curSubject in self.counts:
+            self.counts[curSubject] = value
+            self.subjects.append(curSubject)
+        else:
+            self.counts[curSubject] += value
+
+    def merge(self, other):
+        for curSubject in other.subjects:
+            self.add(curSubject, other.counts[curSubject])
+
+class chatMetric(logMetric):
+    """
+    Number of chat lines and words in total and per subject and the chat lines themselves
+    
+    >>> metric = chatMetric()
+    >>> metric.addRow(['', 'Chat', 'hello there', '', 'a'])
+    >>> metric.results()
+    [('Chat Count', 1), ('Chat Word Count', 2), ('Chat Count', {'a': 1}), ('Chat Word Count', {'a': 2})]
+    """
+    eventTypes = ['Chat']
+
+    def __init__(self, dataCol = 2, subjectCol = 4):
+        logMetric.__init__(self, dataCol, subjectCol)
+        self.chatCounter = 0
+        self.wordCounter = 0
+        self.perPersonChatCount = perPersonCounter()
+        self.perPersonWordCount = perPersonCounter()
+        self.chatLines = []
+
+    def addRow(self, curLine):
+        #figure out who is talking and add the chat line
+        curSubject = curLine[self.subjectCol]
+        self.chatLines.append((curSubject, curLine[self.dataCol]))
+
+        #increment the chat counter and the per person Chat counter
+        self.chatCounter += 1
+        self.perPersonChatCount.add(curSubject)
+
+        #add the number of words to the word counter and the per person word count
+        curWords = len(curLine[self.dataCol].split(' '))
+        self.wordCounter += curWords
+        self.perPersonWordCount.add(curSubject, curWords)
+
+    def merge(self, other):
+        self.chatCounter += other.chatCounter
+        self.wordCounter += other.wordCounter
+        self.perPersonChatCount.merge(other.perPersonChatCount)
+        self.perPersonWordCount.merge(other.perPersonWordCount)
+        self.chatLines += other.chatLines
+
+    def results(self):
+        return [('Chat Count', self.chatCounter),
+                ('Chat Word Count', self.wordCounter),
+                ('Chat Count', self.perPersonChatCount.counts),
+                ('Chat Word Count', self.perPersonWordCount.counts)]
+
+class editMetric(logMetric):
+    """
+    Number of edits in total and per subject
+    """
+    name = 'Edits'
+
+    def __init__(self, dataCol = 2, subjectCol = 4):
+        logMetric.__init__(self, dataCol, subjectCol)
+        self.editCount = 0
+        self.perPersonEdits = perPersonCounter()
+
+    def addRow(self, curLine):
+        self.editCount += 1
+        self.perPersonEdits.add(curLine[self.subjectCol])
+
+    def merge(self, other):
+        self.editCount += other.editCount
+        self.perPersonEdits.merge(other.perPersonEdits)
+
+    def results(self):
+        return [(self.name, self.editCount),
+                (self.name, self.perPersonEdits.counts)]
+
+class gridEditMetric(editMetric):
+    """
+    Edits of the grid tasks
+    """
+    eventTypes = ['Edit Grid']
+    name = 'Grid Edits'
+
+class padEditMetric(editMetric):
+    """
+    Edits of the pads of the text tasks
+    """
+    eventPrefixes = ['Edit pad']
+    name = 'Pad Edits'
+
+#the metrics that make up the results of analyzeLogMetrics
+builtinLogMetrics = [chatMetric, gridEditMetric, padEditMetric]
+
+#additional metrics that are computed in the same pass (see registerLogMetric)
+registeredLogMetrics = []
+
+def registerLogMetric( metricClass ):
+    """
+    Add a subclass of logMetric to the metrics every logMetricsAccumulator computes
+    Returns the class so it can be used as a decorator
+    """
+    if not metricClass in registeredLogMetrics:
+        registeredLogMetrics.append(metricClass)
+    return metricClass
+
+def registeredLogMetricColumns():
+    """
+    Return the names of the session level results and of the per subject results of the
+    registered metrics in the order they show up in the results
+    The names are taken from metrics that haven't seen any rows
+    """
+    sessionColumns = []
+    subjectColumns = []
+    for curMetric in registeredLogMetrics:
+        for curName, curValue in curMetric().results():
+            if isinstance(curValue, dict):
+                subjectColumns.append(curName)
+            else:
+                sessionColumns.append(curName)
+    return sessionColumns, subjectColumns
+
+def analyzeRegisteredLogMetrics( logIterable, eventCol = 1, dataCol = 2, subjectCol = 4 ):
+    """
+    Compute only the registered metrics from the rows of a log file for the engines that
+    compute the built in metrics on their own. Returns their (name, value) tuples
+    """
+    dispatcher = logMetricDispatcher([curMetric(dataCol, subjectCol) for curMetric in registeredLogMetrics], eventCol)
+    for curLine in logIterable:
+        dispatcher.addRow(curLine)
+    return [curResult for curMetric in dispatcher.metrics for curResult in curMetric.results()]
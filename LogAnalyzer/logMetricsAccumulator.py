@@ -0,0 +1,88 @@
+"""
+Incremental accumulator for the chat and edit metrics of a log file.
+Rows can be added at any time and the metrics can be read out at any time,
+which allows to follow log files that are still being written.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from logFileTools import getStdOfDict
+from logMetricRegistry import builtinLogMetrics, registeredLogMetrics, logMetricDispatcher
+
+class logMetricsAccumulator(logMetricDispatcher):
+    """
+    Accumulates the metrics of analyzeLogMetrics row by row
+    Every row is dispatched to the metrics that consume its event type (see logMetricDispatcher).
+    extraMetrics defaults to the metrics added with registerLogMetric
+    
+    >>> accumulator = logMetricsAccumulator()
+    >>> accumulator.addRow(['', 'Chat', 'hello there', '', 'a'])
+    >>> accumulator.addRow(['', 'Edit pad Typing', 'x', '', 'b'])
+    >>> accumulator.results()[:4]
+    [1, 2, 0, 1]
+    >>> accumulator.chatLines
+    [('a', 'hello there')]
+    >>> sorted(accumulator.dispatchTable)
+    ['Chat', 'Edit pad Typing']
+    """
+    def __init__(self, eventCol = 1, dataCol = 2, subjectCol = 4, extraMetrics = None):
+        if extraMetrics is None:
+            extraMetrics = registeredLogMetrics
+
+        #the built in metrics come first so results can find them
+        logMetricDispatcher.__init__(self, [curMetric(dataCol, subjectCol) for curMetric in builtinLogMetrics + list(extraMetrics)], eventCol)
+        self.chat, self.grid, self.pad = self.metrics[:3]
+        self.chatLines = self.chat.chatLines
+
+    def merge(self, other):
+        """
+        Add the metrics of an accumulator that saw the rows following the rows of this one
+        The subjects keep the order in which they first appeared, so merging the accumulators
+        of consecutive chunks of a log gives the same results as one accumulator over all rows
+        
+        >>> first = logMetricsAccumulator()
+        >>> first.addRow(['', 'Chat', 'hi', '', 'a'])
+        >>> second = logMetricsAccumulator()
+        >>> second.addRow(['', 'Chat', 'hi you', '', 'b'])
+        >>> second.addRow(['', 'Chat', 'ok', '', 'a'])
+        >>> first.merge(second)
+        >>> first.results()[:2], first.results()[13], first.chatLines
+        ([3, 4], {'a': 2, 'b': 2}, [('a', 'hi'), ('b', 'hi you'), ('a', 'ok')])
+        """
+        for curMetric, otherMetric in zip(self.metrics, other.metrics):
+            curMetric.merge(otherMetric)
+
+    def results(self):
+        """
+        Return the metrics of all rows added so far in the format of analyzeLogMetrics
+        The last value holds the (name, value) tuples of the registered metrics (see extraResults)
+        """
+        perPersonChatCount = self.chat.perPersonChatCount.counts
+        perPersonWordCount = self.chat.perPersonWordCount.counts
+        perPersonGridEdits = self.grid.perPersonEdits.counts
+        perPersonTextEdits = self.pad.perPersonEdits.counts
+        return [self.chat.chatCounter,
+                self.chat.wordCounter,
+                self.grid.editCount,
+                self.pad.editCount,
+                getStdOfDict(perPersonChatCount),
+                getStdOfDict(perPersonWordCount),
+                getStdOfDict(perPersonGridEdits),
+                getStdOfDict(perPersonTextEdits),
+                getStdOfDict(perPersonChatCount,False),
+                getStdOfDict(perPersonWordCount,False),
+                getStdOfDict(perPersonGridEdits,False),
+                getStdOfDict(perPersonTextEdits,False),
+                perPersonChatCount,
+                perPersonWordCount,
+                perPersonGridEdits,
+                perPersonTextEdits,
+                ''.join([curChat + ' ' for curSubject, curChat in self.chatLines]),
+                self.extraResults()]
+
+    def extraResults(self):
+        """
+        Return the (name, value) tuples of the metrics beyond the built in ones
+        """
+        return [curResult for curMetric in self.metrics[len(builtinLogMetrics):] for curResult in curMetric.results()]
@@ -0,0 +1,113 @@
+"""
+Computes the chat and edit metrics of the log files per time window (e.g. per minute)
+and writes them as a long format time series with one row per session, window, subject
+and metric. The logs are streamed and only the counters of the current window are kept
+in memory.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.sessionData import readStudy
+from logFileTools import parseLogTimestamp
+from logFileCache import readLogRows
+import csv
+
+#the metrics per window in the order they are written
+timeSeriesMetrics = ['Chat Count', 'Chat Word Count', 'Grid Edits', 'Pad Edits']
+
+class windowedLogMetrics:
+    """
+    Streaming accumulator for the metrics of one log file per time window.
+    Windows are counted from the first timestamp of the log. Whenever a row starts a new
+    window the finished window is handed out, so memory only depends on the number of subjects.
+    Rows with a timestamp that can't be parsed or that lies before the current window
+    are counted in the current window.
+    
+    >>> metrics = windowedLogMetrics(60)
+    >>> metrics.addRow(['', 'Chat', 'hello you', '', 'a', '', '', '', '', '100'])
+    []
+    >>> metrics.addRow(['', 'Edit Grid', 'x', '', 'b', '', '', '', '', '130'])
+    []
+    >>> metrics.addRow(['', 'Chat', 'hi', '', 'a', '', '', '', '', '170'])
+    [(0, 'a', [1, 2, 0, 0]), (0, 'b', [0, 0, 1, 0])]
+    >>> metrics.finish()
+    [(60, 'a', [1, 1, 0, 0])]
+    """
+    def __init__(self, windowLength = 60, eventCol = 1, dataCol = 2, subjectCol = 4, timeCol = 9):
+        self.windowLength = windowLength
+        self.eventCol = eventCol
+        self.dataCol = dataCol
+        self.subjectCol = subjectCol
+        self.timeCol = timeCol
+        self.startTime = None
+        self.currentWindow = 0
+        self.counts = {}
+
+    def addRow(self, row):
+        """
+        Count one row of the log and return the rows of the windows that are finished
+        """
+        #figure out which window the row belongs to
+        finishedRows = []
+        curTime = parseLogTimestamp(row[self.timeCol]) if len(row) > self.timeCol else None
+        if curTime is not None:
+            if self.startTime is None:
+                self.startTime = curTime
+            curWindow = int((curTime - self.startTime) // self.windowLength)
+            if curWindow > self.currentWindow:
+                finishedRows = self.finish()
+                self.currentWindow = curWindow
+
+        #count the event the same way analyzeLogMetrics does
+        curEvent = row[self.eventCol]
+        if curEvent == 'Chat':
+            curCounts = self.counts.setdefault(row[self.subjectCol], [0, 0, 0, 0])
+            curCounts[0] += 1
+            curCounts[1] += len(row[self.dataCol].split(' '))
+        elif curEvent == 'Edit Grid':
+            self.counts.setdefault(row[self.subjectCol], [0, 0, 0, 0])[2] += 1
+        elif curEvent.startswith('Edit pad'):
+            self.counts.setdefault(row[self.subjectCol], [0, 0, 0, 0])[3] += 1
+
+        return finishedRows
+
+    def finish(self):
+        """
+        Close the current window and return its (window start, subject, counts) rows
+        """
+        windowStart = self.currentWindow * self.windowLength
+        finishedRows = [(windowStart, curSubject, self.counts[curSubject]) for curSubject in sorted(self.counts)]
+        self.counts = {}
+        return finishedRows
+
+def writeTimeSeriesRows( csvWriter, sessionName, windowRows ):
+    """
+    Write the finished windows of a session in long format
+    """
+    for curWindowStart, curSubject, curCounts in windowRows:
+        for curMetric, curValue in zip(timeSeriesMetrics, curCounts):
+            csvWriter.writerow([sessionName, curWindowStart, curSubject, curMetric, curValue])
+
+def analyzeLogTimeSeries( settings, windowLength = 60 ):
+    """
+    Computes the metrics per window of windowLength seconds for all the sessions in a study
+    The rows are written to the logTimeSeriesFilename while the logs are read
+    """
+    sessions = readStudy(settings)
+    logCacheFolder = settings['General'].get('logCacheFolder')
+
+    with open(settings['ResultFiles']['logTimeSeriesFilename'], 'w+') as outFP:
+        resCSV = csv.writer(outFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        resCSV.writerow(['Session', 'Window Start', 'Subject', 'Metric', 'Value'])
+
+        for curSession in sessions:
+            windowMetrics = windowedLogMetrics(windowLength)
+
+            #stream the log file through the accumulator
+            logRows = readLogRows(curSession['logfile'], logCacheFolder)
+            next(logRows)
+            for curLine in logRows:
+                writeTimeSeriesRows(resCSV, curSession.sessionName, windowMetrics.addRow(curLine))
+
+            writeTimeSeriesRows(resCSV, curSession.sessionName, windowMetrics.finish())
@@ -0,0 +1,166 @@
+"""
+Pluggable backends for the sentiment analysis of the chat. Every backend scores a batch of
+messages to the sums of the polarities and subjectivities of the sentiment words it found and
+the number of those words. aggregateSentiment then reduces the scores of the messages to
+session and subject level with grouped sums.
+
+textblob runs TextBlob on every message and caches the results (see sentimentCache). It is
+the reference implementation. lexicon looks up every word in a sentiment lexicon without
+taking negations or intensifiers into account. It tokenizes all messages of the batch at once
+and maps the tokens to their weights with one vectorized lookup, so it is scored for the whole
+study at once wherever possible.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from imp import find_module
+from os.path import join
+from xml.etree import cElementTree
+from sentimentCache import sentimentCache
+import numpy as np
+import csv
+import re
+
+def aggregateSentiment( sessionChatLines, polaritySums, subjectivitySums, counts ):
+    """
+    Reduce the scores of the messages to the session and subject sentiment
+    sessionChatLines is a list with the (subject, message) chat lines of every session and the
+    scores hold one value per message in the same order
+    Returns a list with a (polarity, subjectivity, per subject polarity, per subject subjectivity)
+    tuple for every session
+    
+    >>> chat = [[('a', 'good'), ('b', 'bad'), ('a', 'so so')], []]
+    >>> aggregateSentiment(chat, [0.5, -0.5, 0.0], [1.0, 1.0, 0.0], [1, 1, 0])
+    [(0.0, 1.0, {'a': 0.5, 'b': -0.5}, {'a': 1.0, 'b': 1.0}), (0.0, 0.0, {}, {})]
+    """
+    #code every message with its session and its subject within the session
+    sessionCodes = np.repeat(np.arange(len(sessionChatLines)), [len(curLines) for curLines in sessionChatLines])
+    groupNames = []
+    groupCodes = []
+    for curSession, curLines in enumerate(sessionChatLines):
+        curGroups = {}
+        for curSubject, curMessage in curLines:
+            if not curSubject in curGroups:
+                curGroups[curSubject] = len(groupNames)
+                groupNames.append((curSession, curSubject))
+            groupCodes.append(curGroups[curSubject])
+    groupCodes = np.array(groupCodes, np.int64)
+
+    #sum up the scores per session and per subject
+    sums = []
+    for curCodes, curLength in [(sessionCodes, len(sessionChatLines)), (groupCodes, len(groupNames))]:
+        sums.append([np.bincount(curCodes, np.asarray(curValues, np.float64), minlength = curLength) if len(curCodes) else np.zeros(curLength)
+                     for curValues in [polaritySums, subjectivitySums, counts]])
+
+    #averages over the sentiment words, without sentiment words it is neutral
+    results = []
+    for curSession in xrange(len(sessionChatLines)):
+        curPolarity, curSubjectivity, curCount = [curSums[curSession] for curSums in sums[0]]
+        if curCount > 0:
+            results.append((float(curPolarity / curCount), float(curSubjectivity / curCount), {}, {}))
+        else:
+            results.append((0.0, 0.0, {}, {}))
+
+    for curGroup, (curSession, curSubject) in enumerate(groupNames):
+        curPolarity, curSubjectivity, curCount = [curSums[curGroup] for curSums in sums[1]]
+        results[curSession][2][curSubject] = float(curPolarity / curCount) if curCount > 0 else 0.0
+        results[curSession][3][curSubject] = float(curSubjectivity / curCount) if curCount > 0 else 0.0
+
+    return results
+
+def loadSentimentLexicon( filename = None ):
+    """
+    Load a sentiment lexicon and return a dict mapping words to (polarity, subjectivity)
+    Csv files need word, polarity and subjectivity columns without a header. Xml files are read
+    in the format of the pattern lexicon TextBlob ships with, which is also used if no file is
+    given. Words with several senses get the average of their senses.
+    """
+    if filename is None:
+        filename = join(find_module('textblob')[1], 'en', 'en-sentiment.xml')
+
+    allSenses = {}
+    if filename.lower().endswith('.xml'):
+        for curWord in cElementTree.parse(filename).getroot().iter('word'):
+            allSenses.setdefault(curWord.get('form').lower(), []).append((float(curWord.get('polarity')), float(curWord.get('subjectivity'))))
+    else:
+        with open(filename, 'rU') as fp:
+            for curLine in csv.reader(fp):
+                allSenses.setdefault(curLine[0].strip().lower(), []).append((float(curLine[1]), float(curLine[2])))
+
+    return {curWord: tuple(np.mean(allSenses[curWord], 0).tolist()) for curWord in allSenses}
+
+class lexiconSentiment:
+    """
+    Fast sentiment backend that averages the lexicon weights of the words of the messages
+    It keeps no state between runs, so the cache interface of the textblob backend is a no-op
+    
+    >>> backend = lexiconSentiment({'good': (0.5, 0.5), 'bad': (-1.0, 1.0)})
+    >>> [curScores.tolist() for curScores in backend.scoreMessages(['Good, not BAD', 'nothing'])]
+    [[-0.5, 0.0], [1.5, 0.0], [2, 0]]
+    >>> backend.analyzeChat([('a', 'good'), ('b', 'bad')])
+    (-0.25, 0.75, {'a': 0.5, 'b': -1.0}, {'a': 0.5, 'b': 1.0})
+    """
+    #the workers hand out the chat and the whole study is scored at once
+    scoresInWorkers = False
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+
+    def scoreMessages(self, messages):
+        """
+        Return the polarity sums, subjectivity sums and numbers of sentiment words of the messages
+        """
+        #tokenize all messages and remember which message every token belongs to
+        messageTokens = [re.findall(r"[\w']+", curMessage.lower()) for curMessage in messages]
+        tokens = [curToken for curTokens in messageTokens for curToken in curTokens]
+        messageCodes = np.repeat(np.arange(len(messages)), [len(curTokens) for curTokens in messageTokens])
+        if not tokens:
+            return np.zeros(len(messages)), np.zeros(len(messages)), np.zeros(len(messages), np.int64)
+
+        #look up the distinct tokens once and gather the weights of all tokens from that
+        vocabulary, tokenCodes = np.unique(np.array(tokens), return_inverse = True)
+        vocabularyWeights = np.array([self.lexicon.get(curToken, (0.0, 0.0)) for curToken in vocabulary.tolist()])
+        vocabularyKnown = np.array([curToken in self.lexicon for curToken in vocabulary.tolist()], bool)
+        known = vocabularyKnown[tokenCodes]
+
+        #grouped sums per message
+        knownMessages = messageCodes[known]
+        return (np.bincount(knownMessages, vocabularyWeights[tokenCodes[known], 0], minlength = len(messages)),
+                np.bincount(knownMessages, vocabularyWeights[tokenCodes[known], 1], minlength = len(messages)),
+                np.bincount(knownMessages, minlength = len(messages)))
+
+    def analyzeSessions(self, sessionChatLines):
+        """
+        Score the chat of many sessions in one batch and return the sentiment of every session
+        """
+        polaritySums, subjectivitySums, counts = self.scoreMessages([curMessage for curLines in sessionChatLines for curSubject, curMessage in curLines])
+        return aggregateSentiment(sessionChatLines, polaritySums, subjectivitySums, counts)
+
+    def analyzeChat(self, chatLines):
+        return self.analyzeSessions([chatLines])[0]
+
+    def popNewEntries(self):
+        return {}
+
+    def update(self, entries):
+        pass
+
+    def save(self):
+        pass
+
+#the names of the sentiment backends
+sentimentBackendNames = ['textblob', 'lexicon']
+
+def createSentimentBackend( name, cacheFilename = None, lexiconFilename = None ):
+    """
+    Create the sentiment backend with the given name
+    cacheFilename is used by the textblob backend and lexiconFilename by the lexicon backend
+    """
+    if name == 'textblob':
+        return sentimentCache(cacheFilename)
+    if name == 'lexicon':
+        return lexiconSentiment(loadSentimentLexicon(lexiconFilename))
+
+    print 'Sentiment backend {} not supported.'.format(name)
+    raise KeyError
@@ -0,0 +1,41 @@
+"""
+Compare the speed and the agreement of the sentiment backends on the chat of a study.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.sessionData import readStudy
+from logFileAnalyzer import analyzeSessionLog
+from sentimentBackends import createSentimentBackend, sentimentBackendNames
+from time import time
+import numpy as np
+
+def benchmarkSentimentBackends( settings, engine = 'rows' ):
+    """
+    Score the chat of all sessions of the study with every sentiment backend
+    Prints the time each backend took and the correlation of the session polarities
+    with the ones of the textblob backend
+    The textblob backend runs without the sentiment cache so its full cost is measured
+    """
+    #collect the chat of all sessions
+    logCacheFolder = settings['General'].get('logCacheFolder')
+    sessionChatLines = [analyzeSessionLog(curSession['logfile'], engine, logCacheFolder = logCacheFolder, scoreSentiment = False)[1]
+                        for curSession in readStudy(settings)]
+    print 'Scoring {} chat messages from {} sessions'.format(sum([len(curLines) for curLines in sessionChatLines]), len(sessionChatLines))
+
+    allPolarities = {}
+    for curName in sentimentBackendNames:
+        startTime = time()
+        backend = createSentimentBackend(curName, None, settings['General'].get('sentimentLexicon'))
+        allPolarities[curName] = [curSentiment[0] for curSentiment in backend.analyzeSessions(sessionChatLines)]
+        print '{}: {:.3f} seconds'.format(curName, time() - startTime)
+
+    #agreement of the session polarities with the reference implementation
+    for curName in sentimentBackendNames:
+        if curName == 'textblob':
+            continue
+        if len(sessionChatLines) > 1 and np.std(allPolarities[curName]) > 0 and np.std(allPolarities['textblob']) > 0:
+            print '{}: correlation of the session polarities with textblob {:.3f}'.format(curName, np.corrcoef(allPolarities[curName], allPolarities['textblob'])[0, 1])
+        else:
+            print '{}: not enough variation to correlate the session polarities'.format(curName)
@@ -0,0 +1,133 @@
+"""
+Per message sentiment analysis with a persistent cache. The sentiment of every chat
+message is stored in a json file under the md5 hash of the message text so that
+reruns only have to run the NLP on messages that haven't been seen before.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+import json
+from hashlib import md5
+from os.path import exists
+
+class sentimentCache:
+    """
+    Cache that maps the md5 hash of a chat message to its sentiment.
+    For each message we store the sum of the polarities and subjectivities of all
+    the assessments TextBlob found and the number of assessments. This allows to
+    aggregate any group of messages to the average over their assessments the way
+    TextBlob does it for a whole text.
+    If no filename is given the cache only lives in memory.
+    
+    >>> cache = sentimentCache(None)
+    >>> cache.aggregate([])
+    (0.0, 0.0)
+    """
+    version = 1
+
+    #every worker process scores the chat of its own sessions and hands back the new entries
+    scoresInWorkers = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.sentiments = {}
+        self.newEntries = {}
+
+        #load the cache from disk if there is one and it has the right version
+        if filename and exists(filename):
+            with open(filename, 'r') as fp:
+                cacheData = json.load(fp)
+            if cacheData.get('version') == self.version:
+                self.sentiments = cacheData['sentiments']
+
+    def getSentiment(self, message):
+        """
+        Return the polarity sum, subjectivity sum and number of assessments of a message
+        The NLP is only run if the message isn't in the cache yet
+        """
+        key = md5(message).hexdigest()
+        if not key in self.sentiments:
+            self.sentiments[key] = self.newEntries[key] = computeMessageSentiment(message)
+        return self.sentiments[key]
+
+    def popNewEntries(self):
+        """
+        Return the entries that have been computed since the last call
+        This is used to hand the results of worker processes back to the main process
+        """
+        newEntries = self.newEntries
+        self.newEntries = {}
+        return newEntries
+
+    def update(self, entries):
+        """
+        Add entries that have been computed elsewhere (e.g. in a worker process)
+        """
+        for curKey in entries:
+            if not curKey in self.sentiments:
+                self.sentiments[curKey] = self.newEntries[curKey] = entries[curKey]
+
+    def save(self):
+        """
+        Write the cache back to disk if it has a file and something changed
+        """
+        if not self.filename or not self.newEntries:
+            return
+        with open(self.filename, 'w+') as fp:
+            json.dump({'version': self.version, 'sentiments': self.sentiments}, fp)
+        self.newEntries = {}
+
+    def aggregate(self, messages):
+        """
+        Aggregate the sentiment of a list of messages to polarity and subjectivity
+        """
+        polaritySum = 0.0
+        subjectivitySum = 0.0
+        assessmentCount = 0
+        for curMessage in messages:
+            curPolarity, curSubjectivity, curCount = self.getSentiment(curMessage)
+            polaritySum += curPolarity
+            subjectivitySum += curSubjectivity
+            assessmentCount += curCount
+
+        if assessmentCount == 0:
+            return 0.0, 0.0
+        return polaritySum / assessmentCount, subjectivitySum / assessmentCount
+
+    def analyzeChat(self, chatLines):
+        """
+        Compute the sentiment of a session from its chat lines which are (subject, message) tuples
+        Returns the session polarity and subjectivity and dicts with the polarity and
+        subjectivity of each subject that chatted
+        """
+        perSubjectMessages = {}
+        for curSubject, curMessage in chatLines:
+            perSubjectMessages.setdefault(curSubject, []).append(curMessage)
+
+        perSubjectPolarity = {}
+        perSubjectSubjectivity = {}
+        for curSubject in perSubjectMessages:
+            perSubjectPolarity[curSubject], perSubjectSubjectivity[curSubject] = self.aggregate(perSubjectMessages[curSubject])
+
+        polarity, subjectivity = self.aggregate([curMessage for curSubject, curMessage in chatLines])
+        return polarity, subjectivity, perSubjectPolarity, perSubjectSubjectivity
+
+    def analyzeSessions(self, sessionChatLines):
+        """
+        Compute the sentiment of many sessions, see analyzeChat
+        """
+        return [self.analyzeChat(curLines) for curLines in sessionChatLines]
+
+def computeMessageSentiment( message ):
+    """
+    Run TextBlob on a single message and return the sums of the polarities and subjectivities
+    of its assessments and the number of assessments
+    TextBlob is imported here so that fully cached runs don't pay for importing it
+    """
+    from textblob import TextBlob
+    
+    assessments = TextBlob(unicode(message, 'utf-8')).sentiment_assessments.assessments
+    return [sum([curAssessment[1] for curAssessment in assessments]),
+            sum([curAssessment[2] for curAssessment in assessments]),
+            len(assessments)]
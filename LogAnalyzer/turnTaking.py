@@ -0,0 +1,78 @@
+"""
+Speaker transitions and turn taking in the chat of a session. A turn is a run of
+consecutive chat messages by the same subject. The counts are computed on the integer
+coded speaker sequence with bincount and unique so the cost is linear in the number of
+chat messages and only transitions that actually happen are stored.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+import numpy as np
+import csv
+from columnarLogMetrics import internColumn
+
+def computeTurnTaking( speakers ):
+    """
+    Compute who speaks after whom and how long the turns of each subject are
+    speakers is the sequence of subjects of the chat messages in log order
+    Returns a dict mapping (from subject, to subject) to the number of transitions and a dict
+    mapping (subject, turn length) to the number of turns of that length
+    
+    >>> transitions, turnLengths = computeTurnTaking(['a', 'a', 'b', 'a', 'b', 'b', 'b'])
+    >>> sorted(transitions.items())
+    [(('a', 'a'), 1), (('a', 'b'), 2), (('b', 'a'), 1), (('b', 'b'), 2)]
+    >>> sorted(turnLengths.items())
+    [(('a', 1), 1), (('a', 2), 1), (('b', 1), 1), (('b', 3), 1)]
+    >>> computeTurnTaking([])
+    ({}, {})
+    """
+    if not len(speakers):
+        return {}, {}
+
+    speakerCodes, speakerNames = internColumn(speakers)
+    nSpeakers = len(speakerNames)
+
+    #count the transitions between consecutive messages as pairs coded into one integer
+    pairCodes = speakerCodes[:-1] * nSpeakers + speakerCodes[1:]
+    pairCodes, pairCounts = np.unique(pairCodes, return_counts = True)
+    transitions = {}
+    for curCode, curCount in zip(pairCodes.tolist(), pairCounts.tolist()):
+        transitions[(speakerNames[curCode // nSpeakers], speakerNames[curCode % nSpeakers])] = curCount
+
+    #find the turns as runs of the same speaker
+    turnStarts = np.concatenate([[0], np.flatnonzero(np.diff(speakerCodes)) + 1])
+    turnLengths = np.diff(np.concatenate([turnStarts, [len(speakerCodes)]]))
+    turnSpeakers = speakerCodes[turnStarts]
+
+    #count the turns per speaker and length
+    turnCodes = turnSpeakers * (len(speakerCodes) + 1) + turnLengths
+    turnCodes, turnCounts = np.unique(turnCodes, return_counts = True)
+    turnLengthCounts = {}
+    for curCode, curCount in zip(turnCodes.tolist(), turnCounts.tolist()):
+        turnLengthCounts[(speakerNames[curCode // (len(speakerCodes) + 1)], curCode % (len(speakerCodes) + 1))] = curCount
+
+    return transitions, turnLengthCounts
+
+class turnTakingWriter:
+    """
+    Writes the speaker transitions and the turn length distributions of the sessions
+    to two long format csv files as the sessions are analyzed
+    """
+    def __init__(self, transitionsFilename, turnLengthsFilename):
+        self.transitionsFP = open(transitionsFilename, 'w+')
+        self.turnLengthsFP = open(turnLengthsFilename, 'w+')
+        self.transitionsCSV = csv.writer(self.transitionsFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        self.turnLengthsCSV = csv.writer(self.turnLengthsFP, delimiter = ',', quotechar='"', quoting=csv.QUOTE_ALL)
+        self.transitionsCSV.writerow(['Session', 'From Subject', 'To Subject', 'Count'])
+        self.turnLengthsCSV.writerow(['Session', 'Subject', 'Turn Length', 'Count'])
+
+    def writeSession(self, sessionName, transitions, turnLengths):
+        for curFrom, curTo in sorted(transitions):
+            self.transitionsCSV.writerow([sessionName, curFrom, curTo, transitions[(curFrom, curTo)]])
+        for curSubject, curLength in sorted(turnLengths):
+            self.turnLengthsCSV.writerow([sessionName, curSubject, curLength, turnLengths[(curSubject, curLength)]])
+
+    def close(self):
+        self.transitionsFP.close()
+        self.turnLengthsFP.close()
@@ -6,6 +6,8 @@ Separated out to make it clean
 :Email: entrymissing@gmail.com
 """
 
+from DataStructures.studyArchive import openStudyFile
+
 def importBrainstormWordsFile(filename):
     """
     Import the brainstorming words results from one file and return the brainstormed words
@@ -25,7 +27,7 @@ def importBrainstormWordsFile(filename):
     allWords = []
     
     #open the brainstorming words file and read the lines
-    with open(filename, 'r') as fp:
+    with openStudyFile(filename, 'r') as fp:
         lines = fp.read().splitlines()
     
     #split the lines for the idiots that didn't read the instructions and add them to the output
@@ -60,7 +62,7 @@ def importBrainstormBrickFile(filename):
     allBricks = []
     
     #open the brainstorming words file and read the lines
-    with open(filename, 'r') as fp:
+    with openStudyFile(filename, 'r') as fp:
         lines = fp.readlines()
     
     #cycle strip and clean the lines and add them to the set
@@ -93,7 +95,7 @@ def importBrainstormEquationsFile(filename):
     allEquations = []
     
     #open the brainstorming words file and read the lines
-    with open(filename, 'r') as fp:
+    with openStudyFile(filename, 'r') as fp:
         lines = fp.readlines()
     
     #cycle strip and clean the lines and add them to the set
@@ -120,7 +122,7 @@ def loadBrainstormingCorrectAnswersFile( filename ):
     True
     """
     #read the file and init the output struct
-    with open(filename, 'r') as fp:
+    with openStudyFile(filename, 'r') as fp:
         lines = fp.readlines()
     synonymTable = {}
     curCategory = ''
@@ -1,4 +1,4 @@
-import json
+from DataStructures.scoringBundle import loadScoringSource
 
 class ScoreBrainstorm:
     #TODO: add docstring and document score graded
@@ -29,35 +29,30 @@ class ScoreBrainstorm:
         self.loadScoringTable( settings, brainstormType, scoreGraded )
     
     def loadScoringTable(self, settings, brainstormType, scoreGraded):
-        #load the scoring table and remove all whitespaces
-        with open(settings['Brainstorming'][brainstormType + ' Scoring Table'], 'r') as fp:
-            self.scoringTable = json.load(fp)
-        for curIndex in xrange(len(self.scoringTable)):
-            self.scoringTable[curIndex] = [[curAns.replace(' ','').lower().strip() for curAns in self.scoringTable[curIndex][0]], self.scoringTable[curIndex][1]]
+        #load the scoring table without whitespaces and the synonyms every answer is in
+        scoringTable = loadScoringSource(settings, 'brainstormTable', settings['Brainstorming'][brainstormType + ' Scoring Table'])
+        self.scoringTable = scoringTable['table']
+        self.answerIndex = scoringTable['index']
         self.scoreGraded = scoreGraded
     
     def getScore( self, brickUsages ):
-        #determine the scores
-        score = 0.0
-        for curSynonym in self.scoringTable:
-            for curUsage in brickUsages:
-                if curUsage.strip().lower().replace(' ','') in curSynonym[0]:
-                    if self.scoreGraded == 'True':
-                        score += curSynonym[1]
-                    else:
-                        score += 1
-                    break
-        
-        #determine which usages are new
+        #find the synonyms that were hit and the usages that are new
+        hitSynonyms = set()
         newItems = []
         for curUsage in brickUsages:
-            found = False
-            for curSynonym in self.scoringTable:
-                if curUsage.strip().lower().replace(' ','') in curSynonym[0]:
-                    found = True
-                    break
-            if not found:
+            curSynonyms = self.answerIndex.get(curUsage.strip().lower().replace(' ',''))
+            if curSynonyms:
+                hitSynonyms.update(curSynonyms)
+            else:
                 newItems.append(curUsage)
         
+        #every synonym counts once and they are added up in the order of the table
+        score = 0.0
+        for curIndex in sorted(hitSynonyms):
+            if self.scoreGraded == 'True':
+                score += self.scoringTable[curIndex][1]
+            else:
+                score += 1
+        
         return score, newItems
     
@@ -1,6 +1,7 @@
 from Scoring.brainstormFileInterface import importBrainstormBrickFile, importBrainstormEquationsFile, importBrainstormWordsFile
 import json
 from os import linesep
+from os.path import exists, splitext
 
 #TODO add docstring and doctest
 def exportNewBrainstormItems( newAnswers, taskPrefix, settings ):
@@ -13,8 +14,8 @@ def exportNewBrainstormItems( newAnswers, taskPrefix, settings ):
     loadFunc = loaderFunctions[taskPrefix]
     wrongAnswers = loadFunc(settings['Brainstorming'][taskPrefix + ' Wrong Answers'])
     
-    #create a list of new answers
-    newAnswers = [curAnswer for curAnswer in newAnswers if not curAnswer in wrongAnswers]
+    #create a sorted list of new answers so the file doesn't depend on the order they were found in
+    newAnswers = sorted([curAnswer for curAnswer in newAnswers if not curAnswer in wrongAnswers])
     
     #open the file for the new answers and write new answers that aren't wrong in there
     with open(settings['Brainstorming'][taskPrefix + ' New Answers'], 'w+') as fp:
@@ -22,9 +23,9 @@ def exportNewBrainstormItems( newAnswers, taskPrefix, settings ):
 
 #TODO Add docstring
 def exportNewGridAnswers( newAnswers, settings ):
-    #make sure all new Answers are lists
+    #make sure all new Answers are sorted lists
     for curTask in newAnswers:
-        newAnswers[curTask] = list(newAnswers[curTask])
+        newAnswers[curTask] = sorted(newAnswers[curTask])
         
     #export the new answers as json
     with open(settings['Scoring']['New Grid Answers Json'], 'w+') as fp:
@@ -36,3 +37,86 @@ def exportNewGridAnswers( newAnswers, settings ):
             fp.write(curTask + ':' + linesep)
             for curAnswer in newAnswers[curTask]:
                 fp.write('\t' + curAnswer + linesep)
+
+
+def getFirstAnswersFilename( newAnswersFilename ):
+    """
+    Return the name of the file with the first answers next to the new grid answers json
+    
+    >>> getFirstAnswersFilename('Results/newgrid.shard1of2.json')
+    'Results/newgrid.shard1of2.firstAnswers.json'
+    """
+    root, extension = splitext(newAnswersFilename)
+    return root + '.firstAnswers' + extension
+
+def exportFirstGridAnswers( taskNewAnswers, filename ):
+    """
+    Write the first answer, the session it came from and the later answers of the new grid
+    answers of every task in the order the tasks were scored. This is what mergeNewGridAnswers
+    needs to reproduce the new answers of a single run from the ones of the shards of a study
+    """
+    firstAnswers = []
+    for curTaskName, curNewAnswers in taskNewAnswers:
+        firstAnswers.append([curTaskName, {curItem: [curNewAnswers[curItem].firstSession, curNewAnswers[curItem].firstAnswer, sorted(curNewAnswers[curItem].laterAnswers)]
+                                           for curItem in curNewAnswers if hasattr(curNewAnswers[curItem], 'firstAnswer')}])
+    with open(filename, 'w+') as fp:
+        json.dump(firstAnswers, fp, indent = 4, sort_keys = True)
+
+def mergeNewGridAnswers( firstAnswersFilenames ):
+    """
+    Merge the first answers files of the shards of a study into the new grid answers of a single run
+    For every item the shard with the earliest session provides the first answer, which is
+    split into its characters like newGridAnswerSet does it, and all other answers are added whole
+    Later tasks replace the new answers of the items they share with earlier tasks like scoreStudy does it
+    """
+    allShards = []
+    for curFilename in firstAnswersFilenames:
+        with open(curFilename, 'r') as fp:
+            allShards.append(json.load(fp))
+
+    allNewAnswers = {}
+    for curTask in range(len(allShards[0])):
+        #collect the entries of all shards per item
+        itemEntries = {}
+        for curShard in allShards:
+            for curItem, (firstSession, firstAnswer, laterAnswers) in curShard[curTask][1].items():
+                itemEntries.setdefault(curItem.encode('utf-8'), []).append((firstSession.encode('utf-8'), firstAnswer.encode('utf-8'), [curAnswer.encode('utf-8') for curAnswer in laterAnswers]))
+
+        for curItem in itemEntries:
+            curEntries = sorted(itemEntries[curItem])
+            mergedAnswers = set(curEntries[0][1])
+            for curIndex, (firstSession, firstAnswer, laterAnswers) in enumerate(curEntries):
+                if curIndex > 0:
+                    mergedAnswers.add(firstAnswer)
+                mergedAnswers.update(laterAnswers)
+            allNewAnswers[curItem] = mergedAnswers
+    return allNewAnswers
+
+def importNewAnswers( filename ):
+    """
+    Read a new answers file with one answer per line, there are no answers if the file doesn't exist
+    """
+    if not exists(filename):
+        return []
+    with open(filename, 'r') as fp:
+        return [curAnswer for curAnswer in fp.read().split(linesep) if curAnswer]
+
+def importNewGridAnswers( filename ):
+    """
+    Read the new grid answers json as item: set of answers, there are none if the file doesn't exist
+    """
+    if not exists(filename):
+        return {}
+    with open(filename, 'r') as fp:
+        newAnswers = json.load(fp)
+    return {curItem.encode('utf-8'): set([curAnswer.encode('utf-8') for curAnswer in newAnswers[curItem]]) for curItem in newAnswers}
+
+def mergeNewAnswerLists( shardFilenames, outFilename ):
+    """
+    Merge the new answers files that have one answer per line into a sorted list without duplicates
+    """
+    allAnswers = set()
+    for curFilename in shardFilenames:
+        allAnswers.update(importNewAnswers(curFilename))
+    with open(outFilename, 'wb') as fp:
+        fp.write(linesep.join(sorted(allAnswers)))
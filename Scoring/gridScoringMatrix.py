@@ -0,0 +1,122 @@
+"""
+Score the basic grid tasks of all sessions at once. The answers of all sessions are put into
+one session x item matrix of answer codes and the answer key is looked up for all cells with
+one sorted search, so a task is scored with a masked sum over the columns of its items
+instead of looking up every item of every session in the gridScores.
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.gridAnswerStruct import gridPrefixIndex
+import numpy as np
+
+class studyGridMatrix:
+    """
+    The grid answers of all sessions as a session x item matrix of interned answer codes
+    Items a session didn't answer have the code -1. The items are in the order they first
+    appear and the order every session iterates over its items is kept as well.
+    """
+    def __init__(self, sessions):
+        self.sessionNames = [curSession.sessionName for curSession in sessions]
+        self.items = []
+        self.itemColumns = {}
+        self.answers = []
+        self.answerCodes = {}
+
+        #intern the items and answers of every session
+        rows = []
+        for curSession in sessions:
+            curAnswers = curSession.gridAnswers().answers
+            curRow = []
+            for curItem in curAnswers:
+                if not curItem in self.itemColumns:
+                    self.itemColumns[curItem] = len(self.items)
+                    self.items.append(curItem)
+                curAnswer = curAnswers[curItem]
+                if not curAnswer in self.answerCodes:
+                    self.answerCodes[curAnswer] = len(self.answers)
+                    self.answers.append(curAnswer)
+                curRow.append((self.itemColumns[curItem], self.answerCodes[curAnswer]))
+            rows.append(curRow)
+
+        #the position of every item in the order the session iterates over them, unanswered items come last
+        self.codes = np.full((len(rows), len(self.items)), -1, np.int64)
+        self.positions = np.full((len(rows), len(self.items)), len(self.items), np.int64)
+        for curIndex, curRow in enumerate(rows):
+            curColumns = [curColumn for curColumn, curCode in curRow]
+            self.codes[curIndex, curColumns] = [curCode for curColumn, curCode in curRow]
+            self.positions[curIndex, curColumns] = np.arange(len(curColumns))
+
+        self.index = gridPrefixIndex(self.items)
+        self.scores = None
+
+    def compileAnswerKey(self, scorer):
+        """
+        Look up the score of every cell in the answer key of the gridScores
+        The scores are -1 for answers that aren't in the answer key and for cells without an answer
+        The items that aren't in the answer key at all are marked in unknownItems
+        """
+        nAnswers = max(len(self.answers), 1)
+        pairKeys = []
+        pairScores = []
+        unknownItems = np.zeros(len(self.items), bool)
+        for curColumn, curItem in enumerate(self.items):
+            if not scorer.hasTask(curItem):
+                unknownItems[curColumn] = True
+                continue
+            for curAnswer, curScore in scorer.getAnswerKey(curItem).items():
+                if curAnswer in self.answerCodes:
+                    pairKeys.append(curColumn * nAnswers + self.answerCodes[curAnswer])
+                    pairScores.append(curScore)
+
+        #the answer key as sorted (item, answer) pairs, ints stay ints so the sums stay exact
+        self.scores = np.full(self.codes.shape, -1, np.array(pairScores).dtype if pairScores else np.int64)
+        if pairKeys:
+            order = np.argsort(pairKeys)
+            sortedKeys = np.array(pairKeys, np.int64)[order]
+            sortedScores = np.array(pairScores)[order]
+            cellKeys = np.arange(len(self.items), dtype = np.int64)[np.newaxis, :] * nAnswers + self.codes
+            positions = np.minimum(np.searchsorted(sortedKeys, cellKeys), len(sortedKeys) - 1)
+            found = (self.codes >= 0) & (sortedKeys[positions] == cellKeys)
+            self.scores[found] = sortedScores[positions[found]]
+        self.unknownItems = unknownItems
+
+    def scoreTask(self, itemPrefix):
+        """
+        Return the sum of the known scores of the items with the prefix for every session like
+        basicGridTaskEvaluator computes it and the answers that aren't in the answer key as
+        (item, answer, sessionName) tuples in the order of the sessions
+        The answer key has to be compiled first
+        """
+        columns = [self.itemColumns[curItem] for curItem in self.index.itemsWithPrefix(itemPrefix.lower().strip())]
+        answered = self.codes[:, columns] >= 0
+
+        #answering an item without an answer key is an error like in gridScores.getScore
+        unknownAnswered = answered & self.unknownItems[columns]
+        if unknownAnswered.any():
+            task = self.items[columns[np.nonzero(unknownAnswered)[1][0]]]
+            print 'Error: Task {} not found in grid scoring json file.'.format(task)
+            raise KeyError
+
+        cellScores = self.scores[:, columns]
+        known = answered & (cellScores != -1)
+        if np.issubdtype(cellScores.dtype, np.integer):
+            taskScores = np.where(known, cellScores, 0).sum(axis = 1).tolist()
+        else:
+            #floats are added up in the order of the items of every session to get the same sums,
+            #cumsum adds one column after the other for all sessions at once
+            knownScores = np.where(known, cellScores, 0.0)
+            if len(columns):
+                order = np.argsort(self.positions[:, columns], axis = 1, kind = 'mergesort')
+                knownScores = np.cumsum(knownScores[np.arange(len(knownScores))[:, np.newaxis], order], axis = 1)[:, -1]
+            else:
+                knownScores = np.zeros(len(knownScores))
+            #sessions without a known answer keep the integer 0 they always had
+            taskScores = [curScore if curKnown else 0 for curScore, curKnown in zip(knownScores.tolist(), known.any(axis = 1).tolist())]
+
+        newAnswers = []
+        for curIndex, curPosition in zip(*np.nonzero(answered & (cellScores == -1))):
+            curColumn = columns[curPosition]
+            newAnswers.append((self.items[curColumn], self.answers[self.codes[curIndex, curColumn]], self.sessionNames[curIndex]))
+        return taskScores, newAnswers
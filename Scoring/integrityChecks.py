@@ -7,34 +7,36 @@ produce alerts where duplicate files are found or where files are empty
 """
 
 from DataStructures.sessionData import readStudy
-from os.path import exists, getsize
+from DataStructures.studyArchive import openStudyFile
+from DataStructures.studyPrefetch import startPrefetch
 from os import linesep
-from os import sep
 from hashlib import md5
 
 #TODO add docstrings and doctest
-#TODO fix it to use sessionData instead of compiling filename by hand
 def checkSessionIntegrity(session, settings, reportFP, md5Dict):
     for curExpectedFile in settings['FileExtension']:
         if curExpectedFile == 'basepath' or curExpectedFile == 'scriptpath':
             continue
         
-        filename = settings['General']['dataFolder'] + session['sessionname'] + sep + session['sessionname'] + ' - ' + settings['FilePrefix'][curExpectedFile] + '.' + settings['FileExtension'][curExpectedFile]
+        #the filename comes from the session so it is the same one the prefetch plan has
+        filename = session[curExpectedFile]
         reportFP.write('<br> {}: '.format(curExpectedFile))
 
-        #check for missing files
-        if not exists(filename):
+        #check for missing files, the size comes from the study manifest if there is one
+        fileSize = session.getFileSize(curExpectedFile)
+        if fileSize is None:
             reportFP.write('<font color = \'red\'>Error ' + filename + ' - File Missing</font>')
             continue
 
         #check for empty files but add some leeway in case there is just a newline char in there
-        if getsize(filename) < 4:
+        if fileSize < 4:
             reportFP.write('<font color = \'orange\'>Warning - File Empty</font>')
             continue
 
         #open the file and compute the hexdigest
         md5Computer = md5()
-        md5Computer.update( open(filename, 'r').read() )
+        with openStudyFile(filename, 'r') as fp:
+            md5Computer.update( fp.read() )
         fileMD5 = md5Computer.hexdigest()
         if fileMD5 in md5Dict:
             reportFP.write('<font color = \'orange\'>Warning - File is a duplicate of {}</font>'.format(md5Dict[fileMD5]))
@@ -59,9 +61,18 @@ def checkStudyIntegrity(settings):
         #init the md5Dict to check for duplicate files
         md5Dict = {}
         
+        #read the files ahead in the order they are checked (see studyPrefetch)
+        plan = [curSession[curExpectedFile] for curSession in sessions for curExpectedFile in settings['FileExtension']
+                if curExpectedFile != 'basepath' and curExpectedFile != 'scriptpath']
+        prefetcher = startPrefetch(settings, plan)
+
         #cycle the sessions
-        for curSession in sessions:
-            fp.write('<h4>Session Name: {}</hh><br>'.format(curSession['sessionname']) + linesep)
-            
-            #call the functions that export the log file for that session
-            md5Dict = checkSessionIntegrity(curSession,settings, fp, md5Dict)
\ No newline at end of file
+        try:
+            for curSession in sessions:
+                fp.write('<h4>Session Name: {}</hh><br>'.format(curSession['sessionname']) + linesep)
+
+                #call the functions that export the log file for that session
+                md5Dict = checkSessionIntegrity(curSession,settings, fp, md5Dict)
+        finally:
+            if prefetcher:
+                prefetcher.close()
\ No newline at end of file
@@ -1,8 +1,22 @@
+from DataStructures.studyArchive import openStudyFile
+import csv
+import re
+
 #TODO: Docstring and tests
 def importTextFile( filename ):
     #read the file, remove empty lines and strip everything
-    with open(filename, 'r') as fp:
+    with openStudyFile(filename, 'r') as fp:
         lines = fp.read().splitlines()
         lines = [curLine.strip() for curLine in lines if curLine.strip()]
 
     return lines
+
+def importCsvFile( filename ):
+    #read all the rows of a csv file
+    with openStudyFile(filename, 'r') as fp:
+        return list(csv.reader(fp))
+
+def importWordsFile( filename ):
+    #read all the words of a file
+    with openStudyFile(filename, 'r') as fp:
+        return re.findall(r"\w+", fp.read())
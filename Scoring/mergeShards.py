@@ -0,0 +1,68 @@
+"""
+Merge the results of the shards of a study into the files a single run over the whole study writes
+
+:Author: David Engel
+:Email: entrymissing@gmail.com
+"""
+
+from DataStructures.studyShards import getShardFilename, mergeSessionFiles
+from DataStructures.scoringParameters import scoringParameters
+from LogAnalyzer.logFileAnalyzer import mergeLogAnalysis
+from Scoring.scoreStudy import mergeScores
+from Scoring.exportNewItems import exportNewGridAnswers, getFirstAnswersFilename, mergeNewGridAnswers, mergeNewAnswerLists
+from os.path import exists
+
+#the long format results with the session in the first column
+sessionResultFiles = ['logAnalysisSummaryFilename', 'logAnalysisLongFilename', 'speakerTransitionsFilename', 'turnLengthsFilename',
+                      'logTimeSeriesFilename', 'gridReplayFilename', 'gridCreditFilename']
+
+def getShardFilenames( filename, shardCount ):
+    """
+    Return the files of all shards for an output file or None if not all of them exist
+    """
+    if not filename:
+        return None
+    shardFilenames = [getShardFilename(filename, '{}/{}'.format(curShard, shardCount)) for curShard in range(1, shardCount + 1)]
+    if not all([exists(curFilename) for curFilename in shardFilenames]):
+        return None
+    return shardFilenames
+
+def mergeShards( settings, shardCount ):
+    """
+    Merge the scores, the new answers and the log analysis of shardCount shards
+    Outputs that not all shards have written are skipped
+    """
+    #the scores and the new answers
+    shardFilenames = getShardFilenames(settings['ResultFiles'].get('scoresFilename'), shardCount)
+    if shardFilenames:
+        mergeScores(settings, shardFilenames)
+        print 'Merged the scores'
+
+    shardFilenames = getShardFilenames(settings['Scoring']['New Grid Answers Json'], shardCount)
+    if shardFilenames:
+        exportNewGridAnswers(mergeNewGridAnswers([getFirstAnswersFilename(curFilename) for curFilename in shardFilenames]), settings)
+        print 'Merged the new grid answers'
+
+    newAnswerFiles = []
+    if settings.has_section('Memory'):
+        newAnswerFiles.append(settings['Memory'].get('New Words File'))
+    for curTask in scoringParameters(settings):
+        if curTask['ScoringFunction'] == 'brainstormTask':
+            newAnswerFiles.append(settings['Brainstorming'].get(curTask['IniFileSelector'] + ' New Answers'))
+    for curFilename in newAnswerFiles:
+        shardFilenames = getShardFilenames(curFilename, shardCount)
+        if shardFilenames:
+            mergeNewAnswerLists(shardFilenames, curFilename)
+            print 'Merged {}'.format(curFilename)
+
+    #the log analysis
+    shardFilenames = getShardFilenames(settings['ResultFiles'].get('logAnalysisFilename'), shardCount)
+    if shardFilenames:
+        mergeLogAnalysis(shardFilenames, settings['ResultFiles']['logAnalysisFilename'])
+        print 'Merged the log analysis'
+
+    for curKey in sessionResultFiles:
+        shardFilenames = getShardFilenames(settings['ResultFiles'].get(curKey), shardCount)
+        if shardFilenames:
+            mergeSessionFiles(shardFilenames, settings['ResultFiles'][curKey])
+            print 'Merged {}'.format(settings['ResultFiles'][curKey])
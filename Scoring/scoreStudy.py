@@ -6,15 +6,163 @@ Score a study
 """
 from Scoring.taskScoringClasses import basicGridTaskEvaluator, brainstormTaskEvaluator, typingTaskEvaluator, gameTaskEvaluator, orderedGridTaskEvaluator, judgementTaskEvaluator, judgementPagesTaskEvaluator, detectionTaskEvaluator, memoryWordsTaskEvaluator
 from DataStructures.sessionData import readStudy
+from DataStructures.studyPrefetch import startPrefetch
+from DataStructures.sessionSelection import selectSessions
 from DataStructures.scoringParameters import scoringParameters, combinationParameters
-from Scoring.exportNewItems import exportNewGridAnswers
+from Scoring.exportNewItems import exportNewGridAnswers, exportFirstGridAnswers, getFirstAnswersFilename, importNewGridAnswers
+from collections import OrderedDict
+from os.path import exists
 import pandas
 import numpy as np
+import csv
 
-#TODO write docstring and tests
-def scoreStudy(settings):
+def combineTaskScores( taskNames, taskScores, combineParameters ):
+    """
+    Append the combinations of tasks to the task names and scores
+    Every task of a combination is standardized with the mean and std of the study unless they are given
+    Sessions without a score of a task are left out of its mean and std and get a nan combination
+    """
+    #cycle the tasks that should be combined
+    for curCombination in combineParameters:
+        newScores = np.zeros(len(taskScores[0]))
+        for curSubTask in combineParameters[curCombination]:
+            if not curSubTask['TaskName'] in taskNames:
+                print 'Error in combineTaskScores: Task {} of {} has not been scored'.format(curSubTask['TaskName'], curCombination)
+                raise KeyError
+            curTaskScores = np.array(taskScores[taskNames.index(curSubTask['TaskName'])],'f')
+
+            #the study mean and std only use the sessions that have a score
+            meanFunction, stdFunction = np.mean, np.std
+            missingScores = np.count_nonzero(np.isnan(curTaskScores))
+            if missingScores:
+                print 'Warning in combineTaskScores: {} sessions have no score for {}, their {} is nan'.format(missingScores, curSubTask['TaskName'], curCombination)
+                meanFunction, stdFunction = np.nanmean, np.nanstd
+
+            if curSubTask['Mean'] == 'False':
+                curTaskScores -= meanFunction(curTaskScores)
+            else:
+                curTaskScores -= float(curSubTask['Mean'])
+
+            if curSubTask['Std'] == 'False':
+                curTaskScores /= stdFunction(curTaskScores)
+            else:
+                curTaskScores /= float(curSubTask['Std'])
+            
+            print newScores.shape
+            newScores += curTaskScores / len(combineParameters[curCombination])
+
+        taskNames.append(curCombination)
+        taskScores.append(newScores)
+
+def writeScores( sessionNames, taskNames, taskScores, outFilename ):
+    """
+    Store the scores in a panda dataframe and write it to the results file
+    """
+    dFrame = pandas.DataFrame(np.array(taskScores).T, columns = taskNames, index = sessionNames)
+    dFrame.to_csv(outFilename)
+
+def selectTasks( parameters, tasks ):
+    """
+    Return the parameters of the tasks in the comma separated list of task names in the order they are scored
+    """
+    taskNames = [curTask.strip() for curTask in tasks.split(',') if curTask.strip()]
+    allTaskNames = [curTaskParameters['TaskName'] for curTaskParameters in parameters]
+    for curTask in taskNames:
+        if not curTask in allTaskNames:
+            print 'Error in selectTasks: Task {} is not in the scoring parameters'.format(curTask)
+            raise ValueError
+    return [curTaskParameters for curTaskParameters in parameters if curTaskParameters['TaskName'] in taskNames]
+
+def readScores( filename ):
+    """
+    Read a scores file and return the session names, the column names and the values by (session, column)
+    Empty values are returned as nan
+    """
+    scores = {}
+    sessionNames = []
+    with open(filename, 'rb') as fp:
+        csvReader = csv.reader(fp)
+        columnNames = csvReader.next()[1:]
+        for curLine in csvReader:
+            sessionNames.append(curLine[0])
+            for curColumn, curValue in zip(columnNames, curLine[1:]):
+                scores[(curLine[0], curColumn)] = float(curValue) if curValue else np.nan
+    return sessionNames, columnNames, scores
+
+def mergeRescoredScores( settings, parameters, sessionNames, taskNames, taskScores, combineParameters ):
+    """
+    Merge the scores of some tasks and sessions into the existing scores file
+    All other scores are kept and the combinations that depend on the scored tasks are computed
+    again on all sessions. Scores that are in neither are nan.
+    """
+    scoresFilename = settings['ResultFiles']['scoresFilename']
+    fileSessions, fileColumns, fileScores = [], [], {}
+    if exists(scoresFilename):
+        fileSessions, fileColumns, fileScores = readScores(scoresFilename)
+
+    #the sessions are in the order readStudy returns them and the tasks in the order they are scored
+    allSessions = sorted(set(fileSessions) | set(sessionNames))
+    allTasks = [curTaskParameters['TaskName'] for curTaskParameters in parameters
+                if curTaskParameters['TaskName'] in taskNames or curTaskParameters['TaskName'] in fileColumns]
+    newScores = {}
+    for curTask, curScores in zip(taskNames, taskScores):
+        for curSession, curScore in zip(sessionNames, curScores):
+            newScores[(curSession, curTask)] = curScore
+
+    mergedNames = list(allTasks)
+    mergedScores = []
+    for curTask in allTasks:
+        mergedScores.append([newScores.get((curSession, curTask), fileScores.get((curSession, curTask), np.nan)) for curSession in allSessions])
+
+    #compute the combinations of the scored tasks again and keep the others
+    changedCombinations = OrderedDict()
+    for curCombination in combineParameters:
+        if not curCombination in fileColumns or any([curSubTask['TaskName'] in taskNames for curSubTask in combineParameters[curCombination]]):
+            #a combination can only be computed if all its tasks are scored or in the scores file
+            missingTasks = [curSubTask['TaskName'] for curSubTask in combineParameters[curCombination] if not curSubTask['TaskName'] in mergedNames]
+            if missingTasks:
+                print 'Warning in mergeRescoredScores: {} is not computed again since {} is neither scored nor in {}'.format(curCombination, ', '.join(missingTasks), scoresFilename)
+                continue
+            changedCombinations[curCombination] = combineParameters[curCombination]
+    combineTaskScores(mergedNames, mergedScores, changedCombinations)
+    for curCombination in combineParameters:
+        if not curCombination in changedCombinations:
+            mergedNames.append(curCombination)
+            mergedScores.append([fileScores.get((curSession, curCombination), np.nan) for curSession in allSessions])
+
+    #put the combinations in the order of a full run
+    combinationOrder = allTasks + list(combineParameters)
+    mergedColumns = sorted(zip(mergedNames, mergedScores), key = lambda curColumn: combinationOrder.index(curColumn[0]))
+    writeScores(allSessions, [curName for curName, curScores in mergedColumns], [curScores for curName, curScores in mergedColumns], scoresFilename)
+
+def mergeNewGridAnswersFile( newAnswers, settings, gridScorer ):
+    """
+    Add the new grid answers in the exported json to the new answers of some tasks and sessions
+    and drop the answers that are in the answer key by now
+    The answers of the scored sessions are added whole since the session with the first answer of
+    an item, whose characters a full run adds, is usually not among them
+    """
+    for curItem in newAnswers:
+        newAnswers[curItem] = set([newAnswers[curItem].firstAnswer]) | newAnswers[curItem].laterAnswers
+    for curItem, curAnswers in importNewGridAnswers(settings['Scoring']['New Grid Answers Json']).items():
+        newAnswers[curItem] = newAnswers.get(curItem, set()) | curAnswers
+    for curItem in newAnswers.keys():
+        if gridScorer.hasTask(curItem):
+            newAnswers[curItem] = set([curAnswer for curAnswer in newAnswers[curItem] if gridScorer.getScore(curItem, curAnswer) == -1])
+        if not newAnswers[curItem]:
+            del newAnswers[curItem]
+
+def scoreStudy( settings, tasks = None, sessionSelector = None ):
+    """
+    Score all tasks of all sessions and write the scores file and the new answers
+    If a comma separated list of task names or a session selector (see sessionSelection) are
+    given only those tasks and sessions are scored. Their scores are merged into the existing
+    scores file and their new answers are added to the ones that were exported before.
+    """
     #read everything
     sessions = readStudy( settings )
+    if sessionSelector:
+        sessions = selectSessions(sessions, settings, sessionSelector)
     evaluatorClasses = {'basicGridTask':basicGridTaskEvaluator(settings),
                         'orderedGridTask':orderedGridTaskEvaluator(settings),
                         'brainstormTask':brainstormTaskEvaluator(settings),
@@ -27,6 +175,11 @@ def scoreStudy(settings):
                         }
     parameters = scoringParameters( settings )
     combineParameters = combinationParameters(settings)
+    scoredParameters = selectTasks(parameters, tasks) if tasks else parameters
+    rescoring = tasks or sessionSelector
+    if rescoring:
+        for curEvaluator in evaluatorClasses.values():
+            curEvaluator.mergeNewAnswers = True
     
     #prepare the results variables
     sessionNames = [curSession.sessionName for curSession in sessions]
@@ -34,40 +187,76 @@ def scoreStudy(settings):
     taskScores = []
     allNewAnswers = {}
     
+    #read the session files ahead in the order the tasks will need them (see studyPrefetch)
+    plan = [curSession[curKey] for curTaskParameters in scoredParameters for curSession in sessions
+            for curKey in evaluatorClasses[curTaskParameters['ScoringFunction']].sessionFiles(curTaskParameters)]
+    prefetcher = startPrefetch(settings, plan)
+
     #cycle the tasks and score them
-    for curTaskParameters in parameters:
-        curScoringFunction = curTaskParameters['ScoringFunction']
-        taskNames.append(curTaskParameters['TaskName'])
-        scores, newAnswers = evaluatorClasses[curScoringFunction].computeScores(sessions, curTaskParameters)
-        taskScores.append(scores)
-        for curNewAnswer in newAnswers:
-            allNewAnswers[curNewAnswer] = newAnswers[curNewAnswer]
+    taskNewAnswers = []
+    try:
+        for curTaskParameters in scoredParameters:
+            curScoringFunction = curTaskParameters['ScoringFunction']
+            taskNames.append(curTaskParameters['TaskName'])
+            scores, newAnswers = evaluatorClasses[curScoringFunction].computeScores(sessions, curTaskParameters)
+            taskScores.append(scores)
+            taskNewAnswers.append((curTaskParameters['TaskName'], newAnswers))
+            for curNewAnswer in newAnswers:
+                allNewAnswers[curNewAnswer] = newAnswers[curNewAnswer]
+    finally:
+        if prefetcher:
+            prefetcher.close()
         
+    #the shards of a study also keep what is needed to merge the new answers
+    if settings['General'].get('shard'):
+        exportFirstGridAnswers(taskNewAnswers, getFirstAnswersFilename(settings['Scoring']['New Grid Answers Json']))
+
     #export the new Grid answers
+    if rescoring:
+        mergeNewGridAnswersFile(allNewAnswers, settings, evaluatorClasses['basicGridTask'].gridScores)
     exportNewGridAnswers(allNewAnswers, settings)
-  
-    #cycle the tasks that should be combined
-    for curCombination in combineParameters:
-        newScores = np.zeros(len(taskScores[0]))
-        for curSubTask in combineParameters[curCombination]:
-            curTaskScores = np.array(taskScores[taskNames.index(curSubTask['TaskName'])],'f')
-            if curSubTask['Mean'] == 'False':
-                curTaskScores -= np.mean(curTaskScores)
-            else:
-                curTaskScores -= float(curSubTask['Mean'])
 
-            if curSubTask['Std'] == 'False':
-                curTaskScores /= np.std(curTaskScores)
-            else:
-                curTaskScores /= float(curSubTask['Std'])
-            
-            print newScores.shape
-            newScores += curTaskScores / len(combineParameters[curCombination])
+    if rescoring:
+        mergeRescoredScores(settings, parameters, sessionNames, taskNames, taskScores, combineParameters)
+        return
+    combineTaskScores(taskNames, taskScores, combineParameters)
+    writeScores(sessionNames, taskNames, taskScores, settings['ResultFiles']['scoresFilename'])
 
-        taskNames.append(curCombination)
-        taskScores.append(newScores)
+def mergeScores( settings, shardFilenames ):
+    """
+    Merge the scores files of the shards of a study into the scores file of a single run
+    The task scores are taken from the shards and the combinations are computed again on all sessions
+    All shards have to exist and have the same columns
+    """
+    if not shardFilenames:
+        print 'Error in mergeScores: There are no shards to merge'
+        raise IOError
+    for curFilename in shardFilenames:
+        if not exists(curFilename):
+            print 'Error in mergeScores: The shard {} does not exist'.format(curFilename)
+            raise IOError
 
+    combineParameters = combinationParameters(settings)
+    allRows = []
+    firstHeader = None
+    for curFilename in shardFilenames:
+        with open(curFilename, 'rb') as fp:
+            csvReader = csv.reader(fp)
+            header = csvReader.next()
+            if firstHeader is None:
+                firstHeader = header
+            elif header != firstHeader:
+                print 'Error in mergeScores: The columns of {} are not the same as the ones of {}'.format(curFilename, shardFilenames[0])
+                raise ValueError
+            taskColumns = [curIndex for curIndex, curName in enumerate(header) if curIndex > 0 and not curName in combineParameters]
+            taskNames = [header[curIndex] for curIndex in taskColumns]
+            for curLine in csvReader:
+                allRows.append((curLine[0], [float(curLine[curIndex]) if curLine[curIndex] else np.nan for curIndex in taskColumns]))
 
-    #store everything in a panda dataframe and write it to the results file
-    dFrame = pandas.DataFrame(np.array(taskScores).T, columns = taskNames, index = sessionNames)
-    dFrame.to_csv(settings['ResultFiles']['scoresFilename'])
\ No newline at end of file
+    #the sessions are in the order readStudy returns them
+    allRows.sort(key = lambda curRow: curRow[0])
+    sessionNames = [curSession for curSession, curScores in allRows]
+    taskScores = [list(curScores) for curScores in zip(*[curScores for curSession, curScores in allRows])]
+
+    combineTaskScores(taskNames, taskScores, combineParameters)
+    writeScores(sessionNames, taskNames, taskScores, settings['ResultFiles']['scoresFilename'])
@@ -6,20 +6,49 @@ The evaluator classes and functions that scores the data on a task level (i.e. a
 """
 
 from DataStructures.gridScoringStruct import gridScores
-from DataStructures.gridAnswerStruct import GridAnswers
 from Scoring.brainstormFileInterface import importBrainstormBrickFile, importBrainstormEquationsFile, importBrainstormWordsFile
 from Scoring.brainstormScoring import ScoreBrainstorm
 from Scoring.textMatchingClasses import typingTextMatcher, typingNumbersMatcher
-from Scoring.exportNewItems import exportNewBrainstormItems
-from os.path import getsize
+from Scoring.exportNewItems import exportNewBrainstormItems, importNewAnswers
+from Scoring.ioHelpers import importTextFile, importCsvFile, importWordsFile
+from Scoring.gridScoringMatrix import studyGridMatrix
+from DataStructures.scoringBundle import loadScoringSource
 from os import linesep
 import numpy as np
-import csv
-import json
-import re
 
 #TODO: Split classes to different files
 
+class newGridAnswerSet(set):
+    """
+    The new answers that were given for a grid item
+    The set starts out with the characters of the first answer and every later answer is added
+    as a whole. The first answer, its session and the later answers are kept as well so that the
+    new answers of the shards of a study can be merged into the ones of a single run
+    
+    >>> answers = newGridAnswerSet('ab', 'Session 1')
+    >>> answers.addLater('cd')
+    >>> sorted(answers), answers.firstAnswer, answers.firstSession, answers.laterAnswers
+    (['a', 'b', 'cd'], 'ab', 'Session 1', set(['cd']))
+    """
+    def __init__(self, firstAnswer, firstSession):
+        set.__init__(self, firstAnswer)
+        self.firstAnswer = firstAnswer
+        self.firstSession = firstSession
+        self.laterAnswers = set()
+
+    def addLater(self, answer):
+        self.add(answer)
+        self.laterAnswers.add(answer)
+
+def addNewGridAnswer( newAnswers, item, answer, sessionName ):
+    """
+    Add an answer that isn't in the answer key to the dict of new answers per item
+    """
+    if not item in newAnswers:
+        newAnswers[item] = newGridAnswerSet(answer, sessionName)
+    else:
+        newAnswers[item].addLater(answer)
+
 class basicGridTaskEvaluator:
     """
     Basic data evaluation class that just calculates the sum across all items associated with this task. More specific evaluators are derived from this class
@@ -40,50 +69,55 @@ class basicGridTaskEvaluator:
         #store the settings and load the gridScores
         self.settings = settings
         self.gridScores = gridScores(settings)
+        self.gridMatrix = None
+
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['GridItems']
+
+    def getGridMatrix( self, sessions ):
+        """
+        Return the studyGridMatrix of the sessions with the compiled answer key
+        It is built once and shared by all basic grid tasks of the same sessions
+        """
+        if self.gridMatrix is None or self.gridMatrix.sessionNames != [curSession.sessionName for curSession in sessions]:
+            self.gridMatrix = studyGridMatrix(sessions)
+            self.gridMatrix.compileAnswerKey(self.gridScores)
+        return self.gridMatrix
 
     def computeScores( self, sessions, parameters ):
         #extract the task name and the task prefix from the xmlNode
         taskName = parameters['TaskName']
         itemPrefix = parameters['ItemPrefix']
         
-        scores = []
+        #score all sessions at once with the masked sum over the items of the task
+        scores, sessionNewAnswers = self.getGridMatrix(sessions).scoreTask(itemPrefix)
+
+        #the new items are added in the order of the sessions
         newAnswers = {}
-        
-        #cycle the sessions
-        for curSession in sessions:
-            #open the gridfile and cycle the answers
-            curGridAnswers = GridAnswers(curSession['GridItems'])
-            taskScore = 0
-            
-            for curGridItem in curGridAnswers:
-                if curGridItem.startswith(itemPrefix.lower().strip()):
-                    itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
-                    
-                    #decide between new and known items
-                    if itemScore == -1:
-                        if not curGridItem in newAnswers:
-                            newAnswers[curGridItem] = set(curGridAnswers[curGridItem])
-                        else:
-                            newAnswers[curGridItem].add(curGridAnswers[curGridItem])
-                    else:
-                        taskScore += itemScore
-                        
-            scores.append(taskScore)
+        for curGridItem, curAnswer, curSessionName in sessionNewAnswers:
+            addNewGridAnswer(newAnswers, curGridItem, curAnswer, curSessionName)
         return scores, newAnswers
     
 class memoryWordsTaskEvaluator:
     def __init__( self, settings ):
         #store the settings and load the wordList with alternative spellings
         self.settings = settings
-        tempWordList = json.load(open(settings['Memory']['Memory Words Ground Truth']))
-        
-        #make everything lowercase and stripped and create a flat list of all known words to find new typos
-        self.correctWordList = []
-        self.allKnownWords = []
-        for curWord in tempWordList:
-            self.correctWordList.append( [curSyn.strip().lower() for curSyn in curWord])
-            self.allKnownWords.extend([curSyn.strip().lower() for curSyn in curWord])
-        self.allKnownWords = set(self.allKnownWords)            
+        #everything is lowercase and stripped and there is a set of all known words to find new typos
+        wordList = loadScoringSource(settings, 'memoryWords', settings['Memory']['Memory Words Ground Truth'])
+        self.correctWordList = wordList['correctWordList']
+        self.allKnownWords = wordList['allKnownWords']
+
+        #if only some sessions are scored the new words are added to the ones in the file
+        self.mergeNewAnswers = False
+
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['memoryWords']
 
     def computeScores( self, sessions, parameters ):
        #init the results parameters and preload the file postfix
@@ -96,30 +130,32 @@ class memoryWordsTaskEvaluator:
             sequenceCorrect = True
             
             #open the memory words file
-            with open(curSession['memoryWords']) as fp:
-                allWords = fp.read()
-                allWords = re.findall(r"\w+",allWords)
-                allWords = [curWord.lower().strip() for curWord in allWords]
+            allWords = curSession.loadArtifact('memoryWords', importWordsFile)
+            allWords = [curWord.lower().strip() for curWord in allWords]
                 
-                #we cycle the list with correct words and grant one point for each word that has been remembered
-                for curIdx, curCorrect in enumerate(self.correctWordList):
-                    for curSynonym in curCorrect:
-                        if curSynonym in allWords:
-                            #if the word is in sequence you get two points if it is out of sequence
-                            #you get only one point
-                            if parameters['SequenceScoring'] and curIdx == allWords.index(curSynonym) and sequenceCorrect:
-                                curScore += 2
-                            else:
-                                sequenceCorrect = False
-                                curScore +=1
-                            break
+            #we cycle the list with correct words and grant one point for each word that has been remembered
+            for curIdx, curCorrect in enumerate(self.correctWordList):
+                for curSynonym in curCorrect:
+                    if curSynonym in allWords:
+                        #if the word is in sequence you get two points if it is out of sequence
+                        #you get only one point
+                        if parameters['SequenceScoring'] and curIdx == allWords.index(curSynonym) and sequenceCorrect:
+                            curScore += 2
+                        else:
+                            sequenceCorrect = False
+                            curScore +=1
+                        break
                 
             scores.append(curScore)
             newAnswers.extend( list( set(allWords) - self.allKnownWords))
         
+        #keep the new words that are in the file already unless they are known by now
+        if self.mergeNewAnswers:
+            newAnswers.extend([curWord for curWord in importNewAnswers(self.settings["Memory"]['New Words File']) if not curWord in self.allKnownWords])
+
         #write out the new words
         with open(self.settings["Memory"]['New Words File'], 'wb') as fp:
-            fp.write(linesep.join(list(set(newAnswers))))
+            fp.write(linesep.join(sorted(set(newAnswers))))
 
         return scores, {}    
     
@@ -129,6 +165,12 @@ class detectionTaskEvaluator:
         self.settings = settings
         self.gridScores = gridScores(settings)
 
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['GridItems']
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and the task prefix from the xmlNode
         taskName = parameters['TaskName']
@@ -140,25 +182,25 @@ class detectionTaskEvaluator:
         #cycle the sessions
         for curSession in sessions:
             #open the gridfile and cycle the answers
-            curGridAnswers = GridAnswers(curSession['GridItems'])
+            curGridAnswers = curSession.gridAnswers()
             taskScore = 0
             specialItemAnswers = []
             specialItemFrequencies = []
+            specialItems = set(curGridAnswers.itemsWithPrefix(parameters['SpecialItemPrefix']))
             
-            for curGridItem in curGridAnswers:
-                if curGridItem.startswith(itemPrefix.lower().strip()):
-                    #get the item score
-                    itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
-
-                    #check if it is one of the special items (i.e. items where you have to find two objects with the same frequency)
-                    if curGridItem.startswith(parameters['SpecialItemPrefix'].lower().strip()):
-                        specialItemAnswers.append(curGridAnswers[curGridItem])
-                        specialItemFrequencies.append(itemScore)
-                    else:
-                        #add it to the task score if it isn't a -1
-                        #We ignore new answers for this task since this is here for legacy reasons only
-                        if not itemScore == -1:
-                            taskScore += itemScore
+            for curGridItem in curGridAnswers.itemsWithPrefix(itemPrefix):
+                #get the item score
+                itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
+
+                #check if it is one of the special items (i.e. items where you have to find two objects with the same frequency)
+                if curGridItem in specialItems:
+                    specialItemAnswers.append(curGridAnswers[curGridItem])
+                    specialItemFrequencies.append(itemScore)
+                else:
+                    #add it to the task score if it isn't a -1
+                    #We ignore new answers for this task since this is here for legacy reasons only
+                    if not itemScore == -1:
+                        taskScore += itemScore
             
             #compute the score for the special item
             if not len(specialItemAnswers) == 2:
@@ -185,28 +227,43 @@ class brainstormTaskEvaluator:
                                 'brainstormWords': importBrainstormWordsFile,
                                 'brainstormEquations': importBrainstormEquationsFile}
 
+        #if only some sessions are scored the new answers are added to the ones in the file
+        self.mergeNewAnswers = False
+
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return [parameters['IniFileSelector']]
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and init the results
         taskName = parameters['TaskName']
         scores = []
         newAnswers = set()
         
+        #the scoring table is the same for all sessions
+        scorer = ScoreBrainstorm(self.settings, parameters['IniFileSelector'], parameters['ScoreGraded'])
+        
         #cycle the sessions
         for curSession in sessions:
             #load the current session with the designated loader
             loaderFunc = self.loaderFunctions[parameters['IniFileSelector']]
-            curFilename = curSession[parameters['IniFileSelector']]
-            answers = loaderFunc(curFilename)
+            answers = curSession.loadArtifact(parameters['IniFileSelector'], loaderFunc)
             
             #score with the designated scoring function
-            scorer = ScoreBrainstorm(self.settings, parameters['IniFileSelector'], parameters['ScoreGraded'])
             curScores, curNewAnswers = scorer.getScore(answers)
             scores.append(curScores)
             for curAnswer in curNewAnswers:
                 newAnswers.add(curAnswer)
         
+        #keep the new answers that are in the file already unless they are in the scoring table by now
+        newAnswersFilename = self.settings['Brainstorming'][parameters['IniFileSelector'] + ' New Answers']
+        if newAnswersFilename and self.mergeNewAnswers:
+            newAnswers.update(scorer.getScore(importNewAnswers(newAnswersFilename))[1])
+
         #export the new answers if wanted
-        if self.settings['Brainstorming'][parameters['IniFileSelector'] + ' New Answers']:
+        if newAnswersFilename:
             exportNewBrainstormItems(list(newAnswers), parameters['IniFileSelector'], self.settings)
         return scores, {}
     
@@ -215,6 +272,12 @@ class gameTaskEvaluator:
     def __init__( self, settings ):
         self.settings = settings
 
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['metaData']
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and init the results
         taskName = parameters['TaskName']
@@ -223,52 +286,50 @@ class gameTaskEvaluator:
         #cycle the sessions
         for curSession in sessions:
             #load the metadata file
-            curFilename = curSession['metaData']
-            with open(curFilename, 'r') as fp:
-                csvReader = csv.reader(fp)
+            metaDataRows = curSession.loadArtifact('metaData', importCsvFile)
                 
-                #init an indicator to see if the task we are in the metadata section of the task we are looking for
-                taskStarted = False
+            #init an indicator to see if the task we are in the metadata section of the task we are looking for
+            taskStarted = False
                 
-                #we also need to keep tracks of how each individual scored on the picked metric
-                subScores = []
+            #we also need to keep tracks of how each individual scored on the picked metric
+            subScores = []
                 
-                for curLine in csvReader:
-                    #skip empty lines since this is horribly mal formed csv file
-                    if len(curLine) < 2:
-                        continue
-                    #check if we are at the start of the task (the second column has to be the TaskStartIndicator)
-                    #if we found it set taskStarted to true and pick the index of the column where the score we want is
-                    if curLine[1] == parameters['TaskStartIndicator']:
-                        taskStarted = True
-                        scoreColumnIndex = curLine.index(parameters['ScoreColumnIndicator'])
-                        continue
+            for curLine in metaDataRows:
+                #skip empty lines since this is horribly mal formed csv file
+                if len(curLine) < 2:
+                    continue
+                #check if we are at the start of the task (the second column has to be the TaskStartIndicator)
+                #if we found it set taskStarted to true and pick the index of the column where the score we want is
+                if curLine[1] == parameters['TaskStartIndicator']:
+                    taskStarted = True
+                    scoreColumnIndex = curLine.index(parameters['ScoreColumnIndicator'])
+                    continue
                     
-                    #we are only looking for the row that says totals for now
-                    #after we've found the score we break from the loop since we only want the first hit
-                    if taskStarted:
-                        #if the line start with 'Totals' we#ve reached the end of the task and can
-                        #either summarize the individual scores or return the operation on the subscores
-                        if curLine[0] == 'Totals':
-                            #decide what operation we want to do to compute the score for this team
-                            #supported are Totals (the total as computed by the system), mean, min, max, std
-                            if parameters['Operation'].lower() == 'totals':
-                                scores.append( float(curLine[scoreColumnIndex]) )
-                            elif parameters['Operation'].lower() == 'mean':
-                                scores.append( np.mean(subScores) )
-                            elif parameters['Operation'].lower() == 'std':
-                                scores.append( np.std(subScores) )
-                            elif parameters['Operation'].lower() == 'max':
-                                scores.append( max(subScores) )
-                            elif parameters['Operation'].lower() == 'min':
-                                scores.append( min(subScores) )
-                            else:
-                                print 'Operation '  + parameters['Operation'] + ' not supported by gameTaskEvaluator. Returning 0.0'
-                                scores.append(0.0)
-                            break
-                        #otherwise we'll just keep adding the indvidual subscores to the list
+                #we are only looking for the row that says totals for now
+                #after we've found the score we break from the loop since we only want the first hit
+                if taskStarted:
+                    #if the line start with 'Totals' we#ve reached the end of the task and can
+                    #either summarize the individual scores or return the operation on the subscores
+                    if curLine[0] == 'Totals':
+                        #decide what operation we want to do to compute the score for this team
+                        #supported are Totals (the total as computed by the system), mean, min, max, std
+                        if parameters['Operation'].lower() == 'totals':
+                            scores.append( float(curLine[scoreColumnIndex]) )
+                        elif parameters['Operation'].lower() == 'mean':
+                            scores.append( np.mean(subScores) )
+                        elif parameters['Operation'].lower() == 'std':
+                            scores.append( np.std(subScores) )
+                        elif parameters['Operation'].lower() == 'max':
+                            scores.append( max(subScores) )
+                        elif parameters['Operation'].lower() == 'min':
+                            scores.append( min(subScores) )
                         else:
-                            subScores.append(float(curLine[scoreColumnIndex]))
+                            print 'Operation '  + parameters['Operation'] + ' not supported by gameTaskEvaluator. Returning 0.0'
+                            scores.append(0.0)
+                        break
+                    #otherwise we'll just keep adding the indvidual subscores to the list
+                    else:
+                        subScores.append(float(curLine[scoreColumnIndex]))
         return scores, {}
 
 class typingTaskEvaluator:
@@ -280,6 +341,13 @@ class typingTaskEvaluator:
         self.scoringFunctions = {'typingText': typingTextMatcher(settings),
                                 'typingNumbers': typingNumbersMatcher(settings)}
 
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        #the size of ungraded copies doesn't need the file to be read
+        return [parameters['IniFileSelector']] if parameters['ScoreGraded'] == 'True' else []
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and init the results
         taskName = parameters['TaskName']
@@ -295,9 +363,12 @@ class typingTaskEvaluator:
             
             if parameters['ScoreGraded'] == 'True':
                 #score with the designated scoring function
-                curScore = scoringClass.getMatchingScore( curFilename )
+                curScore = scoringClass.getMatchingScore( curFilename, copyLines = curSession.loadArtifact(parameters['IniFileSelector'], importTextFile) )
             else:
-                curScore = getsize( curFilename )
+                curScore = curSession.getFileSize( parameters['IniFileSelector'] )
+                if curScore is None:
+                    print 'Error in typingTaskEvaluator: {} of session {} not found.'.format(curFilename, curSession.sessionName)
+                    raise IOError
             scores.append(curScore)
         return scores, {}
 
@@ -308,6 +379,12 @@ class orderedGridTaskEvaluator:
         self.settings = settings
         self.gridScores = gridScores(settings)
 
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['GridItems']
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and the task prefix from the xmlNode
         taskName = parameters['TaskName']
@@ -320,29 +397,26 @@ class orderedGridTaskEvaluator:
         #cycle the sessions
         for curSession in sessions:
             #open the gridfile and cycle the answers
-            curGridAnswers = GridAnswers(curSession['GridItems'])
+            curGridAnswers = curSession.gridAnswers()
             taskScore = 0
             orderedItemScores = {}
+            orderedItems = set(curGridAnswers.itemsWithPrefix(orderGridPrefix))
             
-            for curGridItem in curGridAnswers:
-                if curGridItem.startswith(itemPrefix.lower().strip()):
-                    itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
+            for curGridItem in curGridAnswers.itemsWithPrefix(itemPrefix):
+                itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
                     
-                    #check if the item is part of the ordered item
-                    if curGridItem.startswith(orderGridPrefix.lower().strip()):
-                        if itemScore == -1:
-                            orderedItemScores[curGridItem] = ''
-                        else:
-                            orderedItemScores[curGridItem] = itemScore
+                #check if the item is part of the ordered item
+                if curGridItem in orderedItems:
+                    if itemScore == -1:
+                        orderedItemScores[curGridItem] = ''
                     else:
-                        #decide between new and known items
-                        if itemScore == -1:
-                            if not curGridItem in newAnswers:
-                                newAnswers[curGridItem] = set(curGridAnswers[curGridItem])
-                            else:
-                                newAnswers[curGridItem].add(curGridAnswers[curGridItem])
-                        else:
-                            taskScore += itemScore
+                        orderedItemScores[curGridItem] = itemScore
+                else:
+                    #decide between new and known items
+                    if itemScore == -1:
+                        addNewGridAnswer(newAnswers, curGridItem, curGridAnswers[curGridItem], curSession.sessionName)
+                    else:
+                        taskScore += itemScore
             
             #compute the score for the ordered grid item
             answeredString = ''
@@ -371,6 +445,12 @@ class judgementPagesTaskEvaluator:
         self.settings = settings
         self.gridScores = gridScores(settings)
 
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['GridItems']
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and the task prefix from the xmlNode
         taskName = parameters['TaskName']
@@ -381,17 +461,16 @@ class judgementPagesTaskEvaluator:
         #cycle the sessions
         for curSession in sessions:
             #open the gridfile and cycle the answers
-            curGridAnswers = GridAnswers(curSession['GridItems'])
+            curGridAnswers = curSession.gridAnswers()
             taskScore = 0
             allAnswers = [0,0,0,0]
             
-            for curGridItem in curGridAnswers:
-                if curGridItem.startswith(itemPrefix.lower().strip()):
-                    itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
-                    try:
-                        taskScore += 1 - (abs(itemScore - int(curGridAnswers[curGridItem])) / itemScore)
-                    except:
-                        continue
+            for curGridItem in curGridAnswers.itemsWithPrefix(itemPrefix):
+                itemScore = self.gridScores.getScore(curGridItem, curGridAnswers[curGridItem])
+                try:
+                    taskScore += 1 - (abs(itemScore - int(curGridAnswers[curGridItem])) / itemScore)
+                except:
+                    continue
             scores.append(taskScore)
         return scores, newAnswers
 
@@ -402,6 +481,12 @@ class judgementTaskEvaluator:
         self.settings = settings
         self.gridScores = gridScores(settings)
 
+    def sessionFiles( self, parameters ):
+        """
+        The keys of the session files computeScores reads for the task
+        """
+        return ['GridItems']
+
     def computeScores( self, sessions, parameters ):
         #extract the task name and the task prefix from the xmlNode
         taskName = parameters['TaskName']
@@ -423,7 +508,7 @@ class judgementTaskEvaluator:
         #cycle the sessions
         for curSession in sessions:
             #open the gridfile and cycle the answers
-            curGridAnswers = GridAnswers(curSession['GridItems'])
+            curGridAnswers = curSession.gridAnswers()
             taskScore = 0
             if taskType == 'Pictures':
                 allAnswers = [1,1,1,1,1]
@@ -431,15 +516,14 @@ class judgementTaskEvaluator:
                 allAnswers = [1,1,1,1,1,1]
                 
             
-            for curGridItem in curGridAnswers:
-                if curGridItem.startswith(itemPrefix.lower().strip()):
-                    itemIndex = int(curGridItem.strip()[-4])
-                    if itemIndex > 4 and not taskType == 'Pictures':
-                        itemIndex -= 1
-                    try:
-                        allAnswers[itemIndex-1] = int(curGridAnswers[curGridItem])
-                    except:
-                        continue
+            for curGridItem in curGridAnswers.itemsWithPrefix(itemPrefix):
+                itemIndex = int(curGridItem.strip()[-4])
+                if itemIndex > 4 and not taskType == 'Pictures':
+                    itemIndex -= 1
+                try:
+                    allAnswers[itemIndex-1] = int(curGridAnswers[curGridItem])
+                except:
+                    continue
             if parameters['Normalize'] == 'True':
                 allAnswers -= np.mean(allAnswers)
                 allAnswers /= np.var(allAnswers)
@@ -1,6 +1,7 @@
 import string
 from difflib import SequenceMatcher
 from ioHelpers import importTextFile
+from DataStructures.scoringBundle import loadScoringSource
 
 class typingMatcher:
 	def __init__(self, settings):
@@ -8,9 +9,11 @@ class typingMatcher:
 		self.settings = settings
 		self.initScript()
 
-	def getMatchingScore( self, copyFilename, reportFile = None ):
+	def getMatchingScore( self, copyFilename, reportFile = None, copyLines = None ):
 		#import the copy that the group has written up and remove empty lines
-		copyLines = importTextFile(copyFilename)
+		#unless the caller already has the lines from importTextFile
+		if copyLines is None:
+			copyLines = importTextFile(copyFilename)
 
 		#create the matchlist
 		hitCounter, hitSequence = self.matchAll( copyLines )
@@ -115,7 +118,7 @@ class typingMatcher:
 class typingTextMatcher( typingMatcher ):
 	def initScript(self):
 		#import and set the parameters
-		self.originalLines = importTextFile(self.settings['Typing']['Ground Truth Text'])
+		self.originalLines = loadScoringSource(self.settings, 'textLines', self.settings['Typing']['Ground Truth Text'])
 		self.minMatchlength = self.settings['Typing']['Typing Text Minimal Match Length']
 		self.spaceBetweenItems = ' '
 
@@ -156,7 +159,7 @@ class typingTextMatcher( typingMatcher ):
 class typingNumbersMatcher( typingMatcher ):
 	def initScript(self):
 		#import and set the parameters
-		self.originalLines = importTextFile(self.settings['Typing']['Ground Truth Numbers'])
+		self.originalLines = loadScoringSource(self.settings, 'textLines', self.settings['Typing']['Ground Truth Numbers'])
 		self.minMatchlength = self.settings['Typing']['Typing Numbers Minimal Match Length']
 		self.spaceBetweenItems = ''
 
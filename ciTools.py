@@ -1,23 +1,43 @@
 import argparse
 from LogAnalyzer.logFileAnalyzer import analyzeLogFiles
+from LogAnalyzer.logTimeSeries import analyzeLogTimeSeries
+from LogAnalyzer.gridReplay import replayGridLogs
+from LogAnalyzer.sentimentBenchmark import benchmarkSentimentBackends
+from LogAnalyzer.sentimentBackends import sentimentBackendNames
 from DataStructures.settingsStruct import settingsStruct
+from DataStructures.studyShards import applyShardToSettings
+from DataStructures.scoringBundle import compileScoringBundle
 from LogAnalyzer.chatLogExporter import exportChatLogs
 from Scoring.integrityChecks import checkStudyIntegrity
 from Scoring.updateBrainstormScoringTables import updateScoringTable
 from Scoring.scoreStudy import scoreStudy
 from Scoring.computeCI import computeCI
+from Scoring.mergeShards import mergeShards
 from Reporting.createReports import createReports
 
 def mainFunction( args ):
     #load the settings file
     settings = settingsStruct(args.settingsFile)
+
+    #restrict the study to one shard and write the results to the files of the shard
+    if args.shard:
+        applyShardToSettings(settings, args.shard)
     
     #parse the command
     if args.command.lower().strip() == 'loganalysis':
-        analyzeLogFiles( settings )
+        analyzeLogFiles( settings, args.jobs, args.engine, args.chatlogs, args.follow, args.interval, args.long, args.sentiment, args.chunks )
+
+    elif args.command.lower().strip() == 'logtimeseries':
+        analyzeLogTimeSeries( settings, args.window )
+
+    elif args.command.lower().strip() == 'gridreplay':
+        replayGridLogs( settings, [float(curCutoff) for curCutoff in args.cutoffs.split(',')] )
+
+    elif args.command.lower().strip() == 'sentimentbenchmark':
+        benchmarkSentimentBackends( settings, args.engine )
 
     elif args.command.lower().strip() == 'chatlogs':
-        exportChatLogs( settings )
+        exportChatLogs( settings, args.jobs, args.compress, args.consolidate )
 
     elif args.command.lower().strip() == 'integritychecks':
         checkStudyIntegrity(settings)
@@ -25,8 +45,14 @@ def mainFunction( args ):
     elif args.command.lower().strip() == 'updatescoringtables':
         updateScoringTable(settings)
 
+    elif args.command.lower().strip() == 'compile':
+        compileScoringBundle(settings)
+
     elif args.command.lower().strip() == 'scoring':
-        scoreStudy(settings)
+        scoreStudy(settings, args.tasks, args.sessions)
+
+    elif args.command.lower().strip() == 'merge':
+        mergeShards( settings, args.shards )
 
     elif args.command.lower().strip() == 'computeci':
         computeCI(settings)
@@ -40,12 +66,41 @@ def mainFunction( args ):
 #TODO add docstring
 if __name__ == '__main__':
     #setup the argparser
-    acceptedCommands = ['loganalysis', 'chatlogs', 'integritychecks', 'updatescoringtables', 'scoring']
+    acceptedCommands = ['loganalysis', 'logtimeseries', 'gridreplay', 'sentimentbenchmark', 'chatlogs', 'integritychecks', 'updatescoringtables', 'compile', 'scoring', 'merge']
     parser = argparse.ArgumentParser(description='The MCI Scoring and Evaluation Toolbox')
     parser.add_argument("command", help="Action to perform (readme for more details). Options are: " + ', '.join(acceptedCommands), action="store")
     parser.add_argument("settingsFile", help="Settings file that describes the study to perform the action on", action="store")
+    parser.add_argument("--jobs", help="Number of processes to work on the sessions with (loganalysis and chatlogs only)", type=int, default=1, action="store")
+    parser.add_argument("--engine", help="Implementation of the log metrics (loganalysis only). Options are: rows, columnar", choices=['rows', 'columnar'], default='rows', action="store")
+    parser.add_argument("--chunks", help="Number of chunks to split every log file into so one long session can be parsed by several processes, can't be combined with --chatlogs and --engine (loganalysis only)", type=int, default=1, action="store")
+    parser.add_argument("--chatlogs", help="Export the chat logs in the same pass over the log files (loganalysis only)", action="store_true")
+    parser.add_argument("--follow", help="Follow the log files of running sessions and update the metrics periodically, can't be combined with --long, --chatlogs, --jobs, --chunks and --engine (loganalysis only)", action="store_true")
+    parser.add_argument("--interval", help="Seconds between the updates in follow mode (loganalysis only)", type=float, default=10, action="store")
+    parser.add_argument("--long", help="Stream the results to a session summary and a long per subject file (loganalysis only)", action="store_true")
+    parser.add_argument("--sentiment", help="Sentiment backend (loganalysis only). Options are: " + ', '.join(sentimentBackendNames), choices=sentimentBackendNames, default='textblob', action="store")
+    parser.add_argument("--compress", help="Write gzip compressed chat logs (chatlogs only)", action="store_true")
+    parser.add_argument("--consolidate", help="Write the chat of all sessions to one study level file (chatlogs only)", action="store_true")
+    parser.add_argument("--window", help="Length of the time windows in seconds (logtimeseries only)", type=int, default=60, action="store")
+    parser.add_argument("--cutoffs", help="Comma separated minutes after the start of the session to score the grid at (gridreplay only)", default='5,10,20', action="store")
+    parser.add_argument("--tasks", help="Comma separated task names to score again and merge into the scores file (scoring only)", action="store")
+    parser.add_argument("--sessions", help="Comma separated session names and filters over the columns of the sessionDataFile like 'Condition=Video' to score again and merge into the scores file (scoring only)", action="store")
+    parser.add_argument("--shard", help="Only work on shard i of N of the sessions given as i/N and write the results to files of that shard", action="store")
+    parser.add_argument("--shards", help="Number of shards to merge (merge only)", type=int, default=1, action="store")
     args = parser.parse_args()
 
+    #follow mode keeps one accumulator per running log in this process and writes the wide file
+    if args.follow:
+        followConflicts = [curOption for curOption, curSet in [('--long', args.long), ('--chatlogs', args.chatlogs), ('--jobs', args.jobs != 1),
+                                                               ('--chunks', args.chunks != 1), ('--engine', args.engine != 'rows')] if curSet]
+        if followConflicts:
+            parser.error('--follow can not be combined with ' + ', '.join(followConflicts))
+
+    #the chunks are always accumulated row by row without the chat logs
+    if args.chunks > 1:
+        chunkConflicts = [curOption for curOption, curSet in [('--chatlogs', args.chatlogs), ('--engine', args.engine != 'rows')] if curSet]
+        if chunkConflicts:
+            parser.error('--chunks can not be combined with ' + ', '.join(chunkConflicts))
+
     #call the main function
     mainFunction( args )
 